@@ -1,37 +1,57 @@
 # api/endpoints.py
-from fastapi import APIRouter, Query
-from fastapi.responses import FileResponse, JSONResponse
-from typing import List
+from fastapi import APIRouter, Query, Header, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+from typing import List, Optional
 import os
 from services.visualize import generate_evacuation_image
+from services import route_codec
+from services.floors import FLOOR_MATRIX
+from services.compute_pool import run_limited, Overloaded, ClientDisconnected, get_stats
 
 
 router = APIRouter(tags=["evacuation"])
 
 
 
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        content={"error": f"Server busy ({e.endpoint}), retry later", "retry_after": e.retry_after},
+        status_code=503,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def disconnected_response() -> JSONResponse:
+    # 499: client closed request; nobody reads this, it only shows up in access logs
+    return JSONResponse(content={"error": "Client disconnected"}, status_code=499)
+
+
 @router.get("/evacuation")
-def get_evacuation_path(
+async def get_evacuation_path(
+    request: Request,
     start_row: int,
     start_col: int,
     strating_floor: int = Query(..., description="Floor number"),
     fire_locations: List[str] = Query(..., description="Format: r,c (multiple allowed)"),
     fire_floor: int = Query(..., description="Floor number where fire starts"),
     exits: List[str] = Query(..., description="Format: r,c (multiple allowed)"),
-    stage: str = Query("initial", regex="^(initial|growth|spread)$")
+    stage: str = Query("initial", regex="^(initial|growth|spread)$"),
+    format: Optional[str] = Query(None, regex="^(json|binary)$", description="Response format (overrides Accept)"),
+    accept: Optional[str] = Header(None)
 ):
     start = (start_row, start_col)
     fire_locs = [tuple(map(int, f.split(','))) for f in fire_locations]
     exit_locs = [tuple(map(int, e.split(','))) for e in exits]
-    floor_metrix = {0: "matrix/matrix.csv", 1: "matrix/matrix1.csv", 2: "matrix/matrix2.csv"}
-    matrix = floor_metrix[strating_floor]
+    matrix = FLOOR_MATRIX[strating_floor]
+    binary = route_codec.wants_binary(accept, format)
 
     try:
        
         consider_fire = (strating_floor == fire_floor)
         
         
-        result = generate_evacuation_image(
+        result = await run_limited(
+            "evacuation", request, generate_evacuation_image,
             matrix, 
             start, 
             exit_locs, 
@@ -39,9 +59,14 @@ def get_evacuation_path(
             stage,
             consider_fire=consider_fire,
             floor_number=strating_floor,
-            fire_floor=fire_floor
+            fire_floor=fire_floor,
+            render=not binary  # the binary format carries no image
         )
-        
+
+        if binary:
+            payload = route_codec.encode_route(result["path"], result["length"], consider_fire)
+            return Response(content=payload, media_type=route_codec.MEDIA_TYPE)
+
         return {
             "path": result["path"],
             "length": result["length"],
@@ -51,10 +76,20 @@ def get_evacuation_path(
             "download_url": f"/download/{os.path.basename(result['image_path'])}",
             "fire_considered": consider_fire
         }
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ClientDisconnected:
+        return disconnected_response()
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=400)
 
 
+@router.get("/compute-pool/status")
+async def compute_pool_status():
+    """Process pool size and per-endpoint admission counters."""
+    return get_stats()
+
+
 @router.get("/download/{filename}")
 def download_image(filename: str):
     filepath = os.path.join("output", filename)
@@ -3,11 +3,11 @@ from fastapi.responses import JSONResponse
 import threading
 import os
 import uuid
-import asyncio
 from services.thermal_detection import ThermalHumanDetector
 from typing import List
 from fastapi import WebSocketDisconnect
 import copy
+from services import status_broadcast
 
 router = APIRouter(tags=["human_detection"])
 detector = ThermalHumanDetector()
@@ -16,6 +16,8 @@ threads = {"video": None, "webcam": None}
 active_videos = {}  
 video_status = {}
 status_lock = threading.Lock()  # Add lock for thread safety
+# /ws clients share one serialized snapshot/delta per update
+broadcaster = status_broadcast.get_broadcaster("thermal", video_status, status_lock)
 
 @router.post("/detect/videos")
 async def detect_multiple_videos(files: List[UploadFile] = File(...)):
@@ -121,21 +123,16 @@ async def get_status():
 
 @router.websocket("/ws")
 async def detection_stream(websocket: WebSocket):
+    # Keyframes + deltas by default, ?mode=full for the whole status on every update
+    mode = websocket.query_params.get("mode", "delta")
+    if mode not in status_broadcast.MODES:
+        await websocket.close(code=1008)
+        return
     await websocket.accept()
     print("WebSocket client connected")
     
     try:
-        while True:
-            # Create a deep copy to avoid race conditions
-            with status_lock:
-                current_status = copy.deepcopy(video_status)
-            
-            # Send the status
-            await websocket.send_json(current_status)
-            
-            # Wait before next update
-            await asyncio.sleep(1)  # Update twice per second
-            
+        await broadcaster.serve(websocket, mode)
     except WebSocketDisconnect:
         print("WebSocket client disconnected")
     except Exception as e:
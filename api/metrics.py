@@ -0,0 +1,64 @@
+# api/metrics.py
+import time
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+from services import instrumentation
+from services import inference_scheduler
+from services import capture
+from services import process_workers
+from services import status_broadcast
+
+router = APIRouter(tags=["metrics"])
+
+# Endpoints that get per-phase Server-Timing headers and request latency histograms
+TIMED_PATHS = ("/evacuation", "/signboard-guidance")
+
+
+async def timing_middleware(request: Request, call_next):
+    """Attach a Server-Timing header with the per-phase breakdown of routing requests."""
+    path = request.url.path
+    if not instrumentation.ENABLED or path not in TIMED_PATHS:
+        return await call_next(request)
+
+    trace = instrumentation.start_trace()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    instrumentation.observe_request(path, elapsed)
+
+    timing = trace.server_timing()
+    response.headers["Server-Timing"] = f"{timing}, total;dur={elapsed * 1000:.1f}" if timing else f"total;dur={elapsed * 1000:.1f}"
+    return response
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition: phase latency histograms and hot-path counters."""
+    return PlainTextResponse(instrumentation.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+
+@router.get("/inference/status")
+async def inference_status():
+    """Batched YOLO scheduler: batch sizes, queue depth and per-camera latency."""
+    return inference_scheduler.get_all_stats()
+
+
+@router.get("/capture/status")
+async def capture_status():
+    """Per-source capture stats: drop policy, frames dropped and capture-to-result latency."""
+    return capture.get_all_stats()
+
+
+@router.get("/workers/status")
+async def workers_status():
+    """Worker processes (EVAC_WORKER_MODE=process): state, pid and restart count."""
+    return process_workers.get_all_stats()
+
+
+@router.get("/broadcast/status")
+async def broadcast_status():
+    """Status WebSocket broadcasters: subscribers, keyframes/deltas sent and dropped clients."""
+    return status_broadcast.get_all_stats()
@@ -6,13 +6,16 @@ import time
 import json
 import uuid
 import asyncio
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
-from services.detector import YoloDetector
+from services.detector import YoloDetector, DetectionFilter
 from services.reid import ReIDExtractor
 from services.tracker import DeepSortWrapper
 from services.worker import CameraWorker
+from services.roi import RoiSet
+from services.inference_size import parse_size
 from services.identity_manager import IdentityManager
+from services import process_workers, status_broadcast
 
 
 router = APIRouter(prefix="/reid", tags=["reid"])
@@ -29,19 +32,56 @@ REID = ReIDExtractor()
 # GLOBAL IDENTITY MANAGER - This is the key component for cross-video Re-ID
 # Threshold 0.75 = BALANCED (same person with different poses/angles can match)
 # Cross-video has additional 0.92 threshold to prevent different people matching
-IDENTITY_MANAGER = IdentityManager(similarity_threshold=0.75)
+# EVAC_REID_INDEX=ivf switches very large galleries (> 5000 identities) to approximate search
+# Identities persist in EVAC_REID_STORE (default identity_store/, empty = memory only)
+# Identities unseen for EVAC_REID_TTL seconds, or beyond EVAC_REID_MAX_IDENTITIES,
+# move to a searchable archive (0 disables either limit)
+_REID_TTL = float(os.environ.get("EVAC_REID_TTL", "7200"))
+_REID_MAX_IDENTITIES = int(os.environ.get("EVAC_REID_MAX_IDENTITIES", "50000"))
+IDENTITY_MANAGER = IdentityManager(similarity_threshold=0.75,
+                                   index=os.environ.get("EVAC_REID_INDEX", "exact"),
+                                   store_dir=os.environ.get("EVAC_REID_STORE", "identity_store") or None,
+                                   ttl=_REID_TTL or None,
+                                   max_identities=_REID_MAX_IDENTITIES or None)
 
 # Each video gets its own tracker instance
 TRACKERS = {}  # cam_name -> DeepSortWrapper
 
+# /reid/ws clients share one serialized snapshot/delta per update
+BROADCASTER = status_broadcast.get_broadcaster("reid", SHARED_STATUS, STATUS_LOCK)
+
 @router.post("/start_camera")
-async def start_camera(cam_name: str = Body(...), source: str = Body(...), area_m2: float = Body(50.0)):
+async def start_camera(cam_name: str = Body(...), source: str = Body(...), area_m2: float = Body(50.0),
+                       det_filter: Optional[Dict[str, float]] = Body(None),
+                       rois: Optional[List[dict]] = Body(None),
+                       imgsz: Optional[Union[int, str]] = Body(None)):
     """
     Start processing for a camera/video.
     source: video path or device index string (e.g., '0' for webcam)
+    det_filter: per-camera detection limits overriding DetectionFilter defaults,
+    e.g. {"min_conf": 0.5, "min_height": 40}
+    rois: polygons in frame pixels, [{"name": "lobby", "polygon": [[x, y], ...], "area_m2": 20}];
+    detection runs on their crop and density is reported per ROI (area_m2 defaults to the camera's)
+    imgsz: YOLO input size (multiple of 32) or "auto"; defaults to EVAC_INFER_SIZE
     """
     if cam_name in CAM_WORKERS:
         return {"error": "camera already running", "cam_name": cam_name}
+    try:
+        limits = DetectionFilter.from_dict(det_filter)
+        roi_set = RoiSet.from_config(rois, area_m2)
+        size = parse_size(imgsz)
+    except (TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if process_workers.WORKER_MODE == "process":
+        # Own process with its own models; status and identity matching come back over a pipe
+        CAM_WORKERS[cam_name] = process_workers.start_process_worker(
+            process_workers.run_camera_worker,
+            {"cam_name": cam_name, "source": source, "area_m2": area_m2, "det_filter": limits.to_dict(),
+             "rois": roi_set.to_config() if roi_set else None, "imgsz": size},
+            status_target=SHARED_STATUS, status_lock=STATUS_LOCK, status_key=cam_name,
+            identity_manager=IDENTITY_MANAGER, stream_name=f"reid:{cam_name}")
+        return {"started": cam_name, "message": "Video processing started with global Re-ID (worker process)"}
     
     # Create a new tracker for this video
     tracker = DeepSortWrapper()
@@ -56,12 +96,30 @@ async def start_camera(cam_name: str = Body(...), source: str = Body(...), area_
         detector=DETECTOR, 
         reid=REID, 
         tracker=tracker,
-        identity_manager=IDENTITY_MANAGER  # Pass global identity manager
+        identity_manager=IDENTITY_MANAGER,  # Pass global identity manager
+        det_filter=limits,
+        rois=roi_set,
+        imgsz=size
     )
     CAM_WORKERS[cam_name] = worker
     worker.start()
     return {"started": cam_name, "message": "Video processing started with global Re-ID"}
 
+@router.put("/cameras/{cam_name}/rois")
+async def set_camera_rois(cam_name: str, rois: Optional[List[dict]] = Body(None)):
+    """Replace a running camera's ROI polygons (empty list or null = whole frame)."""
+    worker = CAM_WORKERS.get(cam_name)
+    if worker is None:
+        raise HTTPException(status_code=404, detail="camera not found")
+    if not hasattr(worker, "set_rois"):
+        raise HTTPException(status_code=409, detail="worker processes take ROIs at start; restart the camera")
+    try:
+        roi_set = RoiSet.from_config(rois, worker.area_m2)
+    except (TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    worker.set_rois(roi_set)
+    return {"cam_name": cam_name, "rois": roi_set.to_config() if roi_set else []}
+
 @router.post("/stop_camera")
 async def stop_camera(cam_name: str = Body(...)):
     if cam_name not in CAM_WORKERS:
@@ -126,16 +184,16 @@ async def upload_multiple(files: List[UploadFile] = File(...), area_m2: float =
         "message": f"Started processing {len(results)} videos with global Re-ID"
     }
 
-# websocket endpoint: broadcast SHARED_STATUS periodically
+# websocket endpoint: broadcast SHARED_STATUS as keyframes + deltas (?mode=full: whole status)
 @router.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
+    mode = ws.query_params.get("mode", "delta")
+    if mode not in status_broadcast.MODES:
+        await ws.close(code=1008)
+        return
     await ws.accept()
     try:
-        while True:
-            with STATUS_LOCK:
-                snapshot = json.loads(json.dumps(SHARED_STATUS))
-            await ws.send_json(snapshot)
-            await asyncio.sleep(1.0)
+        await BROADCASTER.serve(ws, mode)
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
@@ -212,6 +270,16 @@ async def reset_identities():
         "status": "success"
     }
 
+# Persist identities now instead of waiting for the next periodic snapshot
+@router.post("/identities/snapshot")
+async def snapshot_identities():
+    saved = await asyncio.to_thread(IDENTITY_MANAGER.save_snapshot)
+    return {"saved": saved, "statistics": IDENTITY_MANAGER.get_statistics()}
+
+@router.on_event("shutdown")
+def _close_identity_store():
+    IDENTITY_MANAGER.close()
+
 # NEW: Get current status with identity information
 @router.get("/status")
 async def get_status():
@@ -1,23 +1,33 @@
 
-from fastapi import APIRouter, Query, Body
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, Query, Body, Header, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
 from typing import List, Optional
 from pydantic import BaseModel, Field
-import pandas as pd
+import asyncio
 import os
 
 from services.grid import Grid
 from services.fire_model import FireModel
 from services.signboard_system import SignboardGuidanceSystem, generate_signboard_plan
 from services.visualize_signboard import detect_rooms, visualize_signboard_plan
+from services.signboard_table import get_table
+from services.floors import floor_matrix_path, load_floor_matrix
+from services.signboard_controller import SignboardController
+from services.compute_pool import run_limited, Overloaded, ClientDisconnected
+from services import route_codec
+from api.endpoints import overloaded_response, disconnected_response
 
 signboard_router = APIRouter(tags=["signboard"])
 
+# Live signboard controller shared by all sign controllers
+SIGNBOARD_CONTROLLER = SignboardController()
+
 
 
 
 @signboard_router.get("/signboard-guidance", summary="Get Signboard Guidance (GET)")
-def get_signboard_guidance(
+async def get_signboard_guidance(
+    request: Request,
     floor: int = Query(..., description="Floor number (0, 1, 2)", example=1),
     fire_floor: int = Query(..., description="Fire floor", example=1),
     stage: str = Query("initial", regex="^(initial|growth|spread)$", description="Fire stage", example="growth"),
@@ -36,19 +46,30 @@ def get_signboard_guidance(
         ..., 
         description="📍 Signboard positions (format: 'r,c'). Click 'Add string item' to add multiple signboards.",
         example=["3,5", "6,10", "10,15", "15,5", "20,10", "25,15",""]
-    )
+    ),
+    format: Optional[str] = Query(None, regex="^(json|binary)$", description="Response format (overrides Accept)"),
+    accept: Optional[str] = Header(None)
 ):
-    
-    return _process_signboard_guidance(
+    binary = route_codec.wants_binary(accept, format)
+
+    result = await _process_signboard_guidance(
+        request,
         floor=floor,
         fire_locations=fire_locations,
         fire_floor=fire_floor,
         exits=exits,
         signboard_locations=signboard_locations,
         stage=stage,
-        include_visualization=include_visualization
+        include_visualization=include_visualization and not binary
     )
 
+    if binary and isinstance(result, dict):
+        payload = route_codec.encode_signboards(
+            result["signboards"], floor, fire_floor, stage, result["fire_active"]
+        )
+        return Response(content=payload, media_type=route_codec.MEDIA_TYPE)
+    return result
+
 
 
 
@@ -67,7 +88,8 @@ def download_signboard_image(filename: str):
 
 
 
-def _process_signboard_guidance(
+async def _process_signboard_guidance(
+    request: Request,
     floor: int,
     fire_locations: List[str],
     fire_floor: int,
@@ -77,55 +99,160 @@ def _process_signboard_guidance(
     include_visualization: bool
 ) -> dict:
 
-    fire_locs = [tuple(map(int, f.split(','))) for f in fire_locations]
-    exit_locs = [tuple(map(int, e.split(','))) for e in exits]
-    sign_locs = [tuple(map(int, s.split(','))) for s in signboard_locations]
-    
-   
-    floor_matrix = {0: "matrix/matrix.csv", 1: "matrix/matrix1.csv", 2: "matrix/matrix2.csv"}
-    matrix_path = floor_matrix.get(floor, "matrix/matrix.csv")
-    
     try:
-       
-        df = pd.read_csv(matrix_path, index_col=0)
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        df = df.apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
-        mat = df.to_numpy()
-        
-        grid = Grid(mat.tolist())
-        fire = FireModel(grid)
-        
-      
-        consider_fire = (floor == fire_floor)
-        if consider_fire and fire_locs:
-            fire.ignite(fire_locs)
-            fire.stage_update(stage)
-    
-        rooms = detect_rooms(grid, fire)
+        fire_locs = [tuple(map(int, f.split(','))) for f in fire_locations]
+        exit_locs = [tuple(map(int, e.split(','))) for e in exits]
+        sign_locs = [tuple(map(int, s.split(','))) for s in signboard_locations]
 
-        plan = generate_signboard_plan(grid, fire, exit_locs, sign_locs, rooms)
-        
-    
-        image_path = None
-        if include_visualization:
-            image_path = visualize_signboard_plan(
-                grid, fire, exit_locs, plan, 
-                floor, fire_floor, stage, consider_fire
-            )
-        
-        return {
-            "floor": floor,
-            "fire_floor": fire_floor,
-            "fire_stage": stage,
-            "fire_active": consider_fire,
-            "signboards": plan["signboards"],
-            "rooms": plan["rooms"],
-            "corridors": plan["corridors"],
-            "summary": plan["summary"],
-            "visualization_url": f"/download-signboard/{os.path.basename(image_path)}" if image_path else None
-        }
-        
+        # Known scenario: answer from the precomputed table without touching the grid
+        if not include_visualization:
+            result = _lookup_signboard_guidance(floor, fire_locs, fire_floor, exit_locs, sign_locs, stage)
+            if result is not None:
+                return result
+
+        return await run_limited(
+            "signboard", request, _compute_signboard_guidance,
+            floor, fire_locs, fire_floor, exit_locs, sign_locs, stage, include_visualization
+        )
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ClientDisconnected:
+        return disconnected_response()
     except Exception as e:
         return JSONResponse(content={"error": str(e), "details": str(type(e).__name__)}, status_code=400)
 
 
+def _lookup_signboard_guidance(floor, fire_locs, fire_floor, exit_locs, sign_locs, stage) -> Optional[dict]:
+    consider_fire = (floor == fire_floor)
+    table = get_table(floor)
+    plan = table.lookup_plan(exit_locs, sign_locs, fire_locs, consider_fire, stage) if table else None
+    if plan is None:
+        return None
+    return {
+        "floor": floor,
+        "fire_floor": fire_floor,
+        "fire_stage": stage,
+        "fire_active": consider_fire,
+        "signboards": plan["signboards"],
+        "rooms": plan["rooms"],
+        "corridors": plan["corridors"],
+        "summary": plan["summary"],
+        "visualization_url": None,
+        "precomputed": True
+    }
+
+
+def _compute_signboard_guidance(floor, fire_locs, fire_floor, exit_locs, sign_locs, stage,
+                                include_visualization) -> dict:
+    """Live signboard plan; runs in a compute pool worker."""
+    consider_fire = (floor == fire_floor)
+    mat = load_floor_matrix(floor_matrix_path(floor))
+
+    grid = Grid(mat.tolist())
+    fire = FireModel(grid)
+
+    if consider_fire and fire_locs:
+        fire.ignite(fire_locs)
+        fire.stage_update(stage)
+
+    rooms = detect_rooms(grid, fire)
+
+    plan = generate_signboard_plan(grid, fire, exit_locs, sign_locs, rooms)
+
+    image_path = None
+    if include_visualization:
+        image_path = visualize_signboard_plan(
+            grid, fire, exit_locs, plan,
+            floor, fire_floor, stage, consider_fire
+        )
+
+    return {
+        "floor": floor,
+        "fire_floor": fire_floor,
+        "fire_stage": stage,
+        "fire_active": consider_fire,
+        "signboards": plan["signboards"],
+        "rooms": plan["rooms"],
+        "corridors": plan["corridors"],
+        "summary": plan["summary"],
+        "visualization_url": f"/download-signboard/{os.path.basename(image_path)}" if image_path else None,
+        "precomputed": False
+    }
+
+
+def _parse_cells(values: List[str]) -> List[tuple]:
+    return [tuple(map(int, v.split(','))) for v in values if v]
+
+
+@signboard_router.post("/signboard-controller/floors/{floor}", summary="Register floor signboards for live updates")
+async def configure_signboard_floor(
+    floor: int,
+    exits: List[str] = Body(..., description="Exit positions (format: 'r,c')"),
+    signboard_locations: List[str] = Body(..., description="Signboard positions (format: 'r,c')")
+):
+    try:
+        SIGNBOARD_CONTROLLER.configure_floor(floor, _parse_cells(exits), _parse_cells(signboard_locations))
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return {"floor": floor, "signboards": len(signboard_locations), "message": "Floor registered"}
+
+
+@signboard_router.post("/signboard-controller/fire", summary="Report a fire state change")
+async def update_signboard_fire(
+    fire_floor: Optional[int] = Body(None, description="Fire floor (null = no fire)"),
+    fire_locations: List[str] = Body([], description="Fire positions (format: 'r,c')"),
+    stage: str = Body("initial", regex="^(initial|growth|spread)$")
+):
+    SIGNBOARD_CONTROLLER.update_fire(fire_floor, _parse_cells(fire_locations), stage)
+    return {"message": "Fire state updated", **SIGNBOARD_CONTROLLER.get_status()}
+
+
+@signboard_router.get("/signboard-controller/status", summary="Live signboard controller status")
+async def signboard_controller_status():
+    return SIGNBOARD_CONTROLLER.get_status()
+
+
+@signboard_router.websocket("/signboard-controller/ws/{floor}")
+async def signboard_controller_ws(ws: WebSocket, floor: int, since: Optional[int] = None):
+    """
+    Push changed signs for a floor.
+    On connect the controller gets a snapshot (or the deltas after `since`).
+    Every delta carries `seq` and `prev_seq`; on a gap, send {"since": <last seq>}
+    (or {"resync": true}) to catch up.
+    """
+    await ws.accept()
+    if floor not in SIGNBOARD_CONTROLLER.floors:
+        await ws.send_json({"type": "error", "error": f"Floor {floor} is not registered"})
+        await ws.close()
+        return
+
+    sub_id, queue = SIGNBOARD_CONTROLLER.subscribe(floor)
+
+    async def reader():
+        while True:
+            msg = await ws.receive_json()
+            since_seq = None if msg.get("resync") else msg.get("since")
+            for m in SIGNBOARD_CONTROLLER.resync(floor, since_seq):
+                await ws.send_json(m)
+
+    reader_task = asyncio.create_task(reader())
+    try:
+        for m in SIGNBOARD_CONTROLLER.resync(floor, since):
+            await ws.send_json(m)
+        while not reader_task.done():
+            get_task = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({get_task, reader_task}, return_when=asyncio.FIRST_COMPLETED)
+            if get_task in done:
+                await ws.send_json(get_task.result())
+            else:
+                get_task.cancel()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print("Signboard WS error:", e)
+    finally:
+        if reader_task.done() and not reader_task.cancelled():
+            reader_task.exception()  # disconnect surfaced by the reader
+        reader_task.cancel()
+        SIGNBOARD_CONTROLLER.unsubscribe(floor, sub_id)
@@ -2,10 +2,15 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Form
 from fastapi.responses import JSONResponse
 import threading
 import os
+import json
 import time
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from staire_case.density_monitor import StaircaseDensityMonitor
+from services.detector import DetectionFilter
+from services.roi import RoiSet
+from services.inference_size import parse_size
+from services import process_workers
 
 router = APIRouter(prefix="/staircase", tags=["staircase"])
 
@@ -13,12 +18,47 @@ MONITORS = {}
 STATUS_LOCK = threading.Lock()
 SHARED_STATUS = {}
 
+
+def _start_monitor(monitor_id: str, source: str, monitor_status: dict,
+                   staircase_area_m2: float, density_threshold: float,
+                   det_filter: Optional[DetectionFilter] = None, rois: Optional[RoiSet] = None,
+                   imgsz: Union[str, int, None] = None):
+    """Threaded StaircaseDensityMonitor, or a worker process with EVAC_WORKER_MODE=process."""
+    stream_name = f"staircase:{monitor_id}"
+    det_filter = det_filter or DetectionFilter()
+    if process_workers.WORKER_MODE == "process":
+        return process_workers.start_process_worker(
+            process_workers.run_staircase_monitor,
+            {"source": source, "stream_name": stream_name, "staircase_area_m2": staircase_area_m2,
+             "density_threshold": density_threshold, "det_filter": det_filter.to_dict(),
+             "rois": rois.to_config() if rois else None, "imgsz": imgsz},
+            # Own lock: get_all_status() calls get_status() while holding STATUS_LOCK
+            status_target=monitor_status, status_lock=threading.Lock(), stream_name=stream_name)
+    monitor = StaircaseDensityMonitor(
+        staircase_area_m2=staircase_area_m2,
+        density_threshold=density_threshold,
+        det_filter=det_filter,
+        rois=rois,
+        imgsz=imgsz
+    )
+    monitor.start(source, monitor_status, stream_name=stream_name)
+    return monitor
+
 @router.post("/upload_video")
 async def upload_video(
     file: UploadFile = File(...),
     staircase_area_m2: float = Form(10.0),
-    density_threshold: float = Form(0.5)
+    density_threshold: float = Form(0.5),
+    rois: str = Form(None),
+    imgsz: str = Form(None)
 ):
+    # rois: JSON list of {"name", "polygon", "area_m2"}, as for /live_camera
+    # imgsz: YOLO input size (multiple of 32) or "auto"; defaults to EVAC_INFER_SIZE
+    try:
+        roi_set = RoiSet.from_config(json.loads(rois) if rois else None, staircase_area_m2)
+        size = parse_size(imgsz)
+    except (TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     os.makedirs("staire_case/uploads", exist_ok=True)
     fname = file.filename
     monitor_id = str(uuid.uuid4())
@@ -27,16 +67,10 @@ async def upload_video(
     with open(path, "wb") as f:
         f.write(await file.read())
     
-    monitor = StaircaseDensityMonitor(
-        staircase_area_m2=staircase_area_m2,
-        density_threshold=density_threshold
-    )
-    
     monitor_status = {}
     SHARED_STATUS[monitor_id] = monitor_status
-    
-    monitor.start(path, monitor_status)
-    MONITORS[monitor_id] = monitor
+    MONITORS[monitor_id] = _start_monitor(monitor_id, path, monitor_status,
+                                          staircase_area_m2, density_threshold, rois=roi_set, imgsz=size)
     
     return {
         "monitor_id": monitor_id,
@@ -50,20 +84,23 @@ async def upload_video(
 async def live_camera(
     camera_index: int = Body(0),
     staircase_area_m2: float = Body(10.0),
-    density_threshold: float = Body(0.5)
+    density_threshold: float = Body(0.5),
+    det_filter: Optional[Dict[str, float]] = Body(None),
+    rois: Optional[List[dict]] = Body(None),
+    imgsz: Optional[Union[int, str]] = Body(None)
 ):
+    try:
+        limits = DetectionFilter.from_dict(det_filter)
+        roi_set = RoiSet.from_config(rois, staircase_area_m2)
+        size = parse_size(imgsz)
+    except (TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     monitor_id = str(uuid.uuid4())
     
-    monitor = StaircaseDensityMonitor(
-        staircase_area_m2=staircase_area_m2,
-        density_threshold=density_threshold
-    )
-    
     monitor_status = {}
     SHARED_STATUS[monitor_id] = monitor_status
-    
-    monitor.start(str(camera_index), monitor_status)
-    MONITORS[monitor_id] = monitor
+    MONITORS[monitor_id] = _start_monitor(monitor_id, str(camera_index), monitor_status,
+                                          staircase_area_m2, density_threshold, limits, roi_set, size)
     
     return {
         "monitor_id": monitor_id,
@@ -73,6 +110,21 @@ async def live_camera(
         "message": "Live camera processing started"
     }
 
+@router.put("/{monitor_id}/rois")
+async def set_monitor_rois(monitor_id: str, rois: Optional[List[dict]] = Body(None)):
+    """Replace a running monitor's ROI polygons (empty list or null = whole frame)."""
+    monitor = MONITORS.get(monitor_id)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Monitor not found")
+    if not hasattr(monitor, "set_rois"):
+        raise HTTPException(status_code=409, detail="worker processes take ROIs at start; restart the monitor")
+    try:
+        roi_set = RoiSet.from_config(rois, monitor.staircase_area_m2)
+    except (TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    monitor.set_rois(roi_set)
+    return {"monitor_id": monitor_id, "rois": roi_set.to_config() if roi_set else []}
+
 @router.get("/status/{monitor_id}")
 async def get_status(monitor_id: str):
     if monitor_id not in MONITORS:
@@ -0,0 +1,93 @@
+# api/streams.py
+import asyncio
+import contextlib
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from services import frame_stream
+
+router = APIRouter(prefix="/stream", tags=["streams"])
+
+MAX_FPS = 30.0
+
+
+async def _jpeg_frames(channel: frame_stream.FrameChannel, width: Optional[int], fps: float, quality: int):
+    """JPEG frames of a channel at most `fps` times per second, while it is open."""
+    channel.subscribe()
+    try:
+        interval = 1.0 / fps
+        last_seq = -1
+        while not channel.closed:
+            t0 = time.monotonic()
+            if channel.seq != last_seq:
+                # Resize/encode off the event loop; shared with other viewers of the same size
+                last_seq, jpeg = await asyncio.to_thread(channel.encode, width, quality)
+                if jpeg:
+                    yield jpeg
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - t0)))
+    finally:
+        channel.unsubscribe()
+
+
+def _channel_or_404(name: str) -> frame_stream.FrameChannel:
+    channel = frame_stream.get_channel(name)
+    if channel is None:
+        raise HTTPException(status_code=404, detail=f"No stream named '{name}'")
+    return channel
+
+
+@router.get("")
+async def list_streams():
+    """Open streams (reid:<cam>, thermal:<video_id>, thermal:webcam, staircase:<monitor_id>) and their viewers."""
+    return {"headless": frame_stream.HEADLESS, "streams": frame_stream.list_channels()}
+
+
+@router.get("/{name}")
+async def mjpeg_stream(name: str,
+                       width: Optional[int] = Query(None, ge=16, le=3840),
+                       fps: float = Query(10.0, gt=0, le=MAX_FPS),
+                       quality: int = Query(70, ge=10, le=95)):
+    """
+    Annotated frames as MJPEG (multipart/x-mixed-replace), usable directly as an <img> src.
+    Frames are only annotated and encoded while at least one viewer is connected.
+    """
+    channel = _channel_or_404(name)
+
+    async def body():
+        async for jpeg in _jpeg_frames(channel, width, fps, quality):
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                   + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+
+    return StreamingResponse(body(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+@router.websocket("/{name}/ws")
+async def websocket_stream(websocket: WebSocket, name: str):
+    """Annotated frames as binary JPEG messages. Query params as for the MJPEG endpoint."""
+    channel = frame_stream.get_channel(name)
+    if channel is None:
+        await websocket.close(code=1008)
+        return
+    try:
+        params = websocket.query_params
+        width = int(params["width"]) if "width" in params else None
+        fps = min(max(float(params.get("fps", 10.0)), 0.1), MAX_FPS)
+        quality = min(max(int(params.get("quality", 70)), 10), 95)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    frames = _jpeg_frames(channel, width, fps, quality)
+    try:
+        async with contextlib.aclosing(frames):
+            async for jpeg in frames:
+                await websocket.send_bytes(jpeg)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Stream websocket error ({name}): {e}")
@@ -16,7 +16,7 @@ import pandas as pd
 # CONFIG
 # ----------------------------------------------------
 API_BASE_URL = "http://localhost:8000"
-WS_URL = "ws://localhost:8000/ws"
+WS_URL = "ws://localhost:8000/ws?mode=full"  # whole status on every update, no deltas
 
 # ----------------------------------------------------
 # GLOBAL QUEUE (IMPORTANT!!!)
@@ -0,0 +1,69 @@
+# benchmarks/ann_recall.py
+"""
+Recall vs latency of the IVF identity index against exact search.
+
+    python -m benchmarks.ann_recall                           # 50k identities, D=512
+    python -m benchmarks.ann_recall --gallery 10000 100000 --probes 1 4 8 16 32
+
+Gallery embeddings are clustered synthetic unit vectors (people in similar
+clothing form clusters); queries are noisy re-observations of gallery
+identities. Recall@1 is the fraction of queries whose IVF top-1 equals the
+exact top-1.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ann_index import IVFIndex
+
+
+def make_gallery(n: int, dim: int, seed: int = 0, n_clusters: int = 200):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, n_clusters, n)] + rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def make_queries(gallery: np.ndarray, n: int, seed: int = 1, noise: float = 0.03):
+    rng = np.random.default_rng(seed)
+    q = gallery[rng.integers(0, len(gallery), n)]
+    q = q + rng.normal(scale=noise, size=q.shape).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IVF recall vs latency against exact search")
+    parser.add_argument("--gallery", nargs="+", type=int, default=[50000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--probes", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args(argv)
+
+    for n in args.gallery:
+        gallery = make_gallery(n, args.dim)
+        queries = make_queries(gallery, args.queries)
+        ids = np.arange(1, n + 1)
+
+        t0 = time.perf_counter()
+        exact = [int(ids[np.argmax(gallery @ q)]) for q in queries]
+        exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+        t0 = time.perf_counter()
+        index = IVFIndex(args.dim)
+        index.build(ids, gallery)
+        build_s = time.perf_counter() - t0
+
+        print(f"gallery {n} x {args.dim}: {len(index.lists)} lists, build {build_s:.2f}s, "
+              f"exact {exact_ms:.3f} ms/query")
+        print(f"{'n_probe':>8} {'recall@1':>9} {'ms/query':>9} {'speedup':>8}")
+        for p in args.probes:
+            t0 = time.perf_counter()
+            got = [index.search(q, n_probe=p)[0] for q in queries]
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            recall = np.mean([g == e for g, e in zip(got, exact)])
+            print(f"{p:>8} {recall:>9.3f} {ms:>9.3f} {exact_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Accuracy and throughput of the CPU inference backends on a local clip.
+
+    python -m benchmarks.backend_compare --clip staire_case/uploads/stairs.mp4
+    python -m benchmarks.backend_compare --clip clip.mp4 --models yolo --backends torch onnx-int8 openvino-int8
+
+Needs ultralytics + torchreid, and onnxruntime / openvino (+ nncf for
+openvino-int8) for the backends being compared. Torch is the reference:
+
+    yolo   person-box precision / recall at IoU 0.5 against the torch boxes,
+           mean absolute person-count difference per frame, frames/s at
+           batch 1 and at batch --batch
+    reid   cosine similarity to the torch embeddings (mean / min) and rank-1
+           agreement (same nearest neighbour among all crops), embeddings/s;
+           crops are the torch detector's person boxes on the clip
+
+INT8 backends are calibrated on frames from the second half of the clip and
+evaluated on frames from the first half. Exported models are cached in
+EVAC_MODEL_CACHE, so delete it to calibrate again. Results are written to
+benchmarks/results/backends_<timestamp>.json.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from services import inference_backend
+from services.detector import parse_person_boxes
+from services.inference_backend import sample_video_frames
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def _iou(a, b) -> np.ndarray:
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes."""
+    a, b = np.asarray(a, dtype=np.float32).reshape(-1, 4), np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def match_boxes(ref: List[tuple], test: List[tuple], thresh: float = 0.5) -> int:
+    """Greedy one-to-one matches of `test` boxes to `ref` boxes at IoU >= thresh."""
+    if not ref or not test:
+        return 0
+    iou = _iou(ref, test)
+    matched = 0
+    while iou.size and iou.max() >= thresh:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        matched += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return matched
+
+
+def detect_all(model, frames: List[np.ndarray], conf: float) -> List[List[tuple]]:
+    return [[tuple(b) for b in parse_person_boxes(r, conf)[:, :4].astype(int).tolist()]
+            for r in model(frames, verbose=False, classes=[0])]
+
+
+def bench_yolo(args, frames, calibration) -> Dict[str, dict]:
+    results = {}
+    reference = None
+    for spec in args.backends:
+        runtime, int8 = inference_backend.parse_backend(spec)
+        if runtime == "torch":
+            model = inference_backend.load_yolo(args.weights, "torch")
+        else:
+            from ultralytics import YOLO
+            model = YOLO(inference_backend.export_yolo(args.weights, runtime, int8, calibration), task="detect")
+        model(frames[:1], verbose=False)  # warm-up
+        boxes = detect_all(model, frames, args.conf)
+        if reference is None:
+            reference = boxes  # first backend (torch by default) is the reference
+
+        matched = sum(match_boxes(r, b) for r, b in zip(reference, boxes))
+        n_ref, n_test = sum(map(len, reference)), sum(map(len, boxes))
+        batch = frames[:args.batch]
+        results[spec] = {
+            "precision": round(matched / n_test, 4) if n_test else 1.0,
+            "recall": round(matched / n_ref, 4) if n_ref else 1.0,
+            "count_mae": round(float(np.mean([abs(len(r) - len(b)) for r, b in zip(reference, boxes)])), 3),
+            "fps_batch1": round(1 / _time(lambda: model(frames[:1], verbose=False, classes=[0]), args.repeat), 2),
+            f"fps_batch{len(batch)}": round(len(batch) / _time(lambda: model(batch, verbose=False, classes=[0]), args.repeat), 2)
+        }
+        print(f"yolo {spec:15s} " + "  ".join(f"{k} {v}" for k, v in results[spec].items()))
+    return results
+
+
+def bench_reid(args, frames, calibration) -> Dict[str, dict]:
+    from services.reid import ReIDExtractor
+
+    detector = inference_backend.load_yolo(args.weights, "torch")
+    crops = [f[y1:y2, x1:x2] for f, boxes in zip(frames, detect_all(detector, frames, args.conf))
+             for x1, y1, x2, y2 in boxes if x2 - x1 > 4 and y2 - y1 > 8][:args.crops]
+    if len(crops) < 2:
+        print("reid: fewer than 2 person crops in the clip, skipped")
+        return {}
+
+    results = {}
+    reference = None
+    for spec in args.backends:
+        runtime, int8 = inference_backend.parse_backend(spec)
+        reid = ReIDExtractor(device="cpu", backend="torch")
+        if runtime != "torch":
+            path = inference_backend.export_reid(reid.model, runtime, int8, calibration=calibration)
+            reid.runner = (inference_backend.OnnxRunner(path) if runtime == "onnx"
+                           else inference_backend.OpenVINORunner(path))
+            reid.backend = spec
+        reid.extract_batch(crops[:2])  # warm-up
+        feats = reid.extract_batch(crops)[0]
+        if reference is None:
+            reference = feats
+
+        cos = (feats * reference).sum(axis=1)
+        ref_sim, sim = reference @ reference.T, feats @ feats.T
+        np.fill_diagonal(ref_sim, -np.inf)
+        np.fill_diagonal(sim, -np.inf)
+        results[spec] = {
+            "cosine_mean": round(float(cos.mean()), 4),
+            "cosine_min": round(float(cos.min()), 4),
+            "rank1_agreement": round(float((ref_sim.argmax(1) == sim.argmax(1)).mean()), 4),
+            "emb_per_s": round(len(crops) / _time(lambda: reid.extract_batch(crops), args.repeat), 1)
+        }
+        print(f"reid {spec:15s} " + "  ".join(f"{k} {v}" for k, v in results[spec].items()))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare torch / ONNX Runtime / OpenVINO backends")
+    parser.add_argument("--clip", required=True, help="Local video to evaluate on")
+    parser.add_argument("--frames", type=int, default=64, help="Evaluation frames")
+    parser.add_argument("--models", nargs="+", default=["yolo", "reid"], choices=["yolo", "reid"])
+    parser.add_argument("--backends", nargs="+",
+                        default=["torch", "onnx", "onnx-int8", "openvino", "openvino-int8"])
+    parser.add_argument("--weights", default="AI_models/yolov8n.pt")
+    parser.add_argument("--conf", type=float, default=0.3)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--crops", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    for spec in args.backends:
+        inference_backend.parse_backend(spec)
+
+    import cv2
+    cap = cv2.VideoCapture(args.clip)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    if total < 2:
+        parser.error(f"cannot read frames from {args.clip}")
+    frames = sample_video_frames(args.clip, args.frames, 0, total // 2)
+    calibration = sample_video_frames(args.clip, inference_backend.CALIBRATION_FRAMES, total // 2, total)
+
+    report = {"clip": args.clip, "frames": len(frames), "calibration_frames": len(calibration)}
+    if "yolo" in args.models:
+        report["yolo"] = bench_yolo(args, frames, calibration)
+    if "reid" in args.models:
+        report["reid"] = bench_reid(args, frames, calibration)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"backends_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
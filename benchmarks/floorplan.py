@@ -0,0 +1,99 @@
+# benchmarks/floorplan.py
+"""
+Seeded synthetic floor plan generator for benchmarks.
+
+Produces a building laid out as a grid of rooms separated by 1-cell walls,
+with every other band of rooms opened up into a corridor, a door in every
+wall segment between neighbouring spaces and exits cut into the outer wall.
+Cell codes follow services.grid.Grid (0 free, 1 wall, 3 exit).
+"""
+from typing import List, Tuple, Dict
+
+import numpy as np
+
+# name -> (rows, cols); "demo" matches the shipped matrix/*.csv floors
+SIZES: Dict[str, Tuple[int, int]] = {
+    "demo": (28, 19),
+    "small": (100, 100),
+    "medium": (250, 250),
+    "large": (500, 500),
+    "xlarge": (1000, 1000),
+    "xxlarge": (2000, 2000),
+}
+
+
+class FloorPlan:
+    def __init__(self, mat: np.ndarray, exits: List[Tuple[int, int]], start: Tuple[int, int],
+                 fire: Tuple[int, int], signboards: List[Tuple[int, int]]):
+        self.mat = mat
+        self.exits = exits
+        self.start = start
+        self.fire = fire
+        self.signboards = signboards
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.mat.shape
+
+    def to_csv(self, path: str):
+        """Write in the matrix/*.csv layout read by services.floors.load_floor_matrix."""
+        import pandas as pd
+        pd.DataFrame(self.mat).to_csv(path)
+
+
+def generate_floorplan(rows: int, cols: int, seed: int = 0, n_exits: int = 3,
+                       n_signboards: int = 10) -> FloorPlan:
+    rng = np.random.default_rng(seed)
+    mat = np.zeros((rows, cols), dtype=int)
+
+    # Room pitch scales with the floor so large plans are not a maze of closets
+    pitch = max(5, min(rows, cols) // 8)
+    mat[::pitch, :] = 1
+    mat[:, ::pitch] = 1
+    mat[-1, :] = 1
+    mat[:, -1] = 1
+
+    # Every other band of rooms becomes an east-west corridor
+    band_starts = list(range(0, rows - 1, pitch))
+    for i, r0 in enumerate(band_starts):
+        r1 = min(r0 + pitch, rows - 1)
+        if i % 2 == 1:
+            mat[r0 + 1:r1, 1:cols - 1] = 0
+
+    # One door per wall segment between neighbouring spaces
+    for r in range(pitch, rows - 1, pitch):
+        for c0 in range(0, cols - 1, pitch):
+            c1 = min(c0 + pitch, cols - 1)
+            if c1 - c0 > 1:
+                mat[r, rng.integers(c0 + 1, c1)] = 0
+    for c in range(pitch, cols - 1, pitch):
+        for r0 in range(0, rows - 1, pitch):
+            r1 = min(r0 + pitch, rows - 1)
+            if r1 - r0 > 1:
+                mat[rng.integers(r0 + 1, r1), c] = 0
+
+    # Exits on the outer wall next to free interior cells
+    candidates = [(0, c) for c in range(1, cols - 1) if mat[1, c] == 0]
+    candidates += [(rows - 1, c) for c in range(1, cols - 1) if mat[rows - 2, c] == 0]
+    candidates += [(r, 0) for r in range(1, rows - 1) if mat[r, 1] == 0]
+    candidates += [(r, cols - 1) for r in range(1, rows - 1) if mat[r, cols - 2] == 0]
+    picks = rng.choice(len(candidates), size=min(n_exits, len(candidates)), replace=False)
+    exits = [tuple(int(v) for v in candidates[i]) for i in sorted(picks)]
+    for r, c in exits:
+        mat[r, c] = 3
+
+    free = np.argwhere(mat == 0)
+
+    # Start: free cell farthest from every exit; fire: any other free cell
+    dists = np.full(len(free), np.iinfo(np.int64).max)
+    for r, c in exits:
+        dists = np.minimum(dists, np.abs(free[:, 0] - r) + np.abs(free[:, 1] - c))
+    start = tuple(int(v) for v in free[np.argmax(dists)])
+    fire = tuple(int(v) for v in free[rng.integers(len(free))])
+    while fire == start:
+        fire = tuple(int(v) for v in free[rng.integers(len(free))])
+
+    sign_idx = rng.choice(len(free), size=min(n_signboards, len(free)), replace=False)
+    signboards = [tuple(int(v) for v in free[i]) for i in sign_idx]
+
+    return FloorPlan(mat, exits, start, fire, signboards)
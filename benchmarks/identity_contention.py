@@ -0,0 +1,110 @@
+# benchmarks/identity_contention.py
+"""
+IdentityManager lock contention: N camera threads matching features while M
+API pollers read /reid/identities-style data.
+
+    python -m benchmarks.identity_contention                      # 8 cameras, 4 pollers
+    python -m benchmarks.identity_contention --cameras 16 --pollers 8 --identities 20000
+
+Reports camera-side register_or_match_batch latency (p50/p99/max) and poller
+throughput for the versioned read views, and for comparison with readers that
+build their result while holding the camera lock (the previous behaviour).
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+
+import numpy as np
+
+from services.identity_manager import IdentityManager
+
+
+def _locked_get_all_identities(im: IdentityManager) -> dict:
+    """Previous get_all_identities(): builds the whole dict under the camera lock."""
+    with im.lock:
+        g = im.gallery
+        return {gid: {**g.metadata(gid), "videos": list(g.metadata(gid)["videos"])} for gid in g.all_ids()}
+
+
+def _unit(rng, n, dim):
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def run(cameras: int, pollers: int, identities: int, dim: int, seconds: float, locked_readers: bool,
+        poll_interval: float = 0.02) -> dict:
+    rng = np.random.default_rng(0)
+    im = IdentityManager(similarity_threshold=0.75)
+    protos = _unit(rng, identities, dim)
+    for i in range(0, identities, 1000):
+        im.register_or_match_batch(protos[i:i + 1000], f"cam{(i // 1000) % cameras}")
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(cameras)]
+    polls = [0] * pollers
+
+    def camera(k):
+        r = np.random.default_rng(k + 1)
+        while not stop.is_set():
+            people = protos[r.integers(0, identities, 6)]
+            feats = people + r.normal(scale=0.02, size=people.shape).astype(np.float32)
+            feats /= np.linalg.norm(feats, axis=1, keepdims=True)
+            t0 = time.perf_counter()
+            im.register_or_match_batch(feats, f"cam{k}")
+            latencies[k].append(time.perf_counter() - t0)
+            time.sleep(0.005)  # rest of the frame pipeline
+
+    def poller(k):
+        while not stop.is_set():
+            if locked_readers:
+                _locked_get_all_identities(im)
+            else:
+                im.get_all_identities()
+                im.get_statistics()
+            polls[k] += 1
+            time.sleep(poll_interval)
+
+    threads = [threading.Thread(target=camera, args=(k,)) for k in range(cameras)]
+    threads += [threading.Thread(target=poller, args=(k,)) for k in range(pollers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    lat = np.concatenate([np.asarray(l) for l in latencies]) * 1000
+    return {
+        "frames": len(lat),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(lat.max()),
+        "polls_per_s": sum(polls) / seconds
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IdentityManager contention benchmark")
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--pollers", type=int, default=4)
+    parser.add_argument("--identities", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--poll-interval", type=float, default=0.02, help="Seconds between polls per poller")
+    args = parser.parse_args(argv)
+
+    print(f"{args.cameras} cameras, {args.pollers} pollers, {args.identities} identities")
+    print(f"{'readers':>14} {'frames':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'polls/s':>8}")
+    for locked in (True, False):
+        with contextlib.redirect_stdout(io.StringIO()):  # silence per-match logging
+            r = run(args.cameras, args.pollers, args.identities, args.dim, args.seconds, locked,
+                    args.poll_interval)
+        name = "locked (old)" if locked else "read views"
+        print(f"{name:>14} {r['frames']:>7} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['max_ms']:>8.2f} {r['polls_per_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
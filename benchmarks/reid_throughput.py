@@ -0,0 +1,73 @@
+# benchmarks/reid_throughput.py
+"""
+Re-ID embedding throughput: per-crop extract() vs batched extract_batch().
+
+    python -m benchmarks.reid_throughput                      # crowds of 1..64 people
+    python -m benchmarks.reid_throughput --crowds 4 16 48 --repeat 5
+
+Needs torch + torchreid (the OSNet weights are downloaded on first use).
+Crops are random person-sized BGR images, so only speed is meaningful.
+Also reports how far the OpenCV preprocessing path drifts from the PIL
+reference transform (cosine similarity of the resulting embeddings).
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+import torch
+
+from services.reid import ReIDExtractor
+
+
+def make_crops(n: int, seed: int = 0) -> List[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(n):
+        h = int(rng.integers(80, 320))
+        w = int(h / rng.uniform(1.8, 3.0))
+        crops.append(rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8))
+    return crops
+
+
+def _time(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def reference_similarity(reid: ReIDExtractor, crops: List[np.ndarray]) -> float:
+    """Lowest cosine similarity between extract_batch() and the PIL transform path."""
+    fast = reid.extract_batch(crops)[0]
+    x = torch.stack([reid.transform(np.ascontiguousarray(c[..., ::-1])) for c in crops]).to(reid.device)
+    with torch.no_grad():
+        ref = reid.model(x).cpu().numpy()
+    ref /= np.linalg.norm(ref, axis=1, keepdims=True) + 1e-8
+    return float((fast * ref).sum(axis=1).min())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-ID embeddings/sec vs crowd size")
+    parser.add_argument("--crowds", nargs="+", type=int, default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--device", default=None)
+    args = parser.parse_args(argv)
+
+    reid = ReIDExtractor(device=args.device)
+    reid.extract_batch(make_crops(2))  # warm-up
+    print(f"OpenCV vs PIL preprocessing: min cosine similarity {reference_similarity(reid, make_crops(16)):.4f}")
+
+    print(f"{'crowd':>6} {'per-crop emb/s':>15} {'batched emb/s':>15} {'speedup':>8}")
+    for n in args.crowds:
+        crops = make_crops(n)
+        single = _time(lambda: [reid.extract(c) for c in crops], args.repeat)
+        batched = _time(lambda: reid.extract_batch(crops), args.repeat)
+        print(f"{n:>6} {n / single:>15.1f} {n / batched:>15.1f} {single / batched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmarks for routing, fire model and signboard planning.
+
+    python -m benchmarks.run_benchmarks                         # demo + small floors
+    python -m benchmarks.run_benchmarks --sizes demo medium xxlarge --repeat 1
+    python -m benchmarks.run_benchmarks --save-baseline         # store as baseline
+    python -m benchmarks.run_benchmarks --threshold 0.25        # fail on >25% slowdown
+
+Results are written to benchmarks/results/<timestamp>.json. When
+benchmarks/baseline.json exists, every benchmark present in both is compared
+by median time and the run exits with status 1 if any regressed past the
+threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.floorplan import SIZES, FloorPlan, generate_floorplan
+from services.grid import Grid
+from services.fire_model import FireModel
+from services.ant_colony import AntColony
+from services.signboard_system import generate_signboard_plan
+from services.visualize_signboard import detect_rooms, visualize_signboard_plan
+from services.visualize import generate_evacuation_image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+STAGES = ["initial", "growth", "spread"]
+
+
+def _burning(fp: FloorPlan, stage: str):
+    grid = Grid(fp.mat.tolist())
+    fire = FireModel(grid)
+    fire.ignite([fp.fire])
+    fire.stage_update(stage)
+    return grid, fire
+
+
+def _benchmarks(fp: FloorPlan, seed: int, workdir: str) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """
+    name -> setup(); setup returns the timed callable, so grid/fire construction
+    is not part of the measurement unless it is what is being measured.
+    """
+    benches = {}
+
+    for stage in STAGES:
+        def setup(stage=stage):
+            grid = Grid(fp.mat.tolist())
+            fire = FireModel(grid)
+            fire.ignite([fp.fire])
+            return lambda: fire.stage_update(stage)
+        benches[f"fire_stage_update[{stage}]"] = setup
+
+    def setup_aco():
+        grid, fire = _burning(fp, "growth")
+        aco = AntColony(grid, fire, fp.start, fp.exits, m_ants=30, alpha=1.0, beta=5.0,
+                        rho=0.3, Q=15.0, max_iter=50, seed=seed)
+        return aco.run
+    benches["ant_colony_run"] = setup_aco
+
+    def setup_astar():
+        grid, fire = _burning(fp, "growth")
+        aco = AntColony(grid, fire, fp.start, fp.exits, seed=seed)
+        return aco._a_star
+    benches["a_star"] = setup_astar
+
+    def setup_plan():
+        grid, fire = _burning(fp, "growth")
+        rooms = detect_rooms(grid, fire)
+        return lambda: generate_signboard_plan(grid, fire, fp.exits, fp.signboards, rooms)
+    benches["generate_signboard_plan"] = setup_plan
+
+    def setup_route_image():
+        csv_path = os.path.join(workdir, "floor.csv")
+        fp.to_csv(csv_path)
+        return lambda: generate_evacuation_image(csv_path, fp.start, fp.exits, [fp.fire], "growth",
+                                                 consider_fire=True)
+    benches["visualize_route"] = setup_route_image
+
+    def setup_sign_image():
+        grid, fire = _burning(fp, "growth")
+        plan = generate_signboard_plan(grid, fire, fp.exits, fp.signboards, detect_rooms(grid, fire))
+        return lambda: visualize_signboard_plan(grid, fire, fp.exits, plan, 0, 0, "growth", True)
+    benches["visualize_signboard"] = setup_sign_image
+
+    return benches
+
+
+def run(sizes: List[str], repeat: int, seed: int, only: List[str] = None) -> dict:
+    results = {}
+    # Visualizers write to ./output; keep that out of the repository
+    workdir = tempfile.mkdtemp(prefix="evac_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for size in sizes:
+            rows, cols = SIZES[size]
+            fp = generate_floorplan(rows, cols, seed=seed)
+            for name, setup in _benchmarks(fp, seed, workdir).items():
+                if only and not any(o in name for o in only):
+                    continue
+                times = []
+                for _ in range(repeat):
+                    fn = setup()
+                    t0 = time.perf_counter()
+                    fn()
+                    times.append(time.perf_counter() - t0)
+                key = f"{name}@{size}"
+                results[key] = {
+                    "median_s": statistics.median(times),
+                    "min_s": min(times),
+                    "runs": times
+                }
+                print(f"{key:45s} median {results[key]['median_s'] * 1000:10.2f} ms")
+    finally:
+        os.chdir(cwd)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "sizes": {s: SIZES[s] for s in sizes}
+        },
+        "results": results
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Names of benchmarks whose median regressed by more than `threshold` (fraction)."""
+    regressions = []
+    for key, res in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = res["median_s"] / max(base["median_s"], 1e-9)
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{key}: {base['median_s'] * 1000:.2f} ms -> {res['median_s'] * 1000:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Routing and fire-model benchmarks")
+    parser.add_argument("--sizes", nargs="+", default=["demo", "small"], choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="Run benchmarks whose name contains any of these")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.repeat, args.seed, args.only)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {out_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found - skipping regression check")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"REGRESSIONS (> {args.threshold:.0%} slower than baseline):")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
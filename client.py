@@ -4,7 +4,7 @@ import json
 from datetime import datetime
 
 async def listen():
-    uri = "ws://localhost:8000/ws"
+    uri = "ws://localhost:8000/ws?mode=full"  # whole status on every update, no deltas
     
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Connecting to {uri}...")
     
@@ -7,6 +7,11 @@ from api.human_detection import router as human_detection_router
 from api.signboard_endpoints import signboard_router
 from api.reid import router as reid_router
 from api.stair_case import router as stair_case_router
+from api.metrics import router as metrics_router, timing_middleware
+from api.streams import router as streams_router
+from services.compute_pool import shutdown_pool
+from services.inference_scheduler import shutdown_schedulers
+from services.process_workers import shutdown_workers
 
 app = FastAPI(title="Fire Evacuation Route API - Multi-Video Person Re-ID")
 
@@ -19,9 +24,21 @@ app.include_router(human_detection_router)
 app.include_router(signboard_router)
 app.include_router(reid_router)
 app.include_router(stair_case_router)
+app.include_router(metrics_router)
+app.include_router(streams_router)
+
+# Per-phase Server-Timing for the routing endpoints
+app.middleware("http")(timing_middleware)
 
 # Root endpoint - redirect to dashboard
 @app.get("/")
 async def root():
     """Redirect to the Re-ID dashboard"""
-    return RedirectResponse(url="/static/index.html")
\ No newline at end of file
+    return RedirectResponse(url="/static/index.html")
+
+
+@app.on_event("shutdown")
+def _shutdown_workers():
+    shutdown_workers()
+    shutdown_pool()
+    shutdown_schedulers()
@@ -0,0 +1,88 @@
+# route_client.py
+"""
+Decoder for the compact binary route format (see services/route_codec.py).
+
+Standalone on purpose: only needs the standard library, so it can be copied
+onto signboard controllers and handhelds.
+
+    python route_client.py "evacuation?start_row=5&start_col=5&..."
+"""
+import struct
+import sys
+import urllib.request
+
+MEDIA_TYPE = "application/vnd.evac.route"
+
+DIRECTIONS = [
+    (0, 1), (1, 1), (1, 0), (1, -1),
+    (0, -1), (-1, -1), (-1, 0), (-1, 1),
+]
+ARROWS = ["→", "↗", "↑", "↖", "←", "↙", "↓", "↘"]
+STAGES = ["initial", "growth", "spread"]
+
+_HEADER = struct.Struct("<2sBB")
+_ROUTE = struct.Struct("<BHHfH")
+_SIGNS = struct.Struct("<BBBBH")
+
+
+def decode_path(start, runs):
+    """Expand (start cell, run bytes) back into a list of (r, c) cells."""
+    r, c = start
+    path = [(r, c)]
+    for b in runs:
+        dr, dc = DIRECTIONS[b >> 5]
+        for _ in range((b & 0x1F) + 1):
+            r, c = r + dr, c + dc
+            path.append((r, c))
+    return path
+
+
+def _arrow(code):
+    if code < len(ARROWS):
+        return ARROWS[code]
+    if code == 8:
+        return "BLOCKED"
+    if code == 9:
+        return "EXIT"
+    return None
+
+
+def decode(payload):
+    """Decode a route or signboard payload into a dict shaped like the JSON responses."""
+    magic, version, kind = _HEADER.unpack_from(payload, 0)
+    if magic != b"EV" or version != 1:
+        raise ValueError("Not an evacuation route payload")
+    offset = _HEADER.size
+
+    if kind == 1:
+        flags, r, c, length, n_runs = _ROUTE.unpack_from(payload, offset)
+        offset += _ROUTE.size
+        runs = payload[offset:offset + n_runs]
+        return {
+            "path": decode_path((r, c), runs),
+            "length": length,
+            "fire_considered": bool(flags & 1),
+        }
+
+    if kind == 2:
+        floor, fire_floor, stage, flags, count = _SIGNS.unpack_from(payload, offset)
+        offset += _SIGNS.size
+        packed = struct.unpack_from(f"<{count}H", payload, offset)
+        return {
+            "floor": floor,
+            "fire_floor": fire_floor,
+            "fire_stage": STAGES[stage],
+            "fire_active": bool(flags & 1),
+            "signboards": {f"SIGN_{v >> 4}": {"signal": _arrow(v & 0xF)} for v in packed},
+        }
+
+    raise ValueError(f"Unknown payload kind {kind}")
+
+
+if __name__ == "__main__":
+    query = sys.argv[1] if len(sys.argv) > 1 else "evacuation"
+    req = urllib.request.Request(f"http://localhost:8000/{query}", headers={"Accept": MEDIA_TYPE})
+    with urllib.request.urlopen(req) as resp:
+        body = resp.read()
+    print(f"{len(body)} bytes")
+    print(decode(body))
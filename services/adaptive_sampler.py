@@ -0,0 +1,146 @@
+# services/adaptive_sampler.py
+"""
+Lag-adaptive frame sampling for the camera pipelines.
+
+Not every frame needs YOLO + DeepSORT. On skipped frames the tracker's Kalman
+filter carries tracks forward (DeepSortWrapper.predict()), and Re-ID only runs
+on some of the detection frames. AdaptiveSampler picks the detection stride
+and the Re-ID stride at runtime from measured per-stage costs (EMA), so that
+the average cost per frame fits the frame budget:
+
+    budget       = min(1 / target_fps, 1 / source_fps)   (whichever is configured)
+    cost(ds, rs) = base + detect / ds + predict * (1 - 1/ds) + reid / rs
+
+The smallest detection stride that fits wins, then the smallest Re-ID stride
+(a multiple of the detection stride, so Re-ID always sees fresh detections).
+If the measured lag still exceeds max_lag_ms (file position behind real time,
+or capture-to-result latency for live cameras) the detection stride is raised
+one step further until the lag has halved.
+
+Configuration (environment variables):
+    EVAC_TARGET_FPS          frames per second each pipeline must keep up with (default: unset)
+    EVAC_MAX_LAG_MS          lag tolerated before strides grow; also makes the pipeline
+                             keep up with the source frame rate (default: unset = off)
+    EVAC_MAX_DETECT_STRIDE   upper bound for the detection stride (default 4)
+With neither EVAC_TARGET_FPS nor EVAC_MAX_LAG_MS every frame is detected and
+Re-ID runs every `min_reid_stride` frames, as before.
+"""
+import os
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+TARGET_FPS = float(os.environ.get("EVAC_TARGET_FPS", 0)) or None
+MAX_LAG_MS = float(os.environ.get("EVAC_MAX_LAG_MS", 0)) or None
+MAX_DETECT_STRIDE = int(os.environ.get("EVAC_MAX_DETECT_STRIDE", 4))
+RATE_WINDOW = 128  # stage timestamps kept for the effective-rate estimate
+
+
+def _round_up(value: int, multiple: int) -> int:
+    return -(-value // multiple) * multiple
+
+
+class AdaptiveSampler:
+    def __init__(self, target_fps: Optional[float] = TARGET_FPS, max_lag_ms: Optional[float] = MAX_LAG_MS,
+                 min_reid_stride: int = 1, max_detect_stride: int = MAX_DETECT_STRIDE,
+                 max_reid_stride: int = 60, adjust_every: int = 10, alpha: float = 0.2):
+        self.target_fps = target_fps
+        self.max_lag_ms = max_lag_ms
+        self.min_reid_stride = max(1, int(min_reid_stride))
+        self.max_detect_stride = max(1, int(max_detect_stride))
+        self.max_reid_stride = max(self.min_reid_stride, int(max_reid_stride))
+        self.adjust_every = adjust_every
+        self.alpha = alpha
+
+        self.detect_stride = 1
+        self.reid_stride = self.min_reid_stride
+        self.frame = 0
+        self.source_fps: Optional[float] = None
+        self.lag_ms = 0.0
+        self._lag_boost = 0
+        self.cost = {"base": 0.0, "detect": 0.0, "predict": 0.0, "reid": 0.0}  # seconds, EMA
+        self._seen = set()
+        self._frame_stages = 0.0
+        self._detect_times = deque(maxlen=RATE_WINDOW)
+        self._reid_times = deque(maxlen=RATE_WINDOW)
+
+    @property
+    def adaptive(self) -> bool:
+        return self.target_fps is not None or self.max_lag_ms is not None
+
+    def plan(self) -> Tuple[bool, bool]:
+        """(run detection, run Re-ID) for the next frame."""
+        i = self.frame
+        self.frame += 1
+        detect = i % self.detect_stride == 0
+        return detect, detect and i % self.reid_stride == 0
+
+    def record(self, stage: str, seconds: float):
+        """Cost of one stage ("detect", "predict" or "reid") on the current frame."""
+        if stage in self._seen:
+            self.cost[stage] += self.alpha * (seconds - self.cost[stage])
+        else:
+            self.cost[stage] = seconds
+            self._seen.add(stage)
+        self._frame_stages += seconds
+        if stage == "detect":
+            self._detect_times.append(time.monotonic())
+        elif stage == "reid":
+            self._reid_times.append(time.monotonic())
+
+    def frame_done(self, seconds: float, lag_ms: Optional[float] = None, source_fps: Optional[float] = None):
+        """Total time spent on the frame (stages + everything else) and the current lag."""
+        self.record("base", max(0.0, seconds - self._frame_stages))
+        self._frame_stages = 0.0
+        if lag_ms is not None:
+            self.lag_ms = lag_ms
+        if source_fps:
+            self.source_fps = source_fps
+        if self.adaptive and self.frame % self.adjust_every == 0:
+            self._adjust()
+
+    def _budget(self) -> Optional[float]:
+        budgets = []
+        if self.target_fps:
+            budgets.append(1.0 / self.target_fps)
+        if self.max_lag_ms is not None and self.source_fps:
+            budgets.append(1.0 / self.source_fps)
+        return min(budgets) if budgets else None
+
+    def _expected(self, ds: int, rs: int) -> float:
+        c = self.cost
+        return c["base"] + c["detect"] / ds + c["predict"] * (1 - 1 / ds) + c["reid"] / rs
+
+    def _adjust(self):
+        if self.max_lag_ms is not None:
+            if self.lag_ms > self.max_lag_ms:
+                self._lag_boost = min(self._lag_boost + 1, self.max_detect_stride - 1)
+            elif self.lag_ms < self.max_lag_ms / 2:
+                self._lag_boost = max(self._lag_boost - 1, 0)
+
+        ds, rs = 1, self.min_reid_stride
+        budget = self._budget()
+        if budget is not None:
+            ds = next((d for d in range(1, self.max_detect_stride + 1)
+                       if self._expected(d, self.max_reid_stride) <= budget), self.max_detect_stride)
+            rs = next((r for r in range(_round_up(self.min_reid_stride, ds), self.max_reid_stride + 1, ds)
+                       if self._expected(ds, r) <= budget), self.max_reid_stride)
+        self.detect_stride = min(ds + self._lag_boost, self.max_detect_stride)
+        self.reid_stride = _round_up(max(rs, self.min_reid_stride), self.detect_stride)
+
+    @staticmethod
+    def _rate(times: deque) -> float:
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / max(times[-1] - times[0], 1e-6)
+
+    def get_stats(self) -> dict:
+        """Current strides and the effective sample rates counts and densities are based on."""
+        return {
+            "detect_stride": self.detect_stride,
+            "reid_stride": self.reid_stride,
+            "detection_fps": round(self._rate(self._detect_times), 2),
+            "reid_fps": round(self._rate(self._reid_times), 2),
+            "lag_ms": round(self.lag_ms, 1),
+            "stage_ms": {k: round(v * 1000, 2) for k, v in self.cost.items()}
+        }
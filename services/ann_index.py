@@ -0,0 +1,261 @@
+# services/ann_index.py
+"""
+Approximate nearest-neighbour index for large identity galleries (pure NumPy).
+
+IVFIndex is an inverted-file index over L2-normalized embeddings: a spherical
+k-means codebook splits the gallery into `n_lists` cells, each cell keeps its
+vectors in its own contiguous matrix, and a query is only scored against the
+`n_probe` cells whose centroids are closest. Inserts, in-place updates (an
+identity's embedding after an EMA refinement) and deletes are incremental;
+the codebook is retrained when the gallery has grown `retrain_factor` times
+since the last training.
+
+The retrain runs on a background thread from a snapshot of the indexed
+vectors, so the caller's lock is not held through k-means. The finished
+codebook (with the snapshot already assigned to its cells) is swapped in on
+the next add() or search(); entries changed while it was training are
+re-inserted from their current vectors at that point.
+"""
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+def spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Unit-norm centroids (k, D) for unit-norm rows of x."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms < 1e-8
+        # Re-seed empty cells with random points so k stays effective
+        if empty.any():
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+            norms[empty] = np.linalg.norm(sums[empty], axis=1)
+        centroids = sums / norms[:, None]
+    return centroids.astype(np.float32)
+
+
+class _InvertedList:
+    __slots__ = ("ids", "vecs", "size")
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vecs = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+
+    def append(self, gid: int, vec: np.ndarray) -> int:
+        if self.size == len(self.ids):
+            cap = 2 * len(self.ids)
+            ids, vecs = np.zeros(cap, dtype=np.int64), np.zeros((cap, self.vecs.shape[1]), dtype=np.float32)
+            ids[:self.size], vecs[:self.size] = self.ids[:self.size], self.vecs[:self.size]
+            self.ids, self.vecs = ids, vecs
+        pos = self.size
+        self.ids[pos] = gid
+        self.vecs[pos] = vec
+        self.size += 1
+        return pos
+
+    def pop(self, pos: int) -> Optional[int]:
+        """Remove the entry at pos; returns the id moved into pos (if any)."""
+        last = self.size - 1
+        moved = None
+        if pos != last:
+            self.ids[pos] = self.ids[last]
+            self.vecs[pos] = self.vecs[last]
+            moved = int(self.ids[pos])
+        self.size -= 1
+        return moved
+
+
+class IVFIndex:
+    def __init__(self, dim: int, n_lists: Optional[int] = None, n_probe: int = 8,
+                 retrain_factor: float = 4.0, train_sample: int = 20000, seed: int = 0,
+                 background: bool = True):
+        self.dim = dim
+        self.n_lists_cfg = n_lists
+        self.n_probe = n_probe
+        self.retrain_factor = retrain_factor
+        self.train_sample = train_sample
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[_InvertedList] = []
+        self._where: Dict[int, Tuple[int, int]] = {}  # global_id -> (list, position)
+        self._trained_at = 0
+        self.retrains = 0
+        self.background = background
+        self._generation = 0  # bumped by build()/clear(); stale retrains are discarded
+        self._retrain_thread: Optional[threading.Thread] = None
+        self._pending = None  # finished background retrain waiting to be swapped in
+        self._dirty: Optional[Set[int]] = None  # ids changed since the retrain snapshot
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, gid: int) -> bool:
+        return gid in self._where
+
+    # -- building ------------------------------------------------------------
+
+    def build(self, ids: np.ndarray, vecs: np.ndarray):
+        """(Re)train the codebook on `vecs` and index all of them."""
+        self._generation += 1
+        self._pending, self._dirty = None, None
+        self.centroids, self.lists, self._where = self._train(ids, vecs)
+        self._trained_at = len(ids)
+        self.retrains += 1
+
+    def _train(self, ids: np.ndarray, vecs: np.ndarray):
+        """Codebook for `vecs` and inverted lists holding all of them; touches no index state."""
+        n = len(ids)
+        k = self.n_lists_cfg or max(1, int(4 * np.sqrt(n)))
+        k = min(k, n)
+        rng = np.random.default_rng(self.seed)
+        sample = vecs if n <= self.train_sample else vecs[rng.choice(n, self.train_sample, replace=False)]
+        centroids = spherical_kmeans(np.asarray(sample, dtype=np.float32), k, seed=self.seed)
+        lists = [_InvertedList(self.dim) for _ in range(k)]
+        where = {}
+        assign = np.argmax(vecs @ centroids.T, axis=1)
+        for gid, vec, cell in zip(ids, vecs, assign):
+            pos = lists[cell].append(int(gid), vec)
+            where[int(gid)] = (int(cell), pos)
+        return centroids, lists, where
+
+    def _cell(self, vec: np.ndarray) -> int:
+        return int(np.argmax(self.centroids @ vec))
+
+    def _needs_retrain(self) -> bool:
+        if self._dirty is not None or self._pending is not None:
+            return False  # a retrain is already in flight
+        return len(self._where) >= self.retrain_factor * max(self._trained_at, 1)
+
+    def _start_retrain(self):
+        ids, vecs = self._all()  # copies: the thread never sees the live lists
+        if not self.background:
+            self.build(ids, vecs)
+            return
+        self._dirty = set()
+        self._retrain_thread = threading.Thread(
+            target=self._retrain, args=(self._generation, ids, vecs), name="ivf-retrain", daemon=True)
+        self._retrain_thread.start()
+
+    def _retrain(self, generation: int, ids: np.ndarray, vecs: np.ndarray):
+        try:
+            trained = self._train(ids, vecs)
+        except Exception as e:
+            print(f"IVF retrain failed: {e}")
+            trained = None
+        if generation == self._generation:  # not cleared or rebuilt meanwhile
+            self._pending = (generation, len(ids), trained)
+
+    def _swap_pending(self):
+        """Install a finished background retrain, catching up on what changed meanwhile."""
+        pending, self._pending = self._pending, None
+        dirty, self._dirty = self._dirty, None
+        if pending is None:
+            self._dirty = dirty
+            return
+        generation, n, trained = pending
+        if generation != self._generation:
+            self._dirty = dirty
+            return
+        if trained is None:
+            self._trained_at = n  # failed: try again after the next growth step
+            return
+        centroids, lists, where = trained
+        current = {}
+        for gid in dirty or ():
+            if gid in self._where:
+                cell, pos = self._where[gid]
+                current[gid] = self.lists[cell].vecs[pos].copy()
+        self.centroids, self.lists, self._where = centroids, lists, where
+        for gid in dirty or ():
+            if gid in self._where:
+                self.remove(gid)
+        for gid, vec in current.items():
+            cell = self._cell(vec)
+            self._where[gid] = (cell, self.lists[cell].append(gid, vec))
+        self._trained_at = n
+        self.retrains += 1
+
+    def wait_for_retrain(self, timeout: Optional[float] = None):
+        """Block until a background retrain has finished and swap it in (tests, benchmarks)."""
+        thread = self._retrain_thread
+        if thread is not None:
+            thread.join(timeout)
+        self._swap_pending()
+
+    def _touch(self, gid: int):
+        if self._dirty is not None:
+            self._dirty.add(gid)
+
+    def _all(self) -> Tuple[np.ndarray, np.ndarray]:
+        ids = np.concatenate([l.ids[:l.size] for l in self.lists])
+        vecs = np.concatenate([l.vecs[:l.size] for l in self.lists])
+        return ids, vecs
+
+    # -- incremental updates -------------------------------------------------
+
+    def add(self, gid: int, vec: np.ndarray):
+        if self.centroids is None:
+            self.build(np.array([gid]), vec[None, :].astype(np.float32))
+            return
+        self._swap_pending()
+        self._touch(gid)
+        cell = self._cell(vec)
+        self._where[gid] = (cell, self.lists[cell].append(gid, vec))
+        if self._needs_retrain():
+            self._start_retrain()
+
+    def update(self, gid: int, vec: np.ndarray):
+        """Replace an identity's embedding; moves it to another cell if needed."""
+        self._touch(gid)
+        cell, pos = self._where[gid]
+        new_cell = self._cell(vec)
+        if new_cell == cell:
+            self.lists[cell].vecs[pos] = vec
+        else:
+            self.remove(gid)
+            self._where[gid] = (new_cell, self.lists[new_cell].append(gid, vec))
+
+    def remove(self, gid: int):
+        self._touch(gid)
+        cell, pos = self._where.pop(gid)
+        moved = self.lists[cell].pop(pos)
+        if moved is not None:
+            self._where[moved] = (cell, pos)
+
+    def clear(self):
+        self._generation += 1
+        self._pending, self._dirty = None, None
+        self.centroids = None
+        self.lists = []
+        self._where.clear()
+        self._trained_at = 0
+
+    # -- search --------------------------------------------------------------
+
+    def search(self, vec: np.ndarray, n_probe: Optional[int] = None) -> Tuple[Optional[int], float]:
+        """(global_id, dot product) of the best candidate in the probed cells."""
+        self._swap_pending()
+        if not self._where:
+            return None, 0.0
+        n_probe = min(n_probe or self.n_probe, len(self.lists))
+        cscore = self.centroids @ vec
+        cells = np.argpartition(-cscore, n_probe - 1)[:n_probe] if n_probe < len(cscore) else range(len(cscore))
+        best_id, best = None, -np.inf
+        for cell in cells:
+            l = self.lists[cell]
+            if l.size == 0:
+                continue
+            d = l.vecs[:l.size] @ vec
+            i = int(np.argmax(d))
+            if d[i] > best:
+                best, best_id = float(d[i]), int(l.ids[i])
+        if best_id is None:
+            return None, 0.0
+        return best_id, best
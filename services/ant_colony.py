@@ -5,6 +5,7 @@ import numpy as np
 from typing import List, Tuple, Dict, Optional
 from services.grid import Grid
 from services.fire_model import FireModel
+from services.instrumentation import phase, count
 
 
 class TurningPoint:
@@ -34,7 +35,8 @@ class AntColony:
                  beta: float = 5.0,
                  rho: float = 0.5,
                  Q: float = 15.0,
-                 max_iter: int = 50):
+                 max_iter: int = 50,
+                 seed: Optional[int] = None):
         self.grid = grid
         self.fire = fire_model
         self.start = start
@@ -45,6 +47,8 @@ class AntColony:
         self.rho = rho
         self.Q = Q
         self.max_iter = max_iter
+        # Own RNG so runs can be reproduced (benchmarks, tests); None = OS entropy
+        self.rng = random.Random(seed)
 
         self.tau = np.ones((grid.h, grid.w), dtype=float) * 0.1
         self.best_path = None
@@ -71,6 +75,18 @@ class AntColony:
         return True
 
     def run(self):
+        with phase("aco"):
+            self._run_iterations()
+
+        with phase("astar"):
+            a_path, a_len = self._a_star()
+        if self.best_path is None or math.isinf(self.best_len):
+            return a_path, a_len
+        if a_path is not None and a_len < self.best_len:
+            return a_path, a_len
+        return self.best_path, self.best_len
+
+    def _run_iterations(self):
         for it in range(self.max_iter):
             all_paths = []
             all_lens = []
@@ -89,14 +105,7 @@ class AntColony:
 
             if (it + 1) % 10 == 0:
                 print(f"  Iteration {it+1}/{self.max_iter}, best length={self.best_len:.4f}")
-        
-
-        a_path, a_len = self._a_star()
-        if self.best_path is None or math.isinf(self.best_len):
-            return a_path, a_len
-        if a_path is not None and a_len < self.best_len:
-            return a_path, a_len
-        return self.best_path, self.best_len
+        count("aco_iterations", self.max_iter)
 
     def _construct_solution(self) -> Tuple[Optional[List[Tuple[int,int]]], float]:
         current = self.start
@@ -154,13 +163,13 @@ class AntColony:
             
             
             epsilon = 0.15
-            if random.random() > epsilon:
+            if self.rng.random() > epsilon:
 
                 idx = max(range(len(nbrs)), key=lambda i: probs[i])
                 chosen = nbrs[idx]
             else:
 
-                r = random.random()
+                r = self.rng.random()
                 cum = 0.0
                 chosen = nbrs[-1]
                 for i, p in enumerate(probs):
@@ -229,10 +238,13 @@ class AntColony:
         heapq.heappush(open_heap, (0.0, start))
         g_cost = {start: 0.0}
         parent: dict[Tuple[int,int], Tuple[int,int]] = {}
+        expansions = 0
 
         while open_heap:
             _, node = heapq.heappop(open_heap)
+            expansions += 1
             if node in goals:
+                count("astar_expansions", expansions)
 
                 path: list[Tuple[int,int]] = [node]
                 while node in parent:
@@ -261,6 +273,7 @@ class AntColony:
                     f = tentative + h(n)
                     heapq.heappush(open_heap, (f, n))
 
+        count("astar_expansions", expansions)
         return None, float('inf')
 
     def _distance(self, a: Tuple[int,int], b: Tuple[int,int]) -> float:
@@ -0,0 +1,197 @@
+# services/capture.py
+"""
+Decoupled frame capture.
+
+FrameSource wraps cv2.VideoCapture with a reader thread that decodes frames
+into a small buffer while the camera pipeline runs inference. For live
+sources (device index, rtsp://, http:// ...) the default policy is "latest":
+a single-slot buffer where a new frame replaces the one not yet processed, so
+the pipeline always works on the most recent frame and reported counts and
+densities never drift behind reality. Video files default to "queue": the
+reader blocks when the buffer is full, so no frame is lost and decoding just
+overlaps with inference.
+
+Every frame carries its capture time; pipelines call record_result() once
+they have published the status for a frame, which gives capture-to-result
+latency. Frames replaced before being processed are counted as dropped.
+
+Configuration (environment variables):
+    EVAC_CAPTURE_POLICY    policy for live sources: latest | queue (default latest)
+    EVAC_CAPTURE_BUFFER    buffer slots (default 1)
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+CAPTURE_POLICY = os.environ.get("EVAC_CAPTURE_POLICY", "latest")
+CAPTURE_BUFFER = int(os.environ.get("EVAC_CAPTURE_BUFFER", 1))
+POLICIES = ("latest", "queue")
+LATENCY_WINDOW = 256  # latency samples kept per source
+
+
+def is_live_source(source: Union[str, int]) -> bool:
+    """Camera index or network stream (as opposed to a video file)."""
+    if isinstance(source, int):
+        return True
+    source = str(source)
+    return source.isdigit() or "://" in source
+
+
+class FrameSource:
+    def __init__(self, source: Union[str, int], name: Optional[str] = None,
+                 policy: Optional[str] = None, buffer_size: Optional[int] = None):
+        self.source = source
+        self.name = name or str(source)
+        self.live = is_live_source(source)
+        self.policy = policy or (CAPTURE_POLICY if self.live else "queue")
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown capture policy '{self.policy}' (expected one of {POLICIES})")
+        self.buffer_size = max(1, int(buffer_size or CAPTURE_BUFFER))
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.frames_read = 0
+        self._first_read: Optional[float] = None
+        self._latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self._started = time.monotonic()
+
+        self._cap = cv2.VideoCapture(source)
+        if self.live:
+            # Keep the driver from queueing frames behind our own buffer
+            self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._eof = not self._cap.isOpened()
+        self.native_fps = float(self._cap.get(cv2.CAP_PROP_FPS) or 0.0) if not self._eof else 0.0
+        self._thread = None
+        if not self._eof:
+            self._thread = threading.Thread(target=self._capture_loop, daemon=True,
+                                            name=f"capture:{self.name}")
+            self._thread.start()
+        _register(self)
+
+    def _capture_loop(self):
+        while not self._closed:
+            ok, frame = self._cap.read()
+            captured_at = time.monotonic()
+            with self._cond:
+                if not ok:
+                    break
+                self.frames_captured += 1
+                if self.policy == "latest":
+                    while len(self._buffer) >= self.buffer_size:
+                        self._buffer.popleft()
+                        self.frames_dropped += 1
+                else:
+                    while len(self._buffer) >= self.buffer_size and not self._closed:
+                        self._cond.wait(0.5)
+                self._buffer.append((frame, captured_at))
+                self._cond.notify_all()
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+        self._cap.release()
+
+    def isOpened(self) -> bool:
+        """Same meaning as cv2.VideoCapture.isOpened(): frames may still be read."""
+        return not self._closed and (bool(self._buffer) or not self._eof)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray], float]:
+        """
+        (ok, frame, captured_at) of the next buffered frame; blocks until one
+        arrives. ok is False once the source is exhausted or released.
+        captured_at is time.monotonic() at capture.
+        """
+        with self._cond:
+            while not self._buffer and not self._eof and not self._closed:
+                self._cond.wait(0.5)
+            if not self._buffer or self._closed:
+                return False, None, 0.0
+            frame, captured_at = self._buffer.popleft()
+            self.frames_read += 1
+            if self._first_read is None:
+                self._first_read = time.monotonic()
+            self._cond.notify_all()
+            return True, frame, captured_at
+
+    def record_result(self, captured_at: float) -> float:
+        """Mark a frame's result as published; returns its capture-to-result latency in ms."""
+        latency_ms = (time.monotonic() - captured_at) * 1000
+        with self._cond:
+            self.frames_processed += 1
+            self._latency_ms.append(latency_ms)
+        return latency_ms
+
+    @property
+    def source_fps(self) -> float:
+        """Frame rate of the source: as reported by the container/driver, else as measured."""
+        if self.native_fps > 0:
+            return self.native_fps
+        return self.frames_captured / max(time.monotonic() - self._started, 1e-6)
+
+    def lag_ms(self, captured_at: float) -> float:
+        """
+        How far the pipeline is behind the source: capture-to-now for live
+        sources, playback position behind real time for video files.
+        """
+        now = time.monotonic()
+        if self.live or self.native_fps <= 0 or self._first_read is None:
+            return (now - captured_at) * 1000
+        behind = (now - self._first_read) - (self.frames_read - 1) / self.native_fps
+        return max(0.0, behind * 1000)
+
+    def release(self):
+        with self._cond:
+            self._closed = True
+            self._buffer.clear()
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        _unregister(self)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            lat = np.asarray(self._latency_ms) if self._latency_ms else np.zeros(1)
+            elapsed = max(time.monotonic() - self._started, 1e-6)
+            return {
+                "source": str(self.source),
+                "live": self.live,
+                "policy": self.policy,
+                "buffer_size": self.buffer_size,
+                "frames_captured": self.frames_captured,
+                "frames_processed": self.frames_processed,
+                "frames_dropped": self.frames_dropped,
+                "capture_fps": round(self.frames_captured / elapsed, 2),
+                "latency_ms_last": round(float(lat[-1]), 2),
+                "latency_ms_p50": round(float(np.percentile(lat, 50)), 2),
+                "latency_ms_p95": round(float(np.percentile(lat, 95)), 2)
+            }
+
+
+_SOURCES: Dict[str, FrameSource] = {}
+_SOURCES_LOCK = threading.Lock()
+
+
+def _register(source: FrameSource):
+    with _SOURCES_LOCK:
+        _SOURCES[source.name] = source
+
+
+def _unregister(source: FrameSource):
+    with _SOURCES_LOCK:
+        if _SOURCES.get(source.name) is source:
+            del _SOURCES[source.name]
+
+
+def get_all_stats() -> Dict[str, dict]:
+    """Capture stats of every open source, by name."""
+    with _SOURCES_LOCK:
+        sources = list(_SOURCES.values())
+    return {s.name: s.get_stats() for s in sources}
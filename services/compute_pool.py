@@ -0,0 +1,191 @@
+# services/compute_pool.py
+"""
+Process-pool execution layer for the CPU-bound routing endpoints.
+
+ACO, fire diffusion and matplotlib run in a bounded pool of worker processes
+so they do not hold the GIL of the API process (and starve the websocket
+handlers). Worker processes preload every floor plan once at start-up.
+
+Each endpoint gets an EndpointLimiter: at most `concurrency` jobs of that
+endpoint run at once, at most `queue` more wait for a slot, anything beyond is
+rejected with 503 + Retry-After. Waiting or running jobs whose client has
+disconnected are cancelled (a job already running in a worker finishes, but
+its result is dropped). If a worker process dies (OOM, crash in native
+code), the broken pool is replaced and the job retried once; if that fails
+too the request gets a 503 like an overloaded one.
+
+Configuration (environment variables):
+    EVAC_POOL_WORKERS                 worker processes (default: cpu count, max 4)
+    EVAC_<ENDPOINT>_CONCURRENCY       e.g. EVAC_EVACUATION_CONCURRENCY=2
+    EVAC_<ENDPOINT>_QUEUE             e.g. EVAC_SIGNBOARD_QUEUE=8
+    EVAC_RETRY_AFTER                  seconds suggested to rejected clients (default 2)
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from services.floors import FLOOR_MATRIX, load_floor_matrix
+from services import instrumentation
+
+POOL_WORKERS = int(os.environ.get("EVAC_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+RETRY_AFTER = int(os.environ.get("EVAC_RETRY_AFTER", 2))
+POLL_INTERVAL = 0.25  # seconds between client-disconnect checks
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+class Overloaded(Exception):
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"{endpoint} is overloaded")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _warm_worker():
+    """Runs once in every worker process: load all floors into the floor cache."""
+    from services.grid import Grid
+    from services.visualize_signboard import detect_rooms
+    for path in FLOOR_MATRIX.values():
+        try:
+            detect_rooms(Grid(load_floor_matrix(path).tolist()))
+        except Exception as e:
+            print(f"Worker warm-up failed for {path}: {e}")
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn: the API process runs camera threads, forking it is unsafe
+            _POOL = ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_warm_worker)
+        return _POOL
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    """Drop a broken pool so the next get_pool() starts fresh workers."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is broken:
+            _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+
+class EndpointLimiter:
+    def __init__(self, name: str, concurrency: int, queue: int):
+        self.name = name
+        self.concurrency = int(os.environ.get(f"EVAC_{name.upper()}_CONCURRENCY", concurrency))
+        self.max_queue = int(os.environ.get(f"EVAC_{name.upper()}_QUEUE", queue))
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.pool_failures = 0
+
+    async def run(self, request, fn: Callable, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the process pool under this endpoint's limits.
+        Raises Overloaded when the queue is full or the pool broke twice, and
+        ClientDisconnected when the client goes away before the result is ready.
+        """
+        if self.waiting >= self.max_queue and self._sem.locked():
+            self.rejected += 1
+            raise Overloaded(self.name, RETRY_AFTER)
+
+        self.waiting += 1
+        try:
+            await self._acquire(request)
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            for attempt in range(2):
+                pool = get_pool()
+                try:
+                    return await self._submit(pool, request, fn, args, kwargs)
+                except BrokenProcessPool as e:
+                    self.pool_failures += 1
+                    print(f"[{self.name}] Worker pool broken ({e}), starting a new one")
+                    _reset_pool(pool)
+            raise Overloaded(self.name, RETRY_AFTER)
+        finally:
+            self.running -= 1
+            self._sem.release()
+
+    async def _submit(self, pool: ProcessPoolExecutor, request, fn: Callable, args, kwargs):
+        fut = pool.submit(instrumentation.traced_call, fn, args, kwargs)
+        afut = asyncio.wrap_future(fut)
+        while True:
+            done, _ = await asyncio.wait({afut}, timeout=POLL_INTERVAL)
+            if done:
+                result, trace = afut.result()
+                instrumentation.merge(trace)
+                return result
+            if await request.is_disconnected():
+                fut.cancel()
+                self.cancelled += 1
+                raise ClientDisconnected()
+
+    async def _acquire(self, request):
+        # One acquire() for the whole wait keeps this request's place in the
+        # semaphore's FIFO; it is only given up when the client goes away
+        acq = asyncio.ensure_future(self._sem.acquire())
+        try:
+            while True:
+                done, _ = await asyncio.wait({acq}, timeout=POLL_INTERVAL)
+                if done:
+                    return
+                if await request.is_disconnected():
+                    self.cancelled += 1
+                    raise ClientDisconnected()
+        except BaseException:
+            if acq.done() and not acq.cancelled():
+                self._sem.release()  # the slot arrived as we gave up
+            else:
+                acq.cancel()
+            raise
+
+    def get_stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "pool_failures": self.pool_failures
+        }
+
+
+LIMITERS: Dict[str, EndpointLimiter] = {
+    "evacuation": EndpointLimiter("evacuation", concurrency=2, queue=8),
+    "signboard": EndpointLimiter("signboard", concurrency=2, queue=8),
+}
+
+
+async def run_limited(endpoint: str, request, fn: Callable, *args, **kwargs):
+    return await LIMITERS[endpoint].run(request, fn, *args, **kwargs)
+
+
+def get_stats() -> dict:
+    return {"workers": POOL_WORKERS, "endpoints": {k: v.get_stats() for k, v in LIMITERS.items()}}
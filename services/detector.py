@@ -1,32 +1,90 @@
 # services/detector.py
-from ultralytics import YOLO
+"""
+Person detection and the shared detection post-processing stage.
+
+The YOLO call itself only keeps class 0 (person) above EVAC_YOLO_MIN_CONF
+(see inference_scheduler), so NMS never sees other classes. Detections are
+passed around as one (N, 5) float32 array of x1, y1, x2, y2, conf, and
+DetectionFilter applies the confidence and geometric limits as array masks.
+"""
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import Dict, Optional, Tuple
+from services.inference_scheduler import InferenceScheduler, get_yolo_scheduler
+
+PERSON = 0  # COCO class id
+
 
 class YoloDetector:
-    def __init__(self, model_path="AI_models/yolov8n.pt"):
-        self.model = YOLO(model_path)
-        self.model.to("cpu") 
+    def __init__(self, model_path="AI_models/yolov8n.pt", scheduler: InferenceScheduler = None):
+        # Every detector on the same weights shares one model behind a batching scheduler
+        self.scheduler = scheduler or get_yolo_scheduler(model_path)
+        self.model = self.scheduler.model
 
-    def detect(self, frame: np.ndarray, conf_thresh: float = 0.3) -> List[Dict]:
+    def detect(self, frame: np.ndarray, conf_thresh: float = 0.0, source: str = "default",
+               imgsz: Optional[int] = None) -> np.ndarray:
         """
         Detect persons in a frame.
-        Returns list of dicts: {bbox: (x1,y1,x2,y2), conf: float}
+        `source` names the camera for the scheduler's per-camera latency stats;
+        `imgsz` is the model input size (None = the model default).
+        Returns an (N, 5) float32 array: x1, y1, x2, y2, conf.
         """
-        results = self.model(frame, verbose=False)
-        out = []
-        if len(results) == 0:
-            return out
-        r = results[0]
-        # each box: xyxy, conf, cls
-        boxes = r.boxes
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            if cls_id != 0:  # class 0 is person in COCO
-                continue
-            if conf < conf_thresh:
-                continue
-            xyxy = box.xyxy[0].cpu().numpy().astype(int).tolist()
-            out.append({"bbox": tuple(xyxy), "conf": conf})
-        return out
+        r = self.scheduler.infer(frame, source, imgsz=imgsz)
+        return parse_person_boxes(r, conf_thresh)
+
+
+def parse_person_boxes(r, conf_thresh: float = 0.0) -> np.ndarray:
+    """Person detections from one ultralytics Results object, as an (N, 5) float32 array."""
+    if r is None or r.boxes is None or len(r.boxes) == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    data = r.boxes.data.cpu().numpy()  # (N, 6): x1, y1, x2, y2, conf, cls
+    keep = (data[:, 5] == PERSON) & (data[:, 4] >= conf_thresh)
+    return np.ascontiguousarray(data[keep, :5], dtype=np.float32)
+
+
+class DetectionFilter:
+    """
+    Confidence and geometric limits for person detections, per camera.
+
+    Boxes are dropped when they are too small for reliable Re-ID, larger than
+    a person plausibly appears (vehicles, groups), or have the wrong aspect
+    ratio. Fractions are relative to the frame size.
+    """
+
+    def __init__(self, min_conf: float = 0.4, min_width: float = 40, min_height: float = 60,
+                 max_width_frac: float = 0.6, max_height_frac: float = 0.7,
+                 min_aspect: float = 1.2, max_aspect: float = 4.0, max_area_frac: float = 0.4):
+        self.min_conf = float(min_conf)
+        self.min_width = float(min_width)
+        self.min_height = float(min_height)
+        self.max_width_frac = float(max_width_frac)
+        self.max_height_frac = float(max_height_frac)
+        self.min_aspect = float(min_aspect)
+        self.max_aspect = float(max_aspect)
+        self.max_area_frac = float(max_area_frac)
+
+    @classmethod
+    def from_dict(cls, limits: Optional[Dict[str, float]]) -> "DetectionFilter":
+        """Defaults overridden by `limits`; raises ValueError on unknown keys."""
+        limits = dict(limits or {})
+        unknown = set(limits) - set(cls().to_dict())
+        if unknown:
+            raise ValueError(f"Unknown detection filter limits: {sorted(unknown)}")
+        return cls(**limits)
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+    def mask(self, dets: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """Boolean mask of the detections that pass every limit."""
+        h_frame, w_frame = frame_shape[:2]
+        width = dets[:, 2] - dets[:, 0]
+        height = dets[:, 3] - dets[:, 1]
+        aspect = height / (width + 1e-6)
+        return ((dets[:, 4] >= self.min_conf)
+                & (width >= self.min_width) & (height >= self.min_height)
+                & (width <= w_frame * self.max_width_frac) & (height <= h_frame * self.max_height_frac)
+                & (aspect >= self.min_aspect) & (aspect <= self.max_aspect)
+                & (width * height <= h_frame * w_frame * self.max_area_frac))
+
+    def __call__(self, dets: np.ndarray, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        return dets[self.mask(dets, frame_shape)]
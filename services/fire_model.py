@@ -1,6 +1,9 @@
 import numpy as np
 from typing import Tuple
 from services.grid import Grid
+from services.instrumentation import phase
+
+UNSAFE_THRESHOLDS = {"initial": 0.35, "growth": 0.25, "spread": 0.20}
 
 class FireModel:
     def __init__(self, grid: Grid):
@@ -18,6 +21,10 @@ class FireModel:
                 self.intensity[r, c] = 0.5
 
     def stage_update(self, stage: str):
+        with phase("fire"):
+            self._stage_update(stage)
+
+    def _stage_update(self, stage: str):
     
       
         self.current_stage = stage
@@ -42,8 +49,7 @@ class FireModel:
         if self.intensity[r, c] < 0:
             return True
 
-        default_thresholds = {"initial": 0.35, "growth": 0.25, "spread": 0.20}
-        t = threshold if threshold is not None else default_thresholds.get(self.current_stage, 0.3)
+        t = threshold if threshold is not None else UNSAFE_THRESHOLDS.get(self.current_stage, 0.3)
         rr0 = max(0, r - buffer)
         rr1 = min(self.grid.h - 1, r + buffer)
         cc0 = max(0, c - buffer)
@@ -51,6 +57,11 @@ class FireModel:
         region = self.intensity[rr0:rr1 + 1, cc0:cc1 + 1]
         return bool(np.any(region >= t))
 
+    def unsafe_mask(self, threshold: float | None = None) -> np.ndarray:
+        """Boolean (h, w) array equal to is_unsafe(r, c, buffer=0) for every cell."""
+        t = threshold if threshold is not None else UNSAFE_THRESHOLDS.get(self.current_stage, 0.3)
+        return (self.intensity < 0) | (self.intensity >= t)
+
     def _diffuse(self, rate=0.1, steps=1):
         """Diffuse fire intensity to neighbors"""
         for _ in range(steps):
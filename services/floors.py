@@ -0,0 +1,44 @@
+# services/floors.py
+import os
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.instrumentation import phase, count
+
+# Floor number -> floor plan matrix
+FLOOR_MATRIX = {0: "matrix/matrix.csv", 1: "matrix/matrix1.csv", 2: "matrix/matrix2.csv"}
+
+# matrix path -> (mtime_ns, matrix); reloaded when the CSV changes
+_MATRIX_CACHE: Dict[str, Tuple[int, np.ndarray]] = {}
+_MATRIX_LOCK = threading.Lock()
+
+
+def floor_matrix_path(floor: int) -> str:
+    return FLOOR_MATRIX.get(floor, FLOOR_MATRIX[0])
+
+
+def load_floor_matrix(matrix_path: str) -> np.ndarray:
+    """
+    Read a floor plan CSV into an int matrix (cell codes as in Grid).
+    Parsed matrices are cached per file version; the returned array is read-only.
+    """
+    mtime = os.stat(matrix_path).st_mtime_ns
+    with _MATRIX_LOCK:
+        cached = _MATRIX_CACHE.get(matrix_path)
+        if cached is not None and cached[0] == mtime:
+            count("floor_cache_hits")
+            return cached[1]
+
+    with phase("csv"):
+        df = pd.read_csv(matrix_path, index_col=0)
+        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+        df = df.apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+        mat = df.to_numpy()
+    mat.setflags(write=False)
+
+    with _MATRIX_LOCK:
+        _MATRIX_CACHE[matrix_path] = (mtime, mat)
+    return mat
@@ -0,0 +1,182 @@
+# services/frame_stream.py
+"""
+On-demand annotated video streams.
+
+Pipelines (Re-ID workers, thermal detection, staircase monitors) own a named
+FrameChannel and only build an annotated frame when channel.wanted(), i.e.
+while at least one viewer is subscribed. Otherwise no copy, drawing, resize or
+JPEG encoding happens on the camera thread.
+
+Viewers (MJPEG over HTTP or JPEG over WebSocket, see api/streams.py) choose
+their own width, frame rate and JPEG quality. Encoding happens on the viewer
+side, off the camera thread; each (width, quality) pair is resized and encoded
+once per published frame and shared by every viewer asking for it.
+
+Local cv2.imshow preview windows are shown only when SHOW_WINDOWS is set:
+EVAC_HEADLESS=1 disables them, EVAC_HEADLESS=0 forces them, and the default
+("auto") shows them only when a display is available.
+"""
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def _detect_headless() -> bool:
+    value = os.environ.get("EVAC_HEADLESS", "auto").strip().lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    if sys.platform.startswith("linux"):
+        return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return False
+
+
+HEADLESS = _detect_headless()
+SHOW_WINDOWS = not HEADLESS
+
+
+class FrameChannel:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._seq = 0
+        self.viewers = 0
+        self.closed = False
+        self._encoded: Dict[Tuple[int, int], Optional[bytes]] = {}
+        self._encoded_seq = -1
+        self.published = 0
+        self.encodes = 0
+        self.created = time.time()
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest published frame."""
+        return self._seq
+
+    def wanted(self) -> bool:
+        """True while somebody is watching: only then should the pipeline annotate frames."""
+        return self.viewers > 0
+
+    def publish(self, frame: np.ndarray):
+        """Hand over an annotated frame. The channel keeps a reference, so do not modify it afterwards."""
+        with self._lock:
+            self._frame = frame
+            self._seq += 1
+            self.published += 1
+
+    def subscribe(self):
+        with self._lock:
+            self.viewers += 1
+
+    def unsubscribe(self):
+        with self._lock:
+            self.viewers = max(0, self.viewers - 1)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._frame = None
+            self._encoded = {}
+
+    def encode(self, width: Optional[int] = None, quality: int = 70) -> Tuple[int, Optional[bytes]]:
+        """(seq, JPEG bytes) of the latest frame, downscaled to `width` if smaller; cached per frame."""
+        key = (width or 0, quality)
+        with self._lock:
+            seq = self.seq
+            if seq != self._encoded_seq:
+                self._encoded = {}
+                self._encoded_seq = seq
+            if key in self._encoded:
+                return seq, self._encoded[key]
+        seq, frame = self._latest()
+        if frame is None:
+            return seq, None
+
+        h, w = frame.shape[:2]
+        if width and width < w:
+            frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        data = buf.tobytes() if ok else None
+
+        with self._lock:
+            self.encodes += 1
+            if self._encoded_seq == seq:
+                self._encoded[key] = data
+        return seq, data
+
+    def _latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """(seq, frame) to encode; subclasses may fetch it from elsewhere (e.g. shared memory)."""
+        with self._lock:
+            return self._seq, self._frame
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "viewers": self.viewers,
+            "frames_published": self.published,
+            "frames_encoded": self.encodes,
+            "closed": self.closed
+        }
+
+
+_CHANNELS: Dict[str, FrameChannel] = {}
+_CHANNELS_LOCK = threading.Lock()
+_FACTORY: Callable[[str], FrameChannel] = FrameChannel
+
+
+def set_channel_factory(factory: Callable[[str], FrameChannel]):
+    """Replace how open_channel() creates channels (worker processes publish to shared memory)."""
+    global _FACTORY
+    _FACTORY = factory
+
+
+def open_channel(name: str) -> FrameChannel:
+    """Channel for a pipeline to publish to (reused if already open under this name)."""
+    with _CHANNELS_LOCK:
+        channel = _CHANNELS.get(name)
+        if channel is None or channel.closed:
+            channel = _CHANNELS[name] = _FACTORY(name)
+        return channel
+
+
+def add_channel(channel: FrameChannel):
+    """Register a channel created elsewhere (e.g. a reader for a worker process' frame ring)."""
+    with _CHANNELS_LOCK:
+        _CHANNELS[channel.name] = channel
+
+
+def get_channel(name: str) -> Optional[FrameChannel]:
+    with _CHANNELS_LOCK:
+        return _CHANNELS.get(name)
+
+
+def close_channel(channel: FrameChannel):
+    """Close a channel; its viewers' streams end."""
+    channel.close()
+    with _CHANNELS_LOCK:
+        if _CHANNELS.get(channel.name) is channel:
+            del _CHANNELS[channel.name]
+
+
+def list_channels() -> List[dict]:
+    with _CHANNELS_LOCK:
+        channels = list(_CHANNELS.values())
+    return [c.get_stats() for c in channels]
+
+
+def show_window(window: str, frame: np.ndarray) -> bool:
+    """Local preview (only call when SHOW_WINDOWS). Returns True if 'q' was pressed."""
+    cv2.imshow(window, frame)
+    return cv2.waitKey(1) & 0xFF == ord('q')
+
+
+def destroy_window(window: str):
+    if SHOW_WINDOWS:
+        cv2.destroyWindow(window)
@@ -0,0 +1,105 @@
+# services/identity_archive.py
+"""
+Cold tier for identities evicted from the hot IdentityGallery.
+
+Embeddings are stored as float16 (half the memory of the gallery) in a
+matrix that grows by doubling, with parallel id/metadata arrays. The archive
+is only searched by IdentityManager's background retention pass, never on the
+camera path. Optionally bounded: beyond `max_size` the least recently seen
+archived identities are dropped for good.
+"""
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class IdentityArchive:
+    SEARCH_CHUNK = 8192
+
+    def __init__(self, max_size: Optional[int] = None, capacity: int = 256):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = 0
+        self.dropped = 0
+        self._capacity = capacity
+        self.features: Optional[np.ndarray] = None
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.videos: List[set] = [None] * capacity
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self):
+        cap = 2 * self._capacity
+
+        def grown(a):
+            out = np.zeros((cap,) + a.shape[1:], dtype=a.dtype)
+            out[:self.size] = a[:self.size]
+            return out
+        self.features = grown(self.features)
+        self.ids = grown(self.ids)
+        self.first_seen = grown(self.first_seen)
+        self.last_seen = grown(self.last_seen)
+        self.counts = grown(self.counts)
+        self.videos = self.videos[:self.size] + [None] * (cap - self.size)
+        self._capacity = cap
+
+    def add(self, gid: int, feature: np.ndarray, first_seen: float, last_seen: float,
+            count: int, videos: set):
+        """Caller holds self.lock."""
+        if self.features is None:
+            self.features = np.zeros((self._capacity, feature.shape[0]), dtype=np.float16)
+        if self.size == self._capacity:
+            self._grow()
+        row = self.size
+        self.features[row] = feature
+        self.ids[row] = gid
+        self.first_seen[row] = first_seen
+        self.last_seen[row] = last_seen
+        self.counts[row] = count
+        self.videos[row] = videos
+        self.size += 1
+        if self.max_size is not None and self.size > self.max_size:
+            self.pop(int(np.argmin(self.last_seen[:self.size])))
+            self.dropped += 1
+
+    def pop(self, row: int) -> Tuple[int, np.ndarray, float, float, int, set]:
+        """Remove a row (last row moves into its place) and return its contents. Caller holds self.lock."""
+        entry = (int(self.ids[row]), self.features[row].astype(np.float32), float(self.first_seen[row]),
+                 float(self.last_seen[row]), int(self.counts[row]), self.videos[row])
+        last = self.size - 1
+        if row != last:
+            for a in (self.features, self.ids, self.first_seen, self.last_seen, self.counts):
+                a[row] = a[last]
+            self.videos[row] = self.videos[last]
+        self.videos[last] = None
+        self.size -= 1
+        return entry
+
+    def find(self, gid: int) -> Optional[int]:
+        """Row of an archived identity, or None. Caller holds self.lock."""
+        rows = np.flatnonzero(self.ids[:self.size] == gid)
+        return int(rows[0]) if len(rows) else None
+
+    def search(self, feature: np.ndarray) -> Tuple[Optional[int], float]:
+        """(row, dot product) of the closest archived identity. Caller holds self.lock."""
+        if self.size == 0:
+            return None, 0.0
+        # float16 has no BLAS path: upcast in chunks to keep the temporary small
+        feature = feature.astype(np.float32, copy=False)
+        best_row, best = None, -np.inf
+        for start in range(0, self.size, self.SEARCH_CHUNK):
+            d = self.features[start:min(start + self.SEARCH_CHUNK, self.size)].astype(np.float32) @ feature
+            i = int(np.argmax(d))
+            if d[i] > best:
+                best_row, best = start + i, float(d[i])
+        return best_row, best
+
+    def clear(self):
+        with self.lock:
+            self.size = 0
+            self.videos = [None] * self._capacity
@@ -0,0 +1,236 @@
+# services/identity_gallery.py
+"""
+Contiguous identity gallery for Re-ID matching.
+
+Embeddings of all known identities live in one float32 (capacity, D) matrix
+that grows by doubling; ids and per-identity metadata are kept in parallel
+arrays indexed by the same row. Matching a query is a single matrix-vector
+product over the used rows. Not thread-safe: IdentityManager guards it.
+
+snapshot() is O(1): it hands out the current arrays and marks them shared;
+the gallery copies an array before its next write (copy-on-write), so a
+snapshot stays consistent while it is written to disk or served to readers.
+
+With an `index_factory` (e.g. services.ann_index.IVFIndex) the gallery builds
+an approximate index once it holds more than `exact_max` identities and keeps
+it in sync on add/update/remove; smaller galleries are always searched exactly.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_ARRAYS = ("features", "ids", "first_seen", "last_seen", "counts")
+
+
+class GallerySnapshot:
+    """Immutable view of a gallery at one version (rows [0, size) are valid)."""
+
+    def __init__(self, version: int, size: int, features: np.ndarray, ids: np.ndarray,
+                 first_seen: np.ndarray, last_seen: np.ndarray, counts: np.ndarray, videos: List[set]):
+        self.version = version
+        self.size = size
+        self.features = features
+        self.ids = ids
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.counts = counts
+        self.videos = videos
+
+
+class IdentityGallery:
+    def __init__(self, dim: Optional[int] = None, capacity: int = 256,
+                 index_factory: Optional[Callable[[int], object]] = None, exact_max: int = 5000):
+        self.dim = dim
+        self.index_factory = index_factory
+        self.exact_max = exact_max
+        self.index = None
+        self.capacity = capacity
+        self.size = 0
+        self._row: Dict[int, int] = {}  # global_id -> row
+        self.features = np.zeros((capacity, dim or 0), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        # Video sets are replaced, never mutated, so snapshots can share them
+        self.videos: List[set] = [None] * capacity
+        self.version = 0
+        self._shared = set()  # array names referenced by a snapshot
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, gid: int) -> bool:
+        return gid in self._row
+
+    def _own(self, *names: str):
+        """Copy arrays still referenced by a snapshot before writing to them."""
+        for name in names:
+            if name in self._shared:
+                setattr(self, name, np.array(getattr(self, name)))
+                self._shared.discard(name)
+        self.version += 1
+
+    def snapshot(self, features: bool = True) -> GallerySnapshot:
+        """
+        features=False leaves the embedding matrix out (metadata-only readers),
+        so the next EMA update does not have to copy it.
+        """
+        names = _ARRAYS if features else _ARRAYS[1:]
+        self._shared.update(names)
+        return GallerySnapshot(self.version, self.size, self.features if features else None,
+                               self.ids, self.first_seen, self.last_seen, self.counts,
+                               self.videos[:self.size])
+
+    def adopt(self, snap: GallerySnapshot):
+        """Take over the rows of a snapshot (e.g. loaded from disk) as the gallery contents."""
+        self.clear()
+        if snap.size == 0:
+            return
+        self.size = snap.size
+        self.capacity = len(snap.ids)
+        self.dim = int(snap.features.shape[1])
+        for name in _ARRAYS:
+            setattr(self, name, getattr(snap, name))
+        self.videos = list(snap.videos)
+        self._row = dict(zip(snap.ids[:snap.size].tolist(), range(snap.size)))
+        self._shared.update(_ARRAYS)
+        if self.index_factory is not None and self.size > self.exact_max:
+            self.index = self.index_factory(self.dim)
+            self.index.build(self.ids[:self.size], self.features[:self.size])
+
+    def _grow(self, capacity: int):
+        def grown(a):
+            out = np.zeros((capacity,) + a.shape[1:], dtype=a.dtype)
+            out[:self.size] = a[:self.size]
+            return out
+        self.features = grown(self.features)
+        self.ids = grown(self.ids)
+        self.first_seen = grown(self.first_seen)
+        self.last_seen = grown(self.last_seen)
+        self.counts = grown(self.counts)
+        self.videos = self.videos[:self.size] + [None] * (capacity - self.size)
+        self.capacity = capacity
+        self._shared.clear()
+
+    def restore(self, gid: int, feature: np.ndarray, first_seen: float, last_seen: float,
+                count: int, videos: set) -> int:
+        """Re-insert an identity (e.g. from the archive) with its full metadata."""
+        row = self.add(gid, feature, "", last_seen)
+        self.first_seen[row] = first_seen
+        self.counts[row] = count
+        self.videos[row] = videos
+        return row
+
+    def least_recent(self, older_than: Optional[float] = None, keep: Optional[int] = None) -> List[int]:
+        """
+        Ids to evict: everything last seen before `older_than`, plus the least
+        recently seen beyond the newest `keep` identities.
+        """
+        last = self.last_seen[:self.size]
+        evict = np.zeros(self.size, dtype=bool)
+        if older_than is not None:
+            evict |= last < older_than
+        if keep is not None and self.size - int(evict.sum()) > keep:
+            remaining = np.flatnonzero(~evict)
+            n_over = len(remaining) - keep
+            evict[remaining[np.argpartition(last[remaining], n_over - 1)[:n_over]]] = True
+        return self.ids[:self.size][evict].tolist()
+
+    def add(self, gid: int, feature: np.ndarray, video_name: str, now: float) -> int:
+        if self.dim is None:
+            self.dim = int(feature.shape[0])
+            self.features = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        if self.size == self.capacity:
+            self._grow(self.capacity * 2)
+        self._own(*_ARRAYS)
+        row = self.size
+        self.features[row] = feature
+        self.ids[row] = gid
+        self.first_seen[row] = now
+        self.last_seen[row] = now
+        self.counts[row] = 1
+        self.videos[row] = {video_name}
+        self._row[gid] = row
+        self.size += 1
+        if self.index is not None:
+            self.index.add(gid, self.features[row])
+        elif self.index_factory is not None and self.size > self.exact_max:
+            self.index = self.index_factory(self.dim)
+            self.index.build(self.ids[:self.size], self.features[:self.size])
+        return row
+
+    def remove(self, gid: int):
+        """Drop an identity; the last row is moved into its place."""
+        self._own(*_ARRAYS)
+        row = self._row.pop(gid)
+        if self.index is not None:
+            self.index.remove(gid)
+        last = self.size - 1
+        if row != last:
+            moved = int(self.ids[last])
+            for a in (self.features, self.ids, self.first_seen, self.last_seen, self.counts):
+                a[row] = a[last]
+            self.videos[row] = self.videos[last]
+            self._row[moved] = row
+        self.videos[last] = None
+        self.size -= 1
+
+    def row(self, gid: int) -> int:
+        return self._row[gid]
+
+    def feature(self, gid: int) -> np.ndarray:
+        return self.features[self._row[gid]]
+
+    def set_feature(self, gid: int, feature: np.ndarray):
+        self._own("features")
+        row = self._row[gid]
+        self.features[row] = feature
+        if self.index is not None:
+            self.index.update(gid, self.features[row])
+
+    @property
+    def approximate(self) -> bool:
+        """True when best_match() goes through the ANN index."""
+        return self.index is not None and self.size > self.exact_max
+
+    def touch(self, gid: int, video_name: str, now: float):
+        self._own("last_seen", "counts")
+        row = self._row[gid]
+        self.last_seen[row] = now
+        self.counts[row] += 1
+        if video_name not in self.videos[row]:
+            self.videos[row] = self.videos[row] | {video_name}
+
+    def metadata(self, gid: int) -> dict:
+        row = self._row[gid]
+        return {
+            "first_seen": float(self.first_seen[row]),
+            "last_seen": float(self.last_seen[row]),
+            "count": int(self.counts[row]),
+            "videos": self.videos[row]
+        }
+
+    def all_ids(self) -> List[int]:
+        return self.ids[:self.size].tolist()
+
+    def dots(self, features: np.ndarray) -> np.ndarray:
+        """Raw dot products: (n,) for one query, (N, n) for a batch of queries."""
+        return features.astype(np.float32, copy=False) @ self.features[:self.size].T
+
+    def best_match(self, feature: np.ndarray) -> Tuple[Optional[int], float]:
+        """(global_id, dot product) of the closest identity, or (None, 0.0) if empty."""
+        if self.size == 0:
+            return None, 0.0
+        if self.approximate:
+            return self.index.search(feature.astype(np.float32, copy=False))
+        d = self.dots(feature)
+        row = int(np.argmax(d))
+        return int(self.ids[row]), float(d[row])
+
+    def clear(self):
+        self.version += 1
+        self.size = 0
+        self._row.clear()
+        self.videos = [None] * self.capacity
+        self.index = None
@@ -4,41 +4,266 @@ Global Identity Manager for Cross-Video Person Re-Identification
 Based on EAAI2025 Re-ID evacuation paper methodology
 """
 import numpy as np
+import queue
 import threading
 from typing import Dict, Optional, Tuple, List
 from collections import defaultdict
 import time
 
+from services.identity_gallery import IdentityGallery, GallerySnapshot
+from services.ann_index import IVFIndex
+from services.identity_store import IdentityStore
+from services.identity_archive import IdentityArchive
+
 
 class IdentityManager:
     """
     Manages global person identities across multiple videos/cameras.
     Uses cosine similarity on Re-ID feature vectors to match people.
+    Feature vectors live in an IdentityGallery matrix, so matching is one
+    matrix-vector product instead of a Python loop over identities.
     """
     
-    def __init__(self, similarity_threshold: float = 0.6):
+    # Cross-video matches need a much higher similarity than same-video ones
+    CROSS_VIDEO_THRESHOLD = 0.92
+    
+    # Merged temporary IDs remembered for cameras that still hold them
+    ALIAS_MAX = 10000
+    
+    def __init__(self, similarity_threshold: float = 0.6, index: str = "exact",
+                 exact_max: int = 5000, n_probe: int = 8,
+                 store_dir: Optional[str] = None, snapshot_interval: float = 30.0,
+                 view_max_age: float = 0.5, ttl: Optional[float] = None,
+                 max_identities: Optional[int] = None, archive_max: Optional[int] = None,
+                 retention_interval: float = 5.0):
         """
         Args:
             similarity_threshold: Threshold for considering two features as same person (0-1)
                                  Higher = more strict matching
                                  Paper suggests 0.5-0.7 for OSNet features
+            index: "exact" (dense search) or "ivf" (approximate search once the
+                   gallery holds more than exact_max identities)
+            n_probe: IVF cells scanned per query (higher = better recall, slower)
+            store_dir: Directory to persist identities in (None = memory only).
+                       Identities are loaded from it on start-up and snapshotted
+                       every snapshot_interval seconds by a background thread.
+            view_max_age: Seconds API readers may see a stale identity list
+                          before it is rebuilt (bounds rebuild cost under heavy polling)
+            ttl: Evict identities not seen for this many seconds (None = never)
+            max_identities: Keep at most this many identities in the hot gallery,
+                            evicting the least recently seen (None = unbounded)
+            archive_max: Evicted identities kept in the archive (None = unbounded)
+            retention_interval: Seconds between eviction passes
+        
+        Evicted identities move to a compact archive. When a feature matches
+        nothing in the hot gallery, a background pass searches the archive;
+        on a hit the archived identity is restored and the temporary new ID
+        is merged into it. Cameras still holding the temporary ID look up
+        its replacement with resolve_ids().
         """
         self.similarity_threshold = similarity_threshold
         
-        # Global identity database: {global_id: feature_vector}
-        self.identity_db: Dict[int, np.ndarray] = {}
-        
-        # Track which videos have seen which global IDs
-        self.video_identities: Dict[str, set] = defaultdict(set)  # {video_name: {global_ids}}
+        if index not in ("exact", "ivf"):
+            raise ValueError(f"Unknown identity index '{index}' (expected 'exact' or 'ivf')")
+        factory = (lambda dim: IVFIndex(dim, n_probe=n_probe)) if index == "ivf" else None
         
-        # Metadata about each identity
-        self.identity_metadata: Dict[int, dict] = {}  # {global_id: {first_seen, last_seen, count, videos}}
+        # Global identity database: one row per global_id (feature + first/last seen, count, videos)
+        self.gallery = IdentityGallery(index_factory=factory, exact_max=exact_max)
         
         # Next available ID
         self.next_id = 1
         
-        # Thread lock for concurrent access
+        # Camera-side lock: matching, EMA updates and metadata writes.
+        # API readers use versioned read views (see _read_view) and only take
+        # it for an O(1) snapshot, so polling never stalls the camera threads.
         self.lock = threading.Lock()
+        self.view_max_age = view_max_age
+        self._view: Optional[_ReadView] = None
+        self._view_lock = threading.Lock()
+        # Oldest gallery version a view may show: raised by destructive changes
+        # (reset, eviction, merges), which must never be served stale
+        self._view_min_version = 0
+        
+        # Optional persistence
+        self.store = IdentityStore(store_dir) if store_dir else None
+        self.snapshot_interval = snapshot_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        if self.store is not None:
+            self._load_store()
+            self._threads.append(threading.Thread(target=self._snapshot_loop, daemon=True))
+        
+        # Optional retention: hot gallery -> archive
+        self.ttl = ttl
+        self.max_identities = max_identities
+        self.retention_interval = retention_interval
+        self.archive = IdentityArchive(archive_max)
+        # Temporary ID -> restored ID it was merged into (oldest dropped past ALIAS_MAX)
+        self.aliases: Dict[int, int] = {}
+        self._archive_queue: "queue.Queue" = queue.Queue(maxsize=1000)
+        self.retention_stats = {"evicted_ttl": 0, "evicted_lru": 0, "archive_hits": 0,
+                                "archive_misses": 0, "archive_queue_dropped": 0}
+        if ttl is not None or max_identities is not None:
+            self._threads.append(threading.Thread(target=self._retention_loop, daemon=True))
+        
+        for t in self._threads:
+            t.start()
+        
+    def _load_store(self):
+        t0 = time.perf_counter()
+        try:
+            loaded = self.store.load()
+        except Exception as e:
+            print(f"Failed to load identity store {self.store.directory}: {e}")
+            return
+        if loaded is None:
+            return
+        snap, next_id = loaded
+        with self.lock:
+            self.gallery.adopt(snap)
+            self.next_id = next_id
+            self.store.saved_version = self.gallery.version
+        print(f"Loaded {snap.size} identities from {self.store.directory} "
+              f"in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    
+    def save_snapshot(self) -> bool:
+        """
+        Persist the current identities. The snapshot is taken under the lock
+        in O(1) (copy-on-write); disk I/O happens without holding it.
+        Returns False if nothing changed since the last save.
+        """
+        if self.store is None:
+            return False
+        with self.lock:
+            if self.gallery.version == self.store.saved_version:
+                return False
+            snap = self.gallery.snapshot()
+            next_id = self.next_id
+        self.store.save(snap, next_id)
+        return True
+    
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.save_snapshot()
+            except Exception as e:
+                print(f"Identity snapshot failed: {e}")
+    
+    def close(self):
+        """Stop background threads and write a final snapshot."""
+        self._stop.set()
+        try:
+            self._archive_queue.put_nowait(None)
+        except queue.Full:
+            pass
+        for t in self._threads:
+            t.join(timeout=2)
+        self.save_snapshot()
+    
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+    
+    def evict(self, now: Optional[float] = None) -> int:
+        """Move identities past the TTL or beyond max_identities into the archive."""
+        now = time.time() if now is None else now
+        older_than = now - self.ttl if self.ttl is not None else None
+        with self.lock:
+            gids = self.gallery.least_recent(older_than, self.max_identities)
+            if not gids:
+                return 0
+            g = self.gallery
+            with self.archive.lock:
+                for gid in gids:
+                    row = g.row(gid)
+                    if older_than is not None and g.last_seen[row] < older_than:
+                        self.retention_stats["evicted_ttl"] += 1
+                    else:
+                        self.retention_stats["evicted_lru"] += 1
+                    self.archive.add(gid, g.features[row], float(g.first_seen[row]),
+                                     float(g.last_seen[row]), int(g.counts[row]), g.videos[row])
+                    g.remove(gid)
+            self._invalidate_views()
+        return len(gids)
+    
+    def _search_archive(self, temp_id: int, feature: np.ndarray, video_name: str) -> Optional[int]:
+        """
+        Look for a new identity's feature in the archive. On a hit the archived
+        identity is restored to the gallery and temp_id is merged into it.
+        Returns the restored global ID, or None.
+        """
+        with self.archive.lock:
+            row, dot = self.archive.search(feature)
+            if row is None:
+                return None
+            archived_id = int(self.archive.ids[row])
+            same_video = video_name in self.archive.videos[row]
+        similarity = self._to_similarity(dot)
+        threshold = self.similarity_threshold if same_video else self.CROSS_VIDEO_THRESHOLD
+        if similarity < threshold:
+            self.retention_stats["archive_misses"] += 1
+            return None
+        
+        with self.lock:
+            with self.archive.lock:
+                row = self.archive.find(archived_id)
+                if row is None:
+                    return None
+                gid, feat, first_seen, _, count, videos = self.archive.pop(row)
+            
+            # Same EMA refinement as a live match
+            alpha = 0.10 if same_video else 0.05
+            feat = (1 - alpha) * feat + alpha * feature
+            feat = feat / (np.linalg.norm(feat) + 1e-8)
+            videos = videos | {video_name}
+            if temp_id in self.gallery:
+                temp = self.gallery.metadata(temp_id)
+                count += temp["count"]
+                videos = videos | temp["videos"]
+                self.gallery.remove(temp_id)
+            self.gallery.restore(gid, feat, first_seen, time.time(), count, videos)
+            self.aliases[temp_id] = gid
+            if len(self.aliases) > self.ALIAS_MAX:
+                self.aliases.pop(next(iter(self.aliases)))
+            self._invalidate_views()
+            self.retention_stats["archive_hits"] += 1
+        
+        print(f"♻️  ARCHIVE MATCH: temporary ID {temp_id} -> restored ID {gid} (sim: {similarity:.3f})")
+        return gid
+    
+    def resolve_ids(self, global_ids: List[int]) -> Dict[int, int]:
+        """
+        Current ID of every ID in `global_ids` that was merged into a restored
+        identity since it was handed out; IDs that are still valid are left out.
+        """
+        with self.lock:
+            merged = {}
+            for gid in global_ids:
+                target = gid
+                for _ in range(8):  # a restored ID can itself be merged later
+                    nxt = self.aliases.get(target)
+                    if nxt is None:
+                        break
+                    target = nxt
+                if target != gid:
+                    merged[gid] = target
+            return merged
+    
+    def _retention_loop(self):
+        next_evict = time.monotonic() + self.retention_interval
+        while not self._stop.is_set():
+            try:
+                item = self._archive_queue.get(timeout=max(0.0, next_evict - time.monotonic()))
+            except queue.Empty:
+                item = None
+            try:
+                if item is not None:
+                    self._search_archive(*item)
+                if time.monotonic() >= next_evict:
+                    self.evict()
+                    next_evict = time.monotonic() + self.retention_interval
+            except Exception as e:
+                print(f"Identity retention pass failed: {e}")
         
     def cosine_similarity(self, feat1: np.ndarray, feat2: np.ndarray) -> float:
         """
@@ -47,11 +272,13 @@ class IdentityManager:
         """
         # Features should already be L2-normalized from ReIDExtractor
         dot_product = np.dot(feat1, feat2)
-        # Clamp to [-1, 1] to handle numerical errors
-        dot_product = np.clip(dot_product, -1.0, 1.0)
-        # Convert from [-1, 1] to [0, 1]
-        similarity = (dot_product + 1.0) / 2.0
-        return float(similarity)
+        return self._to_similarity(dot_product)
+    
+    @staticmethod
+    def _to_similarity(dot_product: float) -> float:
+        # Clamp to [-1, 1] to handle numerical errors, then map to [0, 1]
+        dot_product = min(max(float(dot_product), -1.0), 1.0)
+        return (dot_product + 1.0) / 2.0
     
     def find_best_match(self, feature: np.ndarray) -> Tuple[Optional[int], float]:
         """
@@ -59,20 +286,13 @@ class IdentityManager:
         
         Returns:
             (global_id, similarity) if match found above threshold
-            (None, 0.0) if no match found
+            (None, similarity) if no match found
         """
-        if len(self.identity_db) == 0:
+        best_id, dot = self.gallery.best_match(feature)
+        if best_id is None:
             return None, 0.0
         
-        best_id = None
-        best_similarity = 0.0
-        
-        for gid, stored_feat in self.identity_db.items():
-            sim = self.cosine_similarity(feature, stored_feat)
-            if sim > best_similarity:
-                best_similarity = sim
-                best_id = gid
-        
+        best_similarity = self._to_similarity(dot)
         if best_similarity >= self.similarity_threshold:
             return best_id, best_similarity
         else:
@@ -93,116 +313,234 @@ class IdentityManager:
             - similarity: Similarity score (0 if new, >threshold if matched)
         """
         with self.lock:
-            # Try to find existing match
             matched_id, similarity = self.find_best_match(feature)
+            return self._assign(feature, video_name, matched_id, similarity)
+    
+    def register_or_match_batch(self, features: np.ndarray,
+                                video_name: str) -> List[Tuple[int, bool, float]]:
+        """
+        register_or_match() for all features of one frame, under one lock hold.
+        
+        Similarities against the gallery are computed with a single matrix
+        product. Results are identical to calling register_or_match() in
+        order: rows updated or created by earlier features in the batch are
+        re-scored for the later ones.
+        """
+        features = np.asarray(features, dtype=np.float32)
+        results = []
+        with self.lock:
+            if self.gallery.approximate:
+                # The ANN index is kept current on every insert/update; query it per feature
+                for feature in features:
+                    matched_id, similarity = self.find_best_match(feature)
+                    results.append(self._assign(feature, video_name, matched_id, similarity))
+                return results
             
-            if matched_id is not None:
-                # Check if this is a cross-video match (person in new video)
-                existing_videos = self.identity_metadata[matched_id]["videos"]
-                is_cross_video = video_name not in existing_videos
-                
-                # TWO-TIER MATCHING SYSTEM:
-                # Same video: Use base threshold (0.75) - person with different pose/angle
-                # Cross-video: Require 0.92+ - prevent different people from matching
+            n_before = len(self.gallery)
+            dots = self.gallery.dots(features) if n_before else np.zeros((len(features), 0), np.float32)
+            dirty = set()  # rows changed by earlier features of this batch
+            
+            for i, feature in enumerate(features):
+                row_dots = dots[i]
+                if dirty:
+                    row_dots = row_dots.copy()
+                    stale = [r for r in dirty if r < n_before]
+                    if stale:
+                        row_dots[stale] = self.gallery.features[stale] @ feature
+                    if len(self.gallery) > n_before:
+                        added = self.gallery.features[n_before:len(self.gallery)] @ feature
+                        row_dots = np.concatenate([row_dots, added])
                 
-                if is_cross_video and similarity < 0.92:
-                    # Similarity not high enough for cross-video match
-                    # Different people with similar clothes should NOT match
-                    print(f"⚠️  Cross-video match REJECTED: sim={similarity:.3f} < 0.92 threshold")
-                    matched_id = None  # Will create new ID below
-                else:
-                    # Good match - update feature SLIGHTLY to handle pose/lighting changes
-                    # But keep weight very small to prevent drift
-                    if is_cross_video:
-                        alpha = 0.05  # 5% update for cross-video (very conservative)
-                    else:
-                        alpha = 0.10  # 10% update for same-video (handle pose changes)
-                    
-                    old_feat = self.identity_db[matched_id]
-                    updated_feat = (1 - alpha) * old_feat + alpha * feature
-                    # Re-normalize
-                    updated_feat = updated_feat / (np.linalg.norm(updated_feat) + 1e-8)
-                    self.identity_db[matched_id] = updated_feat
-                    
-                    # Update metadata
-                    self.identity_metadata[matched_id]["last_seen"] = time.time()
-                    self.identity_metadata[matched_id]["count"] += 1
-                    self.identity_metadata[matched_id]["videos"].add(video_name)
-                    
-                    if is_cross_video:
-                        print(f"🌟 CROSS-VIDEO MATCH! ID {matched_id} in {len(self.identity_metadata[matched_id]['videos'])} videos (sim: {similarity:.3f})")
+                matched_id, similarity = None, 0.0
+                if len(row_dots):
+                    row = int(np.argmax(row_dots))
+                    similarity = self._to_similarity(row_dots[row])
+                    if similarity >= self.similarity_threshold:
+                        matched_id = int(self.gallery.ids[row])
                 
-                    # Track in video
-                    self.video_identities[video_name].add(matched_id)
-                    
-                    return matched_id, False, similarity
+                gid, is_new, sim = self._assign(feature, video_name, matched_id, similarity)
+                dirty.add(self.gallery.row(gid))
+                results.append((gid, is_new, sim))
+        return results
+    
+    def _assign(self, feature: np.ndarray, video_name: str, matched_id: Optional[int],
+                similarity: float) -> Tuple[int, bool, float]:
+        """Apply the two-tier match rules for one feature. Caller holds self.lock."""
+        if matched_id is not None:
+            # Check if this is a cross-video match (person in new video)
+            existing_videos = self.gallery.videos[self.gallery.row(matched_id)]
+            is_cross_video = video_name not in existing_videos
+            
+            # TWO-TIER MATCHING SYSTEM:
+            # Same video: Use base threshold (0.75) - person with different pose/angle
+            # Cross-video: Require 0.92+ - prevent different people from matching
             
-            # No match found OR cross-video match rejected - create new identity
-            if matched_id is None:
-                # Create new identity
-                new_id = self.next_id
-                self.next_id += 1
+            if is_cross_video and similarity < self.CROSS_VIDEO_THRESHOLD:
+                # Similarity not high enough for cross-video match
+                # Different people with similar clothes should NOT match
+                print(f"⚠️  Cross-video match REJECTED: sim={similarity:.3f} < {self.CROSS_VIDEO_THRESHOLD} threshold")
+                matched_id = None  # Will create new ID below
+            else:
+                # Good match - update feature SLIGHTLY to handle pose/lighting changes
+                # But keep weight very small to prevent drift
+                if is_cross_video:
+                    alpha = 0.05  # 5% update for cross-video (very conservative)
+                else:
+                    alpha = 0.10  # 10% update for same-video (handle pose changes)
                 
-                self.identity_db[new_id] = feature.copy()
-                self.identity_metadata[new_id] = {
-                    "first_seen": time.time(),
-                    "last_seen": time.time(),
-                    "count": 1,
-                    "videos": {video_name}
-                }
+                old_feat = self.gallery.feature(matched_id)
+                updated_feat = (1 - alpha) * old_feat + alpha * feature
+                # Re-normalize
+                updated_feat = updated_feat / (np.linalg.norm(updated_feat) + 1e-8)
+                self.gallery.set_feature(matched_id, updated_feat)
                 
-                # Track in video
-                self.video_identities[video_name].add(new_id)
+                # Update metadata
+                self.gallery.touch(matched_id, video_name, time.time())
                 
-                return new_id, True, 0.0
+                if is_cross_video:
+                    n_videos = len(self.gallery.videos[self.gallery.row(matched_id)])
+                    print(f"🌟 CROSS-VIDEO MATCH! ID {matched_id} in {n_videos} videos (sim: {similarity:.3f})")
+            
+                return matched_id, False, similarity
+        
+        # No match found OR cross-video match rejected - create new identity
+        new_id = self.next_id
+        self.next_id += 1
+        
+        self.gallery.add(new_id, feature, video_name, time.time())
+        
+        # Maybe an evicted identity: let the background pass check the archive
+        if len(self.archive) and self._threads:
+            try:
+                self._archive_queue.put_nowait((new_id, np.array(feature, dtype=np.float32), video_name))
+            except queue.Full:
+                self.retention_stats["archive_queue_dropped"] += 1
+        
+        return new_id, True, 0.0
+    
+    def _invalidate_views(self):
+        """Call under self.lock after removing identities: readers must not see them any more."""
+        self._view_min_version = self.gallery.version
+        self._view = None
+
+    def _read_view(self) -> "_ReadView":
+        """
+        Immutable view of the identities for API readers, rebuilt at most once
+        per gallery version and at most every view_max_age seconds. The age
+        bound only covers additions and updates; after a reset, eviction or
+        merge the next read always rebuilds. The camera lock is held only to
+        take an O(1) metadata snapshot; the view itself is built outside it.
+        """
+        view = self._view
+        if view is not None and view.fresh(self.gallery.version, self.view_max_age, self._view_min_version):
+            return view
+        with self._view_lock:
+            view = self._view
+            if view is not None and view.fresh(self.gallery.version, self.view_max_age, self._view_min_version):
+                return view
+            with self.lock:
+                snap = self.gallery.snapshot(features=False)
+                index = "ivf" if self.gallery.approximate else "exact"
+            view = _ReadView(snap, index)
+            self._view = view  # atomic reference swap
+            return view
     
     def get_identity_info(self, global_id: int) -> Optional[dict]:
         """Get metadata about a specific identity."""
-        with self.lock:
-            if global_id in self.identity_metadata:
-                return self.identity_metadata[global_id].copy()
+        meta = self._read_view().identities.get(global_id)
+        if meta is None:
             return None
+        return {**meta, "videos": set(meta["videos"])}
     
     def get_video_identities(self, video_name: str) -> List[int]:
         """Get all identities seen in a specific video."""
-        with self.lock:
-            return list(self.video_identities.get(video_name, set()))
+        return list(self._read_view().video_ids.get(video_name, []))
     
     def get_all_identities(self) -> Dict[int, dict]:
         """Get all identities and their metadata."""
-        with self.lock:
-            return {
-                gid: {
-                    **meta,
-                    "videos": list(meta["videos"])  # Convert set to list for JSON
-                }
-                for gid, meta in self.identity_metadata.items()
-            }
+        return self._read_view().identities
     
     def reset(self):
         """Clear all identities (useful for testing or reset)."""
         with self.lock:
-            self.identity_db.clear()
-            self.video_identities.clear()
-            self.identity_metadata.clear()
+            self.gallery.clear()
+            self.archive.clear()
+            self.aliases.clear()
             self.next_id = 1
+            self._invalidate_views()
+        while True:
+            try:
+                self._archive_queue.get_nowait()
+            except queue.Empty:
+                break
     
     def get_statistics(self) -> dict:
         """Get overall system statistics."""
-        with self.lock:
-            total_identities = len(self.identity_db)
-            total_videos = len(self.video_identities)
-            
-            # Count cross-video identities (people appearing in multiple videos)
-            cross_video_count = sum(
-                1 for meta in self.identity_metadata.values()
-                if len(meta["videos"]) > 1
-            )
-            
-            return {
-                "total_identities": total_identities,
-                "total_videos": total_videos,
-                "cross_video_identities": cross_video_count,
-                "similarity_threshold": self.similarity_threshold
-            }
+        view = self._read_view()
+        return {
+            "total_identities": len(view.identities),
+            "total_videos": len(view.video_ids),
+            "cross_video_identities": view.cross_video,
+            "similarity_threshold": self.similarity_threshold,
+            "index": view.index,
+            "snapshot_version": view.version,
+            "retention": {
+                "ttl": self.ttl,
+                "max_identities": self.max_identities,
+                "archived_identities": len(self.archive),
+                "archive_dropped": self.archive.dropped,
+                **self.retention_stats
+            },
+            "store": self.store.get_stats() if self.store is not None else None
+        }
 
+
+def resolve_track_ids(identity_manager, track_to_global: Dict[int, object]) -> int:
+    """
+    Point a camera's track -> global ID entries at the identity their ID was
+    merged into (archive restores). Works with IdentityManager and its
+    process-worker proxy. Returns the number of entries changed.
+    """
+    ids = {gid for gid in track_to_global.values() if isinstance(gid, int)}
+    merged = identity_manager.resolve_ids(sorted(ids)) if ids else {}
+    changed = 0
+    for track_id, gid in track_to_global.items():
+        if gid in merged:
+            track_to_global[track_id] = merged[gid]
+            changed += 1
+    return changed
+
+
+class _ReadView:
+    """Read-only identities at one gallery version (shared by all API readers; do not mutate)."""
+    
+    def __init__(self, snap: GallerySnapshot, index: str):
+        self.version = snap.version
+        self.built = time.monotonic()
+        self.index = index
+        n = snap.size
+        ids = snap.ids[:n].tolist()
+        first_seen = snap.first_seen[:n].tolist()
+        last_seen = snap.last_seen[:n].tolist()
+        counts = snap.counts[:n].tolist()
+        
+        self.identities: Dict[int, dict] = {}
+        self.video_ids: Dict[str, List[int]] = defaultdict(list)
+        self.cross_video = 0
+        for gid, first, last, count, videos in zip(ids, first_seen, last_seen, counts, snap.videos):
+            self.identities[gid] = {
+                "first_seen": first,
+                "last_seen": last,
+                "count": count,
+                "videos": list(videos)  # list for JSON
+            }
+            for video in videos:
+                self.video_ids[video].append(gid)
+            if len(videos) > 1:
+                self.cross_video += 1
+        self.video_ids = dict(self.video_ids)
+    
+    def fresh(self, version: int, max_age: float, min_version: int = 0) -> bool:
+        if self.version < min_version:
+            return False
+        return version == self.version or time.monotonic() - self.built < max_age
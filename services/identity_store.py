@@ -0,0 +1,133 @@
+# services/identity_store.py
+"""
+On-disk identity store for IdentityManager.
+
+Each snapshot is written as a pair of files:
+    identities-<seq>.npy   (N, D) float32 embeddings, opened memory-mapped on load
+    identities-<seq>.npz   columnar metadata: ids, first_seen, last_seen, counts,
+                           video name table + CSR-packed per-identity video lists,
+                           next_id
+and a CURRENT file naming the latest complete snapshot, replaced atomically
+after both files are on disk. A crash mid-write leaves the previous snapshot
+in place. Loading maps the embeddings copy-on-write (mode "c"): the gallery
+can use and modify them without reading the file up front or touching it.
+"""
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from services.identity_gallery import GallerySnapshot
+
+CURRENT = "CURRENT"
+
+
+class IdentityStore:
+    def __init__(self, directory: str = "identity_store"):
+        self.directory = directory
+        self._write_lock = threading.Lock()
+        self.saves = 0
+        self.last_save_s = 0.0
+        self.last_save_time: Optional[float] = None
+        self.saved_version = -1
+
+    def _paths(self, seq: int) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"identities-{seq}")
+        return base + ".npy", base + ".npz"
+
+    def _current(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.directory, CURRENT)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, snap: GallerySnapshot, next_id: int):
+        """Write a snapshot. Runs off the camera threads; never touches the live gallery."""
+        with self._write_lock:
+            t0 = time.perf_counter()
+            os.makedirs(self.directory, exist_ok=True)
+            current = self._current()
+            seq = current["seq"] + 1 if current else 1
+            emb_path, meta_path = self._paths(seq)
+            n = snap.size
+
+            dim = snap.features.shape[1] if snap.features.ndim == 2 else 0
+            emb = np.lib.format.open_memmap(emb_path, mode="w+", dtype=np.float32, shape=(n, dim))
+            emb[:] = snap.features[:n]
+            emb.flush()
+            del emb
+
+            names = sorted(set().union(*snap.videos)) if n else []
+            code = {name: i for i, name in enumerate(names)}
+            lengths = np.fromiter((len(v) for v in snap.videos), dtype=np.int64, count=n)
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            packed = np.fromiter((code[v] for vs in snap.videos for v in vs), dtype=np.int32,
+                                 count=int(offsets[-1]))
+            with open(meta_path, "wb") as f:
+                np.savez(f, ids=snap.ids[:n], first_seen=snap.first_seen[:n],
+                         last_seen=snap.last_seen[:n], counts=snap.counts[:n],
+                         video_names=np.array(names, dtype=str), video_offsets=offsets,
+                         video_index=packed, next_id=np.int64(next_id))
+                f.flush()
+                os.fsync(f.fileno())
+
+            tmp = os.path.join(self.directory, CURRENT + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump({"seq": seq, "size": n, "version": snap.version, "saved_at": time.time()}, f)
+            os.replace(tmp, os.path.join(self.directory, CURRENT))
+
+            # Older snapshots are no longer referenced (open mappings keep their inode alive)
+            for name in os.listdir(self.directory):
+                if name.startswith("identities-") and not name.startswith(f"identities-{seq}."):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+            self.saves += 1
+            self.saved_version = snap.version
+            self.last_save_s = time.perf_counter() - t0
+            self.last_save_time = time.time()
+
+    def load(self) -> Optional[Tuple[GallerySnapshot, int]]:
+        """(snapshot, next_id) of the latest saved state, or None if there is none."""
+        current = self._current()
+        if current is None:
+            return None
+        emb_path, meta_path = self._paths(current["seq"])
+        features = np.load(emb_path, mmap_mode="c")
+        with np.load(meta_path) as meta:
+            ids = meta["ids"]
+            names = meta["video_names"].tolist()
+            offsets = meta["video_offsets"]
+            packed = meta["video_index"]
+            n = len(ids)
+            lengths = np.diff(offsets)
+
+            # Video sets are never mutated in place, so identities seen in the
+            # same single video can share one set object
+            singles = [{name} for name in names]
+            videos: List[set] = [None] * n
+            single_rows = np.flatnonzero(lengths == 1)
+            for r, i in zip(single_rows.tolist(), packed[offsets[single_rows]].tolist()):
+                videos[r] = singles[i]
+            for r in np.flatnonzero(lengths != 1).tolist():
+                videos[r] = {names[i] for i in packed[offsets[r]:offsets[r + 1]].tolist()}
+
+            snap = GallerySnapshot(current.get("version", 0), n, features, ids,
+                                   meta["first_seen"], meta["last_seen"], meta["counts"], videos)
+            next_id = int(meta["next_id"])
+        return snap, next_id
+
+    def get_stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "saves": self.saves,
+            "last_save_ms": round(self.last_save_s * 1000, 2),
+            "last_save_time": self.last_save_time
+        }
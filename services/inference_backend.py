@@ -0,0 +1,325 @@
+# services/inference_backend.py
+"""
+CPU inference backends for the YOLO detector and the OSNet Re-ID model.
+
+Each model picks its backend by a spec string:
+    torch            PyTorch eager mode (default)
+    onnx             ONNX Runtime, fp32
+    onnx-int8        ONNX Runtime, static INT8 (QDQ, per-channel weights)
+    openvino         OpenVINO, fp32
+    openvino-int8    OpenVINO, static INT8 (NNCF)
+
+Non-torch backends export the model once to EVAC_MODEL_CACHE and reuse the
+artifact on later start-ups (delete it to re-export or re-calibrate). YOLO is
+exported through ultralytics and loaded back through ultralytics, so callers
+keep getting the same Results objects; OSNet is exported with torch.onnx and
+run through a small runner that takes the preprocessed (N, 3, 256, 128) batch.
+INT8 calibration uses sample frames from EVAC_CALIBRATION_SOURCE: a video,
+an image, or a directory of either (default: the upload directories).
+
+If exporting or loading a backend fails, the model falls back to torch with a
+warning, so a missing runtime never stops the cameras.
+
+Configuration (environment variables):
+    EVAC_YOLO_BACKEND          backend for YOLO (default torch)
+    EVAC_REID_BACKEND          backend for OSNet (default torch)
+    EVAC_MODEL_CACHE           exported artifacts (default model_data/exported)
+    EVAC_CALIBRATION_SOURCE    INT8 calibration frames (default: uploads directories)
+    EVAC_CALIBRATION_FRAMES    frames used for calibration (default 64)
+"""
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.reid_preprocess import REID_SIZE, CropPreprocessor
+
+RUNTIMES = ("torch", "onnx", "openvino")
+YOLO_BACKEND = os.environ.get("EVAC_YOLO_BACKEND", "torch")
+REID_BACKEND = os.environ.get("EVAC_REID_BACKEND", "torch")
+CACHE_DIR = os.environ.get("EVAC_MODEL_CACHE", os.path.join("model_data", "exported"))
+CALIBRATION_SOURCE = os.environ.get("EVAC_CALIBRATION_SOURCE", "")
+CALIBRATION_FRAMES = int(os.environ.get("EVAC_CALIBRATION_FRAMES", 64))
+DEFAULT_CALIBRATION_DIRS = ("uploads", os.path.join("staire_case", "uploads"), "videos")
+YOLO_IMGSZ = 640
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# One export at a time per process; artifacts are moved into place atomically,
+# so worker processes exporting concurrently just keep whichever lands first
+_EXPORT_LOCK = threading.Lock()
+
+
+def parse_backend(spec: Optional[str]) -> Tuple[str, bool]:
+    """'onnx-int8' -> ('onnx', True)."""
+    runtime, _, quant = (spec or "torch").strip().lower().partition("-")
+    if runtime not in RUNTIMES or quant not in ("", "int8") or (runtime == "torch" and quant):
+        raise ValueError(f"Unknown inference backend '{spec}' (expected torch, onnx[-int8] or openvino[-int8])")
+    return runtime, quant == "int8"
+
+
+def artifact_path(stem: str, runtime: str, int8: bool) -> str:
+    """Cache location of an exported model (ultralytics recognizes the format by suffix)."""
+    name = f"{stem}-{runtime}{'-int8' if int8 else ''}"
+    return os.path.join(CACHE_DIR, name + (".onnx" if runtime == "onnx" else "_openvino_model"))
+
+
+def _publish(src: str, dst: str):
+    """Move a finished export into the cache unless another process got there first."""
+    if not os.path.exists(dst):
+        os.replace(src, dst)
+    elif os.path.isdir(src):
+        shutil.rmtree(src, ignore_errors=True)
+    else:
+        os.remove(src)
+
+
+# ---------------------------------------------------------------- calibration
+
+def _calibration_files(source: Optional[str]) -> List[str]:
+    roots = [source or CALIBRATION_SOURCE] if (source or CALIBRATION_SOURCE) else list(DEFAULT_CALIBRATION_DIRS)
+    files = []
+    for root in roots:
+        if os.path.isfile(root):
+            files.append(root)
+        elif os.path.isdir(root):
+            files.extend(sorted(os.path.join(root, f) for f in os.listdir(root)
+                                if f.lower().endswith(VIDEO_EXTS + IMAGE_EXTS)))
+    return files
+
+
+def load_calibration_frames(source: Optional[str] = None, count: int = CALIBRATION_FRAMES) -> List[np.ndarray]:
+    """Up to `count` BGR frames, spread evenly over the videos/images found in `source`."""
+    files = _calibration_files(source)
+    if not files:
+        raise RuntimeError("INT8 calibration needs sample frames: set EVAC_CALIBRATION_SOURCE "
+                           "to a video, an image or a directory of them")
+    images = [f for f in files if f.lower().endswith(IMAGE_EXTS)]
+    videos = [f for f in files if not f.lower().endswith(IMAGE_EXTS)]
+    frames = [img for img in (cv2.imread(f) for f in images[:count]) if img is not None]
+    # the videos share whatever the images left over
+    for i, path in enumerate(videos):
+        remaining = count - len(frames)
+        if remaining <= 0:
+            break
+        frames.extend(sample_video_frames(path, -(-remaining // (len(videos) - i))))
+    if not frames:
+        raise RuntimeError(f"No readable calibration frames in {files}")
+    return frames[:count]
+
+
+def sample_video_frames(path: str, count: int, start: int = 0, stop: Optional[int] = None) -> List[np.ndarray]:
+    """`count` frames evenly spaced over frames [start, stop) of a video file."""
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    stop = total if stop is None else min(stop, total)
+    frames = []
+    if stop > start:
+        for idx in np.linspace(start, stop - 1, num=min(count, stop - start)).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+    cap.release()
+    return frames
+
+
+def letterbox(frame: np.ndarray, size: int = YOLO_IMGSZ) -> np.ndarray:
+    """YOLO input for one BGR frame: padded to size x size, RGB, (3, H, W) float32 in [0, 1]."""
+    h, w = frame.shape[:2]
+    r = min(size / h, size / w)
+    nh, nw = max(1, round(h * r)), max(1, round(w * r))
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(out[..., ::-1].transpose(2, 0, 1), dtype=np.float32) / 255.0
+
+
+def calibration_crops(frames: List[np.ndarray], per_frame: int = 4, seed: int = 0) -> List[np.ndarray]:
+    """Person-shaped windows (aspect 1:2 to 1:3) cut from the frames, for Re-ID calibration."""
+    rng = np.random.default_rng(seed)
+    crops = []
+    for frame in frames:
+        h, w = frame.shape[:2]
+        for _ in range(per_frame):
+            ch = int(rng.integers(max(2, h // 5), max(3, int(h * 0.8))))
+            cw = max(1, min(w, int(ch / rng.uniform(2.0, 3.0))))
+            y = int(rng.integers(0, h - ch + 1))
+            x = int(rng.integers(0, w - cw + 1))
+            crops.append(frame[y:y + ch, x:x + cw])
+    return crops
+
+
+def reid_batches(crops: List[np.ndarray], batch: int = 8) -> List[np.ndarray]:
+    """Preprocessed OSNet input batches (copies, unlike CropPreprocessor's shared buffer)."""
+    pre = CropPreprocessor(batch)
+    return [pre(crops[i:i + batch]).copy() for i in range(0, len(crops), batch)]
+
+
+def _quantize_onnx(src: str, dst: str, batches: Iterable[np.ndarray], op_types: Optional[List[str]] = None):
+    """Static INT8 quantization of an ONNX model, calibrated on `batches` of its first input."""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    source = onnx.load(src)
+    input_name = source.graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter(batches)
+
+        def get_next(self):
+            x = next(self._batches, None)
+            return None if x is None else {input_name: x}
+
+    tmp = dst + f".{os.getpid()}.tmp"
+    quantize_static(src, tmp, _Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    op_types_to_quantize=op_types)
+    # ultralytics reads class names, stride and image size from the metadata
+    quantized = onnx.load(tmp)
+    if not quantized.metadata_props:
+        quantized.metadata_props.extend(source.metadata_props)
+        onnx.save(quantized, tmp)
+    _publish(tmp, dst)
+
+
+# ----------------------------------------------------------------------- YOLO
+
+def _yolo_calibration_data(names: dict, frames: List[np.ndarray]) -> str:
+    """Image folder + dataset yaml in the layout ultralytics' INT8 export reads."""
+    root = os.path.join(CACHE_DIR, "calibration")
+    images = os.path.join(root, "images")
+    shutil.rmtree(images, ignore_errors=True)
+    os.makedirs(images)
+    for i, frame in enumerate(frames):
+        cv2.imwrite(os.path.join(images, f"{i:04d}.jpg"), frame)
+    path = os.path.join(root, "calibration.yaml")
+    with open(path, "w") as f:
+        f.write(f"path: {os.path.abspath(root)}\ntrain: images\nval: images\nnames:\n")
+        for k, v in names.items():
+            f.write(f"  {k}: {v}\n")
+    return path
+
+
+def export_yolo(model_path: str, runtime: str, int8: bool,
+                calibration: Optional[List[np.ndarray]] = None) -> str:
+    """Export YOLO weights for `runtime` (once) and return the cached artifact path."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    target = artifact_path(stem, runtime, int8)
+    with _EXPORT_LOCK:
+        if os.path.exists(target):
+            return target
+        from ultralytics import YOLO
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        started = time.perf_counter()
+        model = YOLO(model_path)
+        if runtime == "onnx":
+            fp32 = artifact_path(stem, "onnx", False)
+            if not os.path.exists(fp32):
+                # dynamic batch and image axes: the scheduler batches cameras at per-camera sizes
+                _publish(model.export(format="onnx", imgsz=YOLO_IMGSZ, dynamic=True, simplify=True), fp32)
+            if int8:
+                frames = calibration if calibration is not None else load_calibration_frames()
+                # Convolutions only: the box decoding at the end stays fp32
+                _quantize_onnx(fp32, target, (letterbox(f)[None] for f in frames), op_types=["Conv"])
+        else:
+            kwargs = {}
+            if int8:
+                frames = calibration if calibration is not None else load_calibration_frames()
+                kwargs = {"int8": True, "data": _yolo_calibration_data(model.names, frames)}
+            _publish(model.export(format="openvino", imgsz=YOLO_IMGSZ, dynamic=True, **kwargs), target)
+        print(f"[backend] Exported {model_path} -> {target} in {time.perf_counter() - started:.1f}s")
+    return target
+
+
+def load_yolo(model_path: str, spec: Optional[str] = None):
+    """ultralytics YOLO model running on the configured backend; raises if that fails."""
+    from ultralytics import YOLO
+    runtime, int8 = parse_backend(spec or YOLO_BACKEND)
+    if runtime == "torch":
+        model = YOLO(model_path)
+        model.to("cpu")
+        return model
+    return YOLO(export_yolo(model_path, runtime, int8), task="detect")
+
+
+# --------------------------------------------------------------------- OSNet
+
+class OnnxRunner:
+    """ONNX Runtime session on the CPU: (N, 3, H, W) float32 -> (N, C) features."""
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0].name
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input: x})[0]
+
+
+class OpenVINORunner:
+    """OpenVINO compiled model on the CPU: (N, 3, H, W) float32 -> (N, C) features."""
+
+    def __init__(self, path: str):
+        import openvino as ov
+        self.compiled = ov.Core().compile_model(os.path.join(path, "model.xml"), "CPU")
+        self.output = self.compiled.output(0)
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        return self.compiled([x])[self.output]
+
+
+def export_reid(model, runtime: str, int8: bool, name: str = "osnet_x1_0",
+                calibration: Optional[List[np.ndarray]] = None) -> str:
+    """Export a torch Re-ID model for `runtime` (once) and return the cached artifact path."""
+    target = artifact_path(name, runtime, int8)
+    with _EXPORT_LOCK:
+        if os.path.exists(target):
+            return target
+        import torch
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        started = time.perf_counter()
+        fp32 = artifact_path(name, "onnx", False)
+        if not os.path.exists(fp32):
+            tmp = fp32 + f".{os.getpid()}.tmp"
+            device = next(model.parameters()).device
+            with torch.no_grad():
+                torch.onnx.export(model.eval(), torch.zeros((1, 3) + REID_SIZE, device=device), tmp,
+                                  input_names=["images"], output_names=["features"], opset_version=13,
+                                  dynamic_axes={"images": {0: "batch"}, "features": {0: "batch"}})
+            _publish(tmp, fp32)
+
+        batches = None
+        if int8:
+            frames = calibration if calibration is not None else load_calibration_frames()
+            batches = reid_batches(calibration_crops(frames))
+        if runtime == "onnx" and int8:
+            _quantize_onnx(fp32, target, batches)
+        elif runtime == "openvino":
+            import openvino as ov
+            ov_model = ov.convert_model(fp32)
+            if int8:
+                import nncf
+                ov_model = nncf.quantize(ov_model, nncf.Dataset(batches))
+            tmp = target + f".{os.getpid()}.tmp"
+            os.makedirs(tmp, exist_ok=True)
+            ov.save_model(ov_model, os.path.join(tmp, "model.xml"))
+            _publish(tmp, target)
+        print(f"[backend] Exported {name} -> {target} in {time.perf_counter() - started:.1f}s")
+    return target
+
+
+def load_reid_runner(model, spec: Optional[str] = None) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """Runner for the configured Re-ID backend, or None for torch; raises if that fails."""
+    runtime, int8 = parse_backend(spec or REID_BACKEND)
+    if runtime == "torch":
+        return None
+    path = export_reid(model, runtime, int8)
+    return OnnxRunner(path) if runtime == "onnx" else OpenVINORunner(path)
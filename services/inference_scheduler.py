@@ -0,0 +1,245 @@
+# services/inference_scheduler.py
+"""
+Cross-camera batched inference.
+
+Camera threads (CameraWorker, StaircaseDensityMonitor, ThermalHumanDetector)
+submit single frames and wait on a Future. One scheduler thread per model
+collects frames from all cameras into a batch - until `max_batch` frames are
+queued or the oldest frame has waited `max_wait_ms` - runs one batched forward
+pass and hands each result back to its caller. The model is only ever called
+from the scheduler thread, so cameras no longer share it across threads.
+
+Configuration (environment variables):
+    EVAC_YOLO_MAX_BATCH      frames per forward pass (default 8)
+    EVAC_YOLO_MAX_WAIT_MS    latency deadline for an incomplete batch (default 10)
+    EVAC_YOLO_MIN_CONF       confidence floor applied inside the model call (default 0.25)
+Only the person class is kept by the model call (before NMS); callers apply
+their own, stricter confidence limits on top of the floor.
+The model runs on the backend chosen by EVAC_YOLO_BACKEND (see inference_backend).
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from services import inference_backend
+
+MAX_BATCH = int(os.environ.get("EVAC_YOLO_MAX_BATCH", 8))
+MAX_WAIT_MS = float(os.environ.get("EVAC_YOLO_MAX_WAIT_MS", 10))
+MIN_CONF = float(os.environ.get("EVAC_YOLO_MIN_CONF", 0.25))
+PERSON_CLASSES = [0]  # COCO person
+LATENCY_WINDOW = 256  # latency samples kept per camera
+
+
+class _Job:
+    __slots__ = ("frame", "source", "imgsz", "future", "submitted")
+
+    def __init__(self, frame: np.ndarray, source: str, imgsz: Optional[int] = None):
+        self.frame = frame
+        self.source = source
+        self.imgsz = imgsz
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class _SourceStats:
+    def __init__(self):
+        self.frames = 0
+        self.errors = 0
+        self.latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self.wait_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> dict:
+        lat = np.asarray(self.latency_ms) if self.latency_ms else np.zeros(1)
+        wait = np.asarray(self.wait_ms) if self.wait_ms else np.zeros(1)
+        return {
+            "frames": self.frames,
+            "errors": self.errors,
+            "latency_ms_mean": round(float(lat.mean()), 2),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 2),
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 2),
+            "queue_wait_ms_mean": round(float(wait.mean()), 2)
+        }
+
+
+class InferenceScheduler:
+    """
+    Batches single-frame requests from many threads into one model call.
+
+    `predict` takes a list of frames and returns one result per frame, in
+    order (an ultralytics YOLO model called on a list does exactly that).
+    """
+
+    def __init__(self, predict: Callable[[List[np.ndarray]], List[Any]],
+                 max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS,
+                 name: str = "yolo"):
+        self.predict = predict
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.model = None  # set by get_yolo_scheduler for callers that need model.names
+        self.backend = "torch"
+
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._sources: Dict[str, _SourceStats] = {}
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._infer_ms = deque(maxlen=LATENCY_WINDOW)
+        self._frames_by_size = Counter()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=f"{name}-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: np.ndarray, source: str = "default", imgsz: Optional[int] = None) -> Future:
+        """
+        Queue one frame; the Future resolves to that frame's result.
+        `imgsz` is the model input size for this frame (None = the model default);
+        frames of different sizes share a collection window but not a forward pass.
+        """
+        if self._stop:
+            raise RuntimeError(f"Inference scheduler '{self.name}' is stopped")
+        job = _Job(frame, source, imgsz)
+        self._queue.put(job)
+        return job.future
+
+    def infer(self, frame: np.ndarray, source: str = "default", timeout: Optional[float] = None,
+              imgsz: Optional[int] = None):
+        """Blocking submit(): returns the result for `frame`."""
+        return self.submit(frame, source, imgsz).result(timeout=timeout)
+
+    def stop(self):
+        self._stop = True
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _collect(self) -> List[_Job]:
+        job = self._queue.get()
+        if job is None:
+            return []
+        batch = [job]
+        deadline = job.submitted + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                nxt = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                self._queue.put(None)  # let the loop see the stop marker after this batch
+                break
+            batch.append(nxt)
+        return batch
+
+    def _run(self):
+        while not self._stop:
+            batch = self._collect()
+            if not batch:
+                continue
+            groups: Dict[Optional[int], List[_Job]] = {}
+            for job in batch:
+                groups.setdefault(job.imgsz, []).append(job)
+            for imgsz, jobs in groups.items():
+                self._run_batch(jobs, imgsz)
+
+        # Fail anything still queued so no caller waits forever
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.future.set_exception(RuntimeError(f"Inference scheduler '{self.name}' stopped"))
+
+    def _run_batch(self, batch: List[_Job], imgsz: Optional[int]):
+        started = time.perf_counter()
+        try:
+            frames = [job.frame for job in batch]
+            results = self.predict(frames) if imgsz is None else self.predict(frames, imgsz=imgsz)
+            if len(results) != len(batch):
+                raise RuntimeError(f"model returned {len(results)} results for {len(batch)} frames")
+            error = None
+        except Exception as e:
+            print(f"[{self.name}] Batched inference failed ({len(batch)} frames): {e}")
+            results, error = None, e
+        finished = time.perf_counter()
+
+        with self._stats_lock:
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+            self._frames_by_size[imgsz or "default"] += len(batch)
+            self._infer_ms.append((finished - started) * 1000)
+            for job in batch:
+                stats = self._sources.setdefault(job.source, _SourceStats())
+                stats.frames += 1
+                stats.wait_ms.append((started - job.submitted) * 1000)
+                stats.latency_ms.append((finished - job.submitted) * 1000)
+                if error is not None:
+                    stats.errors += 1
+
+        for i, job in enumerate(batch):
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(results[i])
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            frames = sum(size * n for size, n in self._batch_sizes.items())
+            infer = np.asarray(self._infer_ms) if self._infer_ms else np.zeros(1)
+            return {
+                "backend": self.backend,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "frames": frames,
+                "mean_batch_size": round(frames / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "inference_ms_mean": round(float(infer.mean()), 2),
+                "frames_by_imgsz": {str(k): v for k, v in self._frames_by_size.items()},
+                "cameras": {src: s.to_dict() for src, s in self._sources.items()}
+            }
+
+
+_SCHEDULERS: Dict[str, InferenceScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_yolo_scheduler(model_path: str = "AI_models/yolov8n.pt") -> InferenceScheduler:
+    """Shared scheduler (and model) for a YOLO weights file; created on first use."""
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(model_path)
+        if scheduler is None:
+            backend = inference_backend.YOLO_BACKEND
+            try:
+                model = inference_backend.load_yolo(model_path, backend)
+            except Exception as e:
+                print(f"Warning: YOLO backend '{backend}' unavailable ({e}), using torch")
+                backend = "torch"
+                model = inference_backend.load_yolo(model_path, backend)
+            scheduler = InferenceScheduler(
+                lambda frames, imgsz=inference_backend.YOLO_IMGSZ: model(
+                    frames, verbose=False, classes=PERSON_CLASSES, conf=MIN_CONF, imgsz=imgsz),
+                name=os.path.basename(model_path))
+            scheduler.model = model
+            scheduler.backend = backend
+            _SCHEDULERS[model_path] = scheduler
+        return scheduler
+
+
+def get_all_stats() -> Dict[str, dict]:
+    with _SCHEDULERS_LOCK:
+        return {path: s.get_stats() for path, s in _SCHEDULERS.items()}
+
+
+def shutdown_schedulers():
+    with _SCHEDULERS_LOCK:
+        for scheduler in _SCHEDULERS.values():
+            scheduler.stop()
+        _SCHEDULERS.clear()
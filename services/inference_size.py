@@ -0,0 +1,128 @@
+# services/inference_size.py
+"""
+Per-camera YOLO input size.
+
+A camera's size is either static (e.g. 640) or "auto". In auto mode the
+camera probes at the largest size for a few detections, records how tall
+the people it sees are, and picks the smallest size at which the smaller
+ones (20th percentile of box heights) are still MIN_BOX_PX tall in the model
+input; the scheduler letterboxes the frame (or ROI crop) so that its long
+side is the chosen size. If detections at that size cost more than the
+frame budget (1 / EVAC_TARGET_FPS, else 1 / source fps) it steps down to the
+largest size that fits, estimating unmeasured sizes from measured ones by
+pixel count. The probe repeats every EVAC_INFER_SIZE_RECHECK_S seconds, so a
+camera follows people moving closer or further away and changing CPU load.
+
+Configuration (environment variables):
+    EVAC_INFER_SIZE             default for all cameras: a size or "auto" (default 640)
+    EVAC_INFER_SIZE_RECHECK_S   seconds between auto re-checks (default 60)
+"""
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from services.adaptive_sampler import TARGET_FPS
+
+INFER_SIZE = os.environ.get("EVAC_INFER_SIZE", "640")
+RECHECK_S = float(os.environ.get("EVAC_INFER_SIZE_RECHECK_S", 60))
+SIZES = (320, 384, 448, 512, 576, 640)
+MIN_BOX_PX = 48        # person height in model pixels that yolov8n still detects reliably
+HEIGHT_PERCENTILE = 20
+PROBE_DETECTIONS = 8   # detections at full size per probe
+STRIDE = 32            # YOLO sizes are multiples of the model stride
+
+
+def parse_size(mode: Union[str, int, None]) -> Union[str, int]:
+    """'auto' or a positive multiple of 32 (None = EVAC_INFER_SIZE); raises ValueError otherwise."""
+    if mode is None:
+        mode = INFER_SIZE
+    if str(mode).strip().lower() == "auto":
+        return "auto"
+    size = int(mode)
+    if size <= 0 or size % STRIDE:
+        raise ValueError(f"Inference size must be 'auto' or a positive multiple of {STRIDE}, got {mode}")
+    return size
+
+
+class InferenceSize:
+    def __init__(self, mode: Union[str, int, None] = None, sizes: Sequence[int] = SIZES,
+                 target_fps: Optional[float] = TARGET_FPS, recheck_s: float = RECHECK_S,
+                 min_box_px: float = MIN_BOX_PX, alpha: float = 0.2):
+        mode = parse_size(mode)
+        self.auto = mode == "auto"
+        self.sizes = sorted(sizes)
+        self.size = max(self.sizes) if self.auto else mode
+        self.target_fps = target_fps
+        self.recheck_s = recheck_s
+        self.min_box_px = min_box_px
+        self.alpha = alpha
+        self.cost_ms: Dict[int, float] = {}  # size -> EMA of detection cost
+        self.box_height: Optional[float] = None  # percentile height in input pixels, last probe
+        self._heights = deque(maxlen=512)
+        self._probe_left = PROBE_DETECTIONS if self.auto else 0
+        self._next_check = time.monotonic() + recheck_s
+        self.checks = 0
+
+    @property
+    def probing(self) -> bool:
+        return self._probe_left > 0
+
+    def next_size(self) -> int:
+        """Input size for the next detection."""
+        if self.auto and not self.probing and time.monotonic() >= self._next_check:
+            self._probe_left = PROBE_DETECTIONS
+            self._heights.clear()
+        return max(self.sizes) if self.probing else self.size
+
+    def record(self, size: int, seconds: float, dets: np.ndarray, long_side: int,
+               source_fps: Optional[float] = None):
+        """
+        One detection at `size`: its cost, and the (N, >=4) boxes found in an input
+        whose long side is `long_side` pixels.
+        """
+        ms = seconds * 1000
+        prev = self.cost_ms.get(size)
+        self.cost_ms[size] = ms if prev is None else prev + self.alpha * (ms - prev)
+        if not self.probing:
+            return
+        if len(dets):
+            self._heights.extend((dets[:, 3] - dets[:, 1]).tolist())
+        self._probe_left -= 1
+        if self._probe_left == 0:
+            self._choose(long_side, source_fps)
+
+    def _estimate_ms(self, size: int) -> float:
+        if size in self.cost_ms:
+            return self.cost_ms[size]
+        ref = min(self.cost_ms, key=lambda s: abs(s - size))
+        return self.cost_ms[ref] * (size / ref) ** 2
+
+    def _choose(self, long_side: int, source_fps: Optional[float]):
+        self.checks += 1
+        self._next_check = time.monotonic() + self.recheck_s
+        size = max(self.sizes)
+        if self._heights:
+            # letterboxing scales the input's long side to `size`
+            self.box_height = float(np.percentile(self._heights, HEIGHT_PERCENTILE))
+            need = self.min_box_px * long_side / max(self.box_height, 1.0)
+            size = next((s for s in self.sizes if s >= need), max(self.sizes))
+        fps = self.target_fps or source_fps
+        if fps and self.cost_ms:
+            budget_ms = 1000.0 / fps
+            while size > min(self.sizes) and self._estimate_ms(size) > budget_ms:
+                size = max(s for s in self.sizes if s < size)
+        self.size = size
+
+    def get_stats(self) -> dict:
+        return {
+            "mode": "auto" if self.auto else "static",
+            "imgsz": self.size,
+            "cost_ms": round(self.cost_ms.get(self.size, 0.0), 2),
+            "cost_ms_by_imgsz": {str(s): round(v, 2) for s, v in sorted(self.cost_ms.items())},
+            "person_height_px": round(self.box_height, 1) if self.box_height is not None else None,
+            "probing": self.probing,
+            "checks": self.checks
+        }
@@ -0,0 +1,173 @@
+# services/instrumentation.py
+"""
+Lightweight hot-path instrumentation for the routing APIs.
+
+    with phase("aco"):
+        ...
+    count("astar_expansions", n)
+
+Phases feed a per-request trace (used for the Server-Timing header) and
+process-wide latency histograms exposed in Prometheus text format at /metrics.
+Work that runs in a compute-pool worker returns its trace with the result and
+is merged into the API process (see compute_pool.run_limited).
+
+Disable with EVAC_METRICS=0: phase() then returns a shared no-op context
+manager and count() returns immediately.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, Optional, Tuple
+
+ENABLED = os.environ.get("EVAC_METRICS", "1") != "0"
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+
+
+class Trace:
+    """Phase durations (seconds) and counters collected for one request."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_count(self, name: str, n: float):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def export(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        return self.phases, self.counters
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={secs * 1000:.1f}" for name, secs in self.phases.items())
+
+
+_CURRENT: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("evac_trace", default=None)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+_LOCK = threading.Lock()
+_PHASES: Dict[str, _Histogram] = {}
+_REQUESTS: Dict[str, _Histogram] = {}
+_COUNTERS: Dict[str, float] = {}
+
+
+def _observe(table: Dict[str, _Histogram], name: str, seconds: float):
+    with _LOCK:
+        hist = table.get(name)
+        if hist is None:
+            hist = table[name] = _Histogram()
+        hist.observe(seconds)
+
+
+def _record_phase(name: str, seconds: float):
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.add_phase(name, seconds)
+    _observe(_PHASES, name, seconds)
+
+
+class _Phase:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record_phase(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+def phase(name: str):
+    """Context manager timing one phase of the current request."""
+    if not ENABLED:
+        return _NOOP
+    return _Phase(name)
+
+
+def count(name: str, n: float = 1):
+    """Add n to a counter (ACO iterations, A* expansions, cache hits, ...)."""
+    if not ENABLED:
+        return
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.add_count(name, n)
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+def start_trace() -> Optional[Trace]:
+    """Begin collecting a trace for the current context (request or pool job)."""
+    if not ENABLED:
+        return None
+    trace = Trace()
+    _CURRENT.set(trace)
+    return trace
+
+
+def merge(exported: Optional[Tuple[Dict[str, float], Dict[str, float]]]):
+    """Fold a trace exported by a pool worker into this process."""
+    if not exported:
+        return
+    phases, counters = exported
+    for name, secs in phases.items():
+        _record_phase(name, secs)
+    for name, n in counters.items():
+        count(name, n)
+
+
+def observe_request(endpoint: str, seconds: float):
+    if ENABLED:
+        _observe(_REQUESTS, endpoint, seconds)
+
+
+def traced_call(fn, args, kwargs):
+    """Pool entry point: run fn and return (result, exported trace)."""
+    trace = start_trace()
+    result = fn(*args, **kwargs)
+    return result, trace.export() if trace is not None else None
+
+
+def _histogram_lines(metric: str, label: str, table: Dict[str, _Histogram]):
+    lines = [f"# TYPE {metric} histogram"]
+    for name, hist in sorted(table.items()):
+        cumulative = 0
+        for bound, c in zip(BUCKETS, hist.counts):
+            cumulative += c
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {hist.n}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {hist.total:.6f}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {hist.n}')
+    return lines
+
+
+def render_prometheus() -> str:
+    with _LOCK:
+        lines = _histogram_lines("evac_phase_seconds", "phase", _PHASES)
+        lines += _histogram_lines("evac_request_seconds", "endpoint", _REQUESTS)
+        for name, value in sorted(_COUNTERS.items()):
+            lines.append(f"# TYPE evac_{name}_total counter")
+            lines.append(f"evac_{name}_total {value:g}")
+    return "\n".join(lines) + "\n"
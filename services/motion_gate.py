@@ -0,0 +1,121 @@
+# services/motion_gate.py
+"""
+Motion gate in front of detection.
+
+A camera watching an empty corridor changes very little from frame to frame,
+so there is nothing for YOLO to find. MotionGate compares a small grayscale
+copy of each frame the sampler wants detected (EVAC_MOTION_WIDTH pixels wide,
+blurred against sensor noise) with the previous one and measures the share
+of pixels whose brightness changed by more than PIXEL_DELTA. Below
+EVAC_MOTION_THRESHOLD the pipeline skips detection and lets the tracker's
+Kalman filter carry existing tracks forward.
+
+People standing still make no motion either, so detection is forced at
+least every EVAC_MOTION_FORCE_S seconds of video (in frames at the source
+frame rate, wall-clock time when that is unknown); the tracker then keeps
+them confirmed. Every skipped frame ages the tracks, so the pipelines also
+pass the tracker's max_age: detection is forced after at most max_age - 1
+frames whatever EVAC_MOTION_FORCE_S says, before DeepSORT would delete the
+track of someone standing still.
+
+Configuration (environment variables):
+    EVAC_MOTION_THRESHOLD    changed-pixel share that counts as activity (default 0.002, 0 = off)
+    EVAC_MOTION_FORCE_S      longest stretch without detection (default 2.0)
+    EVAC_MOTION_WIDTH        width of the compared frames (default 160)
+"""
+import os
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+MOTION_THRESHOLD = float(os.environ.get("EVAC_MOTION_THRESHOLD", 0.002))
+MOTION_FORCE_S = float(os.environ.get("EVAC_MOTION_FORCE_S", 2.0))
+MOTION_WIDTH = int(os.environ.get("EVAC_MOTION_WIDTH", 160))
+PIXEL_DELTA = 25  # gray levels a pixel must change by to count as moving
+
+
+class MotionGate:
+    def __init__(self, threshold: float = MOTION_THRESHOLD, force_s: float = MOTION_FORCE_S,
+                 width: int = MOTION_WIDTH, max_age: Optional[int] = None):
+        """
+        Args:
+            max_age: Tracker max_age (frames a track survives without a detection);
+                     forced detections come at most max_age - 1 frames apart
+        """
+        self.threshold = threshold
+        self.force_s = force_s
+        self.max_gap = max(1, int(max_age) - 1) if max_age else None
+        self.width = max(16, int(width))
+        self._prev: Optional[np.ndarray] = None
+        self._last_frame = None  # frame number of the last detection
+        self._last_time = time.monotonic()
+        self.activity = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.forced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _small(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _due(self, frame_no: int, source_fps: Optional[float]) -> bool:
+        if self._last_frame is None:
+            return True
+        gap = frame_no - self._last_frame
+        if self.max_gap is not None and gap >= self.max_gap:
+            return True
+        if source_fps:
+            return gap >= max(1, round(self.force_s * source_fps))
+        return time.monotonic() - self._last_time >= self.force_s
+
+    def check(self, frame: np.ndarray, frame_no: int, source_fps: Optional[float] = None) -> bool:
+        """
+        True if frame number `frame_no` should be detected: enough motion, or a
+        forced detection is due. Only frames the sampler wants detected need checking.
+        """
+        if not self.enabled:
+            return True
+        small = self._small(frame)
+        prev, self._prev = self._prev, small
+        self.checked += 1
+        if prev is None or prev.shape != small.shape:
+            self.activity = 1.0
+        else:
+            moving = cv2.absdiff(small, prev) > PIXEL_DELTA
+            self.activity = float(np.count_nonzero(moving)) / moving.size
+
+        if self.activity >= self.threshold:
+            detect = True
+        elif self._due(frame_no, source_fps):
+            detect = True
+            self.forced += 1
+        else:
+            detect = False
+
+        if detect:
+            self._last_frame = frame_no
+            self._last_time = time.monotonic()
+        else:
+            self.skipped += 1
+        return detect
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "activity": round(self.activity, 5),
+            "frames_checked": self.checked,
+            "frames_skipped": self.skipped,
+            "forced_detections": self.forced,
+            "skipped_ratio": round(self.skipped / self.checked, 4) if self.checked else 0.0
+        }
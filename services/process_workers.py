@@ -0,0 +1,418 @@
+# services/process_workers.py
+"""
+Process-per-camera worker mode.
+
+In thread mode (the default) every CameraWorker / StaircaseDensityMonitor runs
+as a thread of the API process, so the GIL serializes all their CPU work. With
+EVAC_WORKER_MODE=process each camera runs in its own spawned process with its
+own model instances (YOLO scheduler, Re-ID extractor, tracker):
+
+    frames        captured and processed inside the worker process; annotated
+                  output goes through a shared-memory FrameRing and is served
+                  by the API's /stream endpoints (the viewer count flows back
+                  through the ring header)
+    status        every write the pipeline makes to its status dict is sent to
+                  the API process over a pipe and merged into SHARED_STATUS
+    identities    Re-ID matching stays global: register_or_match_batch and
+                  resolve_ids calls are forwarded to the API process'
+                  IdentityManager
+
+A supervisor thread per worker serves these messages and watches the process.
+A non-zero exit (crash, uncaught pipeline exception, kill) triggers a restart
+with exponential backoff, up to EVAC_WORKER_MAX_RESTARTS times. A pipeline
+that finishes normally (end of video) is not restarted.
+
+Configuration (environment variables):
+    EVAC_WORKER_MODE            thread | process (default thread)
+    EVAC_WORKER_MAX_RESTARTS    restarts per worker before giving up (default 5)
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from services import frame_stream
+from services.frame_stream import FrameChannel
+from services.shm_ring import FrameRing
+
+WORKER_MODE = os.environ.get("EVAC_WORKER_MODE", "thread")
+MAX_RESTARTS = int(os.environ.get("EVAC_WORKER_MAX_RESTARTS", 5))
+RESTART_BACKOFF = 1.0   # seconds before the first restart, doubled per restart
+STOP_TIMEOUT = 5.0      # seconds a worker gets to stop before it is terminated
+
+
+# ----------------------------------------------------------------------------
+# Frame channels backed by a FrameRing
+# ----------------------------------------------------------------------------
+
+class RingWriterChannel(FrameChannel):
+    """Worker-process side: publishes annotated frames into the ring."""
+
+    def __init__(self, name: str, ring: FrameRing):
+        super().__init__(name)
+        self.ring = ring
+
+    def wanted(self) -> bool:
+        return self.ring.viewers > 0
+
+    def publish(self, frame: np.ndarray):
+        self.ring.write(frame)
+        self.published += 1
+
+
+class RingReaderChannel(FrameChannel):
+    """API-process side: serves a worker's ring to /stream viewers."""
+
+    def __init__(self, name: str, ring: FrameRing):
+        super().__init__(name)
+        self.ring = ring
+
+    @property
+    def seq(self) -> int:
+        return 0 if self.closed else self.ring.seq
+
+    def subscribe(self):
+        super().subscribe()
+        self.ring.viewers = self.viewers
+
+    def unsubscribe(self):
+        super().unsubscribe()
+        if not self.closed:
+            self.ring.viewers = self.viewers
+
+    def _latest(self):
+        with self._lock:
+            if self.closed:
+                return 0, None
+            return self.ring.read_latest()
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats["frames_published"] = self.seq
+        return stats
+
+
+# ----------------------------------------------------------------------------
+# Worker-process side
+# ----------------------------------------------------------------------------
+
+class _ParentLink:
+    """Pipe to the API process, shared by the pipeline thread and its helpers."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, msg):
+        with self.lock:
+            self.conn.send(msg)
+
+    def request(self, msg):
+        with self.lock:
+            self.conn.send(msg)
+            status, value = self.conn.recv()
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+
+class StatusPublisher(dict):
+    """Status dict handed to the pipeline in place of SHARED_STATUS; forwards every write."""
+
+    def __init__(self, link: _ParentLink):
+        super().__init__()
+        self._link = link
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._link.send(("status", {key: value}))
+
+    def update(self, *args, **kwargs):
+        changes = dict(*args, **kwargs)
+        super().update(changes)
+        self._link.send(("status", changes))
+
+
+class RemoteIdentityManager:
+    """Forwards Re-ID matching to the global IdentityManager in the API process."""
+
+    def __init__(self, link: _ParentLink):
+        self._link = link
+
+    def register_or_match_batch(self, features: np.ndarray, video_name: str):
+        return self._link.request(("match", np.asarray(features, dtype=np.float32), video_name))
+
+    def resolve_ids(self, global_ids):
+        return self._link.request(("resolve", list(global_ids)))
+
+
+def _child_main(target: Callable, kwargs: dict, conn, stop_event, ring_name: Optional[str],
+                stream_name: Optional[str]):
+    failed = []
+
+    def excepthook(args):
+        failed.append(args.exc_value)
+        traceback.print_exception(args.exc_type, args.exc_value, args.exc_traceback)
+    threading.excepthook = excepthook
+
+    link = _ParentLink(conn)
+    if ring_name:
+        ring = FrameRing(ring_name)
+        frame_stream.set_channel_factory(
+            lambda name: RingWriterChannel(name, ring) if name == stream_name else FrameChannel(name))
+
+    pipeline = target(StatusPublisher(link), RemoteIdentityManager(link), **kwargs)
+    while pipeline._thread.is_alive():
+        if stop_event.wait(0.2):
+            pipeline.stop()
+            break
+    pipeline._thread.join(timeout=STOP_TIMEOUT)
+    sys.exit(1 if failed else 0)
+
+
+def run_camera_worker(status: StatusPublisher, identity_manager, cam_name: str, source: str,
+                      area_m2: float = 50.0, det_filter: Optional[dict] = None,
+                      rois: Optional[List[dict]] = None, imgsz: Union[str, int, None] = None):
+    """Worker-process entry: a CameraWorker with its own detector, Re-ID model and tracker."""
+    from services.detector import DetectionFilter
+    from services.roi import RoiSet
+    from services.worker import CameraWorker
+    worker = CameraWorker(cam_name=cam_name, source=source, shared_status=status,
+                          lock=threading.Lock(), area_m2=area_m2, identity_manager=identity_manager,
+                          det_filter=DetectionFilter.from_dict(det_filter),
+                          rois=RoiSet.from_config(rois, area_m2), imgsz=imgsz)
+    worker.start()
+    return worker
+
+
+def run_staircase_monitor(status: StatusPublisher, identity_manager, source: str, stream_name: str,
+                          staircase_area_m2: float = 10.0, density_threshold: float = 0.5,
+                          det_filter: Optional[dict] = None, rois: Optional[List[dict]] = None,
+                          imgsz: Union[str, int, None] = None):
+    """Worker-process entry: a StaircaseDensityMonitor with its own detector and tracker."""
+    from services.detector import DetectionFilter
+    from services.roi import RoiSet
+    from staire_case.density_monitor import StaircaseDensityMonitor
+    monitor = StaircaseDensityMonitor(staircase_area_m2=staircase_area_m2,
+                                      density_threshold=density_threshold,
+                                      det_filter=DetectionFilter.from_dict(det_filter),
+                                      rois=RoiSet.from_config(rois, staircase_area_m2), imgsz=imgsz)
+    monitor.start(source, status, stream_name=stream_name)
+    return monitor
+
+
+# ----------------------------------------------------------------------------
+# API-process side
+# ----------------------------------------------------------------------------
+
+class ProcessWorker:
+    """
+    Runs `target(status, identity_manager, **kwargs)` in a child process and
+    supervises it. Same start()/stop()/get_status() interface as the threaded
+    workers, so the API can hold either.
+
+    Status writes from the child are merged into `status_target` under
+    `status_lock`: into status_target[status_key] when a key is given (the
+    Re-ID workers publish {cam_name: status}), else into status_target itself.
+    """
+
+    def __init__(self, target: Callable, kwargs: Dict[str, Any], status_target: dict,
+                 status_lock: threading.Lock, status_key: Optional[str] = None,
+                 identity_manager=None, stream_name: Optional[str] = None,
+                 max_restarts: int = MAX_RESTARTS, name: Optional[str] = None):
+        self.target = target
+        self.kwargs = kwargs
+        self.status_target = status_target
+        self.status_lock = status_lock
+        self.status_key = status_key
+        self.identity_manager = identity_manager
+        self.stream_name = stream_name
+        self.max_restarts = max_restarts
+        self.name = name or stream_name or getattr(target, "__name__", "worker")
+        self.restarts = 0
+        self.state = "idle"
+        self.last_exitcode: Optional[int] = None
+        self.process = None
+        self.ring: Optional[FrameRing] = None
+        self.channel: Optional[RingReaderChannel] = None
+        self._conn = None
+        self._stop_event = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.stream_name:
+            self.ring = FrameRing(create=True)
+            self.channel = RingReaderChannel(self.stream_name, self.ring)
+            frame_stream.add_channel(self.channel)
+        self._spawn()
+        self._thread = threading.Thread(target=self._supervise, daemon=True, name=f"supervise:{self.name}")
+        self._thread.start()
+
+    def _spawn(self):
+        # spawn, not fork: the API process runs threads and holds model state
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=_child_main,
+            args=(self.target, self.kwargs, child_conn, self._stop_event,
+                  self.ring.name if self.ring else None, self.stream_name),
+            daemon=True, name=f"evac-worker:{self.name}")
+        self.process.start()
+        child_conn.close()
+        self.state = "running"
+
+    def _apply_status(self, changes: dict):
+        with self.status_lock:
+            if self.status_key is None:
+                self.status_target.update(changes)
+            else:
+                for key, value in changes.items():
+                    self.status_target[key] = value
+
+    def _mark_stopped(self, error: Optional[str] = None):
+        fields = {"running": False}
+        if error:
+            fields["error"] = error
+        with self.status_lock:
+            target = self.status_target if self.status_key is None else self.status_target.get(self.status_key)
+            if target is not None:
+                target.update(fields)
+
+    def _handle(self, msg):
+        kind = msg[0]
+        if kind == "status":
+            self._apply_status(msg[1])
+        elif kind in ("match", "resolve"):
+            try:
+                if kind == "match":
+                    reply = ("ok", self.identity_manager.register_or_match_batch(msg[1], msg[2]))
+                else:
+                    reply = ("ok", self.identity_manager.resolve_ids(msg[1]))
+            except Exception as e:
+                reply = ("error", str(e))
+            self._conn.send(reply)
+
+    def _supervise(self):
+        while True:
+            try:
+                if self._conn.poll(0.2):
+                    self._handle(self._conn.recv())
+                    continue
+            except (EOFError, OSError):
+                time.sleep(0.05)  # child closed its end; check how it exited
+            if self.process.is_alive():
+                continue
+
+            self.last_exitcode = self.process.exitcode
+            if self._stopping:
+                self.state = "stopped"
+                return
+            if self.last_exitcode == 0:
+                self.state = "finished"
+                return
+
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                self.state = "failed"
+                print(f"[{self.name}] worker process exited with {self.last_exitcode}; "
+                      f"giving up after {self.max_restarts} restarts")
+                self._mark_stopped(f"worker process failed (exit code {self.last_exitcode})")
+                return
+            delay = min(RESTART_BACKOFF * 2 ** (self.restarts - 1), 30.0)
+            print(f"[{self.name}] worker process exited with {self.last_exitcode}; "
+                  f"restart {self.restarts}/{self.max_restarts} in {delay:.0f}s")
+            self.state = "restarting"
+            if self._wait_unless_stopping(delay):
+                self.state = "stopped"
+                return
+            self._conn.close()
+            self._spawn()
+
+    def _wait_unless_stopping(self, seconds: float) -> bool:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if self._stopping:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stop(self):
+        self._stopping = True
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=STOP_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=2)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._conn is not None:
+            self._conn.close()
+        if self.channel is not None:
+            frame_stream.close_channel(self.channel)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+        self._mark_stopped()
+        _unregister(self)
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": bool(self.process is not None and self.process.is_alive()),
+            "restarts": self.restarts,
+            "last_exitcode": self.last_exitcode
+        }
+
+    def get_status(self) -> dict:
+        """Latest status published by the pipeline, plus process info under "worker"."""
+        with self.status_lock:
+            if self.status_key is None:
+                status = dict(self.status_target)
+            else:
+                status = dict(self.status_target.get(self.status_key, {}))
+        status["worker"] = self.get_stats()
+        return status
+
+
+_WORKERS: List[ProcessWorker] = []
+_WORKERS_LOCK = threading.Lock()
+
+
+def start_process_worker(*args, **kwargs) -> ProcessWorker:
+    """Create, register and start a ProcessWorker (arguments as for ProcessWorker)."""
+    worker = ProcessWorker(*args, **kwargs)
+    with _WORKERS_LOCK:
+        _WORKERS.append(worker)
+    worker.start()
+    return worker
+
+
+def _unregister(worker: ProcessWorker):
+    with _WORKERS_LOCK:
+        if worker in _WORKERS:
+            _WORKERS.remove(worker)
+
+
+def get_all_stats() -> dict:
+    with _WORKERS_LOCK:
+        workers = list(_WORKERS)
+    return {"mode": WORKER_MODE, "workers": [w.get_stats() for w in workers]}
+
+
+def shutdown_workers():
+    with _WORKERS_LOCK:
+        workers = list(_WORKERS)
+    for w in workers:
+        w.stop()
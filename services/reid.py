@@ -1,12 +1,18 @@
 # services/reid.py
+import threading
 import torch
 import torchvision.transforms as T
 import numpy as np
-from typing import Optional
+from typing import Optional, List, Tuple
 import torchreid
+from services.reid_preprocess import CropPreprocessor
+from services import inference_backend
 
 class ReIDExtractor:
-    def __init__(self, device: Optional[str] = None):
+    # Crops per forward pass in extract_batch; bounds memory on very crowded frames
+    MAX_BATCH = 32
+
+    def __init__(self, device: Optional[str] = None, backend: Optional[str] = None):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         # Build model (osnet_x1_0) and load ImageNet pretrained weights shipped by torchreid
         self.model = torchreid.models.build_model(name='osnet_x1_0', num_classes=1000, loss='softmax')
@@ -21,6 +27,8 @@ class ReIDExtractor:
             print("Warning: failed to load pretrained weights:", e)
         self.model.eval().to(self.device)
 
+        # Reference PIL pipeline; extract()/extract_batch() use the equivalent
+        # OpenCV path in reid_preprocess, with one reused buffer per thread
         self.transform = T.Compose([
             T.ToPILImage(),
             T.Resize((256, 128)),
@@ -28,6 +36,34 @@ class ReIDExtractor:
             T.Normalize([0.485, 0.456, 0.406],
                         [0.229, 0.224, 0.225])
         ])
+        self._local = threading.local()
+
+        # ONNX Runtime / OpenVINO replace the eager model on the CPU (EVAC_REID_BACKEND)
+        self.backend = "torch"
+        self.runner = None
+        spec = backend or inference_backend.REID_BACKEND
+        if inference_backend.parse_backend(spec)[0] != "torch":
+            if self.device != "cpu":
+                print(f"Warning: Re-ID backend '{spec}' is CPU-only, keeping torch on {self.device}")
+            else:
+                try:
+                    self.runner = inference_backend.load_reid_runner(self.model, spec)
+                    self.backend = spec
+                except Exception as e:
+                    print(f"Warning: Re-ID backend '{spec}' unavailable ({e}), using torch")
+
+    def _preprocess(self, crops: List[np.ndarray]) -> np.ndarray:
+        pre = getattr(self._local, "pre", None)
+        if pre is None:
+            pre = self._local.pre = CropPreprocessor(self.MAX_BATCH)
+        return pre(crops)  # view of the buffer, no copy
+
+    def _forward(self, x: np.ndarray) -> np.ndarray:
+        """(N, 3, 256, 128) preprocessed batch -> raw (N, C) features."""
+        if self.runner is not None:
+            return self.runner(x)
+        with torch.no_grad():
+            return self.model(torch.from_numpy(x).to(self.device)).cpu().numpy()
 
     def extract(self, img_bgr) -> Optional[np.ndarray]:
         """
@@ -35,11 +71,7 @@ class ReIDExtractor:
         returns L2-normalized numpy vec (C,) or None on failure
         """
         try:
-            img_rgb = img_bgr[..., ::-1]  # BGR -> RGB
-            x = self.transform(img_rgb).unsqueeze(0).to(self.device)
-            with torch.no_grad():
-                feat = self.model(x)  # shape (1, C)
-            feat = feat.cpu().numpy().reshape(-1)
+            feat = self._forward(self._preprocess([img_bgr])).reshape(-1)  # (1, C) -> (C,)
             # L2 normalize
             n = np.linalg.norm(feat) + 1e-8
             feat = feat / n
@@ -47,3 +79,32 @@ class ReIDExtractor:
         except Exception as e:
             print("ReID extract error:", e)
             return None
+
+    def extract_batch(self, crops: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        crops: cropped persons (BGR from OpenCV), any sizes
+        returns (feats, valid): L2-normalized (N, C) float32 matrix, row i for crops[i],
+        and a boolean (N,) mask of the rows that were extracted. A chunk whose batched
+        forward pass fails is retried crop by crop with extract(), so one bad crop
+        only loses its own row.
+        """
+        n = len(crops)
+        if n == 0:
+            return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=bool)
+        rows: List[Optional[np.ndarray]] = [None] * n
+        for i in range(0, n, self.MAX_BATCH):
+            chunk = crops[i:i + self.MAX_BATCH]
+            try:
+                feats = self._forward(self._preprocess(chunk)).astype(np.float32, copy=False)
+                feats /= np.linalg.norm(feats, axis=1, keepdims=True) + 1e-8
+                rows[i:i + len(chunk)] = list(feats)
+            except Exception as e:
+                print(f"ReID batch extract error ({len(chunk)} crops, retrying one by one):", e)
+                rows[i:i + len(chunk)] = [self.extract(c) for c in chunk]
+
+        valid = np.array([r is not None for r in rows], dtype=bool)
+        dim = next((r.shape[0] for r in rows if r is not None), 0)
+        feats = np.zeros((n, dim), dtype=np.float32)
+        for j in np.flatnonzero(valid):
+            feats[j] = rows[j]
+        return feats, valid
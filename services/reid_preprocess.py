@@ -0,0 +1,51 @@
+# services/reid_preprocess.py
+"""
+Allocation-free Re-ID crop preprocessing.
+
+Equivalent to the torchvision pipeline ToPILImage -> Resize((256, 128)) ->
+ToTensor -> Normalize(ImageNet mean/std) on BGR->RGB crops, but each crop is
+resized with OpenCV into a reused uint8 scratch image and written straight
+into a preallocated float32 (N, 3, 256, 128) batch buffer; channel swap and
+normalization happen while copying into the buffer. The returned array is a
+view of that buffer (torch.from_numpy shares it without copying), so it is
+only valid until the next call.
+"""
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+REID_SIZE: Tuple[int, int] = (256, 128)  # (height, width) expected by OSNet
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class CropPreprocessor:
+    """Not thread-safe: use one instance per thread (ReIDExtractor does)."""
+
+    def __init__(self, capacity: int = 32, size: Tuple[int, int] = REID_SIZE):
+        self.size = size
+        self.buffer = np.empty((capacity, 3) + size, dtype=np.float32)
+        self._scratch = np.empty(size + (3,), dtype=np.uint8)
+        # (x / 255 - mean) / std  ==  x * scale - offset
+        self._scale = (1.0 / (255.0 * STD)).astype(np.float32)
+        self._offset = (MEAN / STD).astype(np.float32)
+
+    def __call__(self, crops: List[np.ndarray]) -> np.ndarray:
+        """BGR crops (any sizes) -> normalized RGB (N, 3, H, W) float32 view of the buffer."""
+        n = len(crops)
+        if n > len(self.buffer):
+            self.buffer = np.empty((max(n, 2 * len(self.buffer)), 3) + self.size, dtype=np.float32)
+
+        h, w = self.size
+        for i, crop in enumerate(crops):
+            # INTER_AREA when shrinking is closest to PIL's antialiased bilinear resize
+            shrink = crop.shape[0] >= h and crop.shape[1] >= w
+            cv2.resize(crop, (w, h), dst=self._scratch,
+                       interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+            out = self.buffer[i]
+            for c in range(3):
+                # output channel c (RGB) comes from scratch channel 2 - c (BGR)
+                np.multiply(self._scratch[..., 2 - c], self._scale[c], out=out[c])
+                out[c] -= self._offset[c]
+        return self.buffer[:n]
@@ -0,0 +1,164 @@
+# services/roi.py
+"""
+Per-camera regions of interest.
+
+A camera or staircase monitor can register polygons (pixel coordinates of
+the camera frame) for the parts of the view it cares about, e.g. the steps of
+a staircase. Detection then runs only on the bounding crop of all polygons;
+the inference scheduler letterboxes that crop to the model size like any
+frame, so a small region gets more model pixels per person and the rest of
+the frame costs nothing. The crop is widened by `margin` on every side and
+by `head_room` above, as fractions of the frame height, so people standing
+on the polygon's upper edge are still fully visible.
+
+Detections and tracks are assigned to a region by their foot point (bottom
+centre of the box), which is what stands inside a floor polygon. Boxes whose
+foot point is in no region are dropped. Density is counted per region, each
+with its own floor area.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd rule for (N, 2) points against an (M, 2) polygon; returns (N,) bool."""
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    straddles = (y1 > y) != (y2 > y)
+    dy = np.where(y2 == y1, 1.0, y2 - y1)
+    crosses = straddles & (x < x1 + (x2 - x1) * (y - y1) / dy)
+    return crosses.sum(axis=1) % 2 == 1
+
+
+def foot_points(boxes: np.ndarray) -> np.ndarray:
+    """Bottom-centre points of (N, >=4) x1, y1, x2, y2 boxes."""
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+
+
+class Roi:
+    def __init__(self, name: str, polygon: Sequence[Sequence[float]], area_m2: Optional[float] = None):
+        self.name = str(name)
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError(f"ROI '{self.name}' needs at least 3 points")
+        self.area_m2 = float(area_m2) if area_m2 else None
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        return points_in_polygon(points, self.polygon)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "polygon": self.polygon.tolist(), "area_m2": self.area_m2}
+
+
+class RoiSet:
+    def __init__(self, rois: List[Roi], default_area_m2: float = 1.0,
+                 margin: float = 0.05, head_room: float = 0.25):
+        if not rois:
+            raise ValueError("RoiSet needs at least one ROI")
+        names = [r.name for r in rois]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate ROI names: {names}")
+        self.rois = rois
+        self.default_area_m2 = float(default_area_m2)
+        self.margin = margin
+        self.head_room = head_room
+        self._bounds: Dict[Tuple[int, int], Tuple[int, int, int, int]] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[List[dict]], default_area_m2: float = 1.0) -> Optional["RoiSet"]:
+        """
+        RoiSet from [{"name": ..., "polygon": [[x, y], ...], "area_m2": ...}, ...];
+        None for an empty config (whole frame). Raises ValueError on bad input.
+        """
+        if not config:
+            return None
+        rois = []
+        for i, c in enumerate(config):
+            if "polygon" not in c:
+                raise ValueError(f"ROI {i} has no polygon")
+            rois.append(Roi(c.get("name") or f"roi{i}", c["polygon"], c.get("area_m2")))
+        return cls(rois, default_area_m2)
+
+    def to_config(self) -> List[dict]:
+        return [r.to_dict() for r in self.rois]
+
+    def area_m2(self, roi: Roi) -> float:
+        return roi.area_m2 or self.default_area_m2
+
+    def crop_bounds(self, frame_shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+        """(x1, y1, x2, y2) of the detection crop for frames of this shape."""
+        h, w = frame_shape[:2]
+        bounds = self._bounds.get((h, w))
+        if bounds is None:
+            pts = np.concatenate([r.polygon for r in self.rois])
+            pad, up = self.margin * h, (self.margin + self.head_room) * h
+            x1 = int(np.clip(pts[:, 0].min() - pad, 0, w - 1))
+            y1 = int(np.clip(pts[:, 1].min() - up, 0, h - 1))
+            x2 = int(np.clip(np.ceil(pts[:, 0].max() + pad), x1 + 1, w))
+            y2 = int(np.clip(np.ceil(pts[:, 1].max() + pad), y1 + 1, h))
+            bounds = self._bounds[(h, w)] = (x1, y1, x2, y2)
+        return bounds
+
+    def pixel_fraction(self, frame_shape: Tuple[int, ...]) -> float:
+        """Share of the frame's pixels that go into detection."""
+        x1, y1, x2, y2 = self.crop_bounds(frame_shape)
+        return (x2 - x1) * (y2 - y1) / float(frame_shape[0] * frame_shape[1])
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """(view of the detection crop, its (x, y) offset in the frame)."""
+        x1, y1, x2, y2 = self.crop_bounds(frame.shape)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def mask(self, boxes: np.ndarray) -> np.ndarray:
+        """Boxes (N, >=4) whose foot point lies in any ROI."""
+        feet = foot_points(boxes)
+        inside = np.zeros(len(boxes), dtype=bool)
+        for roi in self.rois:
+            inside |= roi.contains(feet)
+        return inside
+
+    def measure(self, tracks: List[Dict]) -> Dict[str, dict]:
+        """Per-ROI count, floor area and density of the tracks' foot points."""
+        boxes = np.asarray([t["bbox"] for t in tracks], dtype=np.float32).reshape(-1, 4)
+        feet = foot_points(boxes)
+        out = {}
+        for roi in self.rois:
+            count = int(roi.contains(feet).sum())
+            area = self.area_m2(roi)
+            out[roi.name] = {"count": count, "area_m2": area, "density": round(count / (area + 1e-9), 4)}
+        return out
+
+    def draw(self, frame: np.ndarray, color=(255, 200, 0)):
+        for roi in self.rois:
+            pts = roi.polygon.astype(np.int32).reshape(-1, 1, 2)
+            cv2.polylines(frame, [pts], True, color, 2)
+            x, y = pts[:, 0, 0].min(), pts[:, 0, 1].min()
+            cv2.putText(frame, roi.name, (int(x) + 4, int(y) + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+
+def input_size(frame_shape: Tuple[int, ...], rois: Optional[RoiSet]) -> Tuple[int, int]:
+    """(height, width) of what detect_in_rois() sends to the detector."""
+    if rois is None:
+        return frame_shape[0], frame_shape[1]
+    x1, y1, x2, y2 = rois.crop_bounds(frame_shape)
+    return y2 - y1, x2 - x1
+
+
+def detect_in_rois(detector, frame: np.ndarray, rois: Optional[RoiSet], source: str,
+                   imgsz: Optional[int] = None) -> np.ndarray:
+    """
+    detector.detect() on the ROI crop (or the whole frame without ROIs);
+    returns (N, 5) boxes in frame coordinates, foot point inside an ROI.
+    """
+    if rois is None:
+        return detector.detect(frame, source=source, imgsz=imgsz)
+    crop, (ox, oy) = rois.crop(frame)
+    dets = detector.detect(crop, source=source, imgsz=imgsz)
+    dets[:, [0, 2]] += ox
+    dets[:, [1, 3]] += oy
+    return dets[rois.mask(dets)]
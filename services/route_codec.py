@@ -0,0 +1,118 @@
+# services/route_codec.py
+"""
+Compact binary encoding for evacuation routes and signboard plans.
+
+Used by /evacuation and /signboard-guidance when the client asks for the
+binary format (``Accept: application/vnd.evac.route`` or ``?format=binary``).
+Battery-powered signs and handhelds decode it with ``route_client.py``.
+
+Layout (all integers little-endian):
+
+    header      2s magic b"EV", B version, B kind
+    route       B flags, H start_r, H start_c, f length, H n_runs, n_runs * B
+                each run byte = direction (3 bits) << 5 | (run_length - 1)
+    signboards  B floor, B fire_floor, B stage, B flags, H count, count * H
+                each sign = id (12 bits) << 4 | arrow (4 bits)
+"""
+import struct
+from typing import List, Tuple, Dict, Optional
+
+MEDIA_TYPE = "application/vnd.evac.route"
+
+MAGIC = b"EV"
+VERSION = 1
+KIND_ROUTE = 1
+KIND_SIGNBOARDS = 2
+
+# 8-connected steps (dr, dc), counter-clockwise starting east.
+# Index is the 3-bit direction code; rows grow "up" as in the visualizers.
+DIRECTIONS: List[Tuple[int, int]] = [
+    (0, 1), (1, 1), (1, 0), (1, -1),
+    (0, -1), (-1, -1), (-1, 0), (-1, 1),
+]
+# Same order as DIRECTIONS, matching SignboardGuidanceSystem._get_direction_arrow
+ARROWS = ["→", "↗", "↑", "↖", "←", "↙", "↓", "↘"]
+ARROW_BLOCKED = 8
+ARROW_EXIT = 9
+ARROW_NONE = 15
+
+STAGES = ["initial", "growth", "spread"]
+
+MAX_RUN = 32        # 5 bits of run length
+MAX_SIGN_ID = 4095  # 12 bits of signboard id
+
+_HEADER = struct.Struct("<2sBB")
+_ROUTE = struct.Struct("<BHHfH")
+_SIGNS = struct.Struct("<BBBBH")
+
+_DIR_CODE = {d: i for i, d in enumerate(DIRECTIONS)}
+_ARROW_CODE = {a: i for i, a in enumerate(ARROWS)}
+
+
+def wants_binary(accept: Optional[str], fmt: Optional[str] = None) -> bool:
+    """True when the request negotiated the binary format via query flag or Accept header."""
+    if fmt:
+        return fmt == "binary"
+    return bool(accept) and MEDIA_TYPE in accept
+
+
+def encode_path(path: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], bytes]:
+    """
+    Encode a path as (start cell, run bytes).
+    Consecutive cells must be 8-neighbours, as produced by AntColony and A*.
+    """
+    if not path:
+        raise ValueError("Cannot encode an empty path")
+
+    runs = bytearray()
+    prev_code, run = None, 0
+    for (r0, c0), (r1, c1) in zip(path, path[1:]):
+        code = _DIR_CODE.get((int(r1) - int(r0), int(c1) - int(c0)))
+        if code is None:
+            raise ValueError(f"Non-adjacent step {(r0, c0)} -> {(r1, c1)}")
+        if code == prev_code and run < MAX_RUN:
+            run += 1
+            continue
+        if prev_code is not None:
+            runs.append(prev_code << 5 | (run - 1))
+        prev_code, run = code, 1
+    if prev_code is not None:
+        runs.append(prev_code << 5 | (run - 1))
+
+    r, c = path[0]
+    return (int(r), int(c)), bytes(runs)
+
+
+def encode_route(path: List[Tuple[int, int]], length: float, fire_considered: bool) -> bytes:
+    """Encode an /evacuation result."""
+    (r, c), runs = encode_path(path)
+    return (
+        _HEADER.pack(MAGIC, VERSION, KIND_ROUTE)
+        + _ROUTE.pack(1 if fire_considered else 0, r, c, float(length), len(runs))
+        + runs
+    )
+
+
+def _sign_arrow_code(signal: str) -> int:
+    if signal == "BLOCKED":
+        return ARROW_BLOCKED
+    if signal == "EXIT":
+        return ARROW_EXIT
+    return _ARROW_CODE.get(signal, ARROW_NONE)
+
+
+def encode_signboards(signboards: Dict[str, dict], floor: int, fire_floor: int,
+                      stage: str, fire_active: bool) -> bytes:
+    """Encode the ``signboards`` section of a /signboard-guidance plan as packed (id, arrow) pairs."""
+    packed = []
+    for sign_id, sign in signboards.items():
+        idx = int(sign_id.rsplit("_", 1)[-1])
+        if not 0 <= idx <= MAX_SIGN_ID:
+            raise ValueError(f"Signboard id {sign_id} does not fit in 12 bits")
+        packed.append(idx << 4 | _sign_arrow_code(sign["signal"]))
+
+    return (
+        _HEADER.pack(MAGIC, VERSION, KIND_SIGNBOARDS)
+        + _SIGNS.pack(floor, fire_floor, STAGES.index(stage), 1 if fire_active else 0, len(packed))
+        + struct.pack(f"<{len(packed)}H", *packed)
+    )
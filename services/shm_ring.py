@@ -0,0 +1,110 @@
+# services/shm_ring.py
+"""
+Shared-memory frame ring between a camera worker process and the API process.
+
+One writer (the worker process) and any number of readers (the API process).
+Segment layout:
+    header       int64[8]: write seq, viewer count, slot count, slot bytes
+    slot table   int64[slots, 4]: seq, height, width, channels of each slot
+    data         uint8[slots, slot_bytes]
+Frames larger than a slot are downscaled to fit. Readers copy the latest slot
+and compare its seq before and after the copy (seqlock); the writer only
+reuses a slot `slots` frames later, so a torn read is rare and just retried.
+The viewer count is written by the API process only and tells the worker
+whether anyone wants annotated frames at all.
+
+Configuration (environment variables):
+    EVAC_SHM_SLOTS         frames per ring (default 3)
+    EVAC_SHM_SLOT_BYTES    bytes per frame slot (default 1920*1080*3)
+"""
+import os
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+RING_SLOTS = int(os.environ.get("EVAC_SHM_SLOTS", 3))
+SLOT_BYTES = int(os.environ.get("EVAC_SHM_SLOT_BYTES", 1920 * 1080 * 3))
+
+_HEADER = 8
+_SEQ, _VIEWERS, _SLOTS, _SLOT_BYTES = range(4)
+
+
+class FrameRing:
+    def __init__(self, name: Optional[str] = None, slots: int = RING_SLOTS,
+                 slot_bytes: int = SLOT_BYTES, create: bool = False):
+        if create:
+            slots = max(2, int(slots))
+            size = 8 * _HEADER + 8 * 4 * slots + slots * slot_bytes
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray((_HEADER,), dtype=np.int64, buffer=self.shm.buf)
+            header[:] = 0
+            header[_SLOTS] = slots
+            header[_SLOT_BYTES] = slot_bytes
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = int(self.header[_SLOTS])
+        self.slot_bytes = int(self.header[_SLOT_BYTES])
+        self.table = np.ndarray((self.slots, 4), dtype=np.int64, buffer=self.shm.buf, offset=8 * _HEADER)
+        self.data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf,
+                               offset=8 * _HEADER + 8 * 4 * self.slots)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self.header[_SEQ])
+
+    @property
+    def viewers(self) -> int:
+        return int(self.header[_VIEWERS])
+
+    @viewers.setter
+    def viewers(self, n: int):
+        self.header[_VIEWERS] = n
+
+    def write(self, frame: np.ndarray):
+        """Publish a uint8 frame (H, W) or (H, W, C)."""
+        if frame.nbytes > self.slot_bytes:
+            scale = (self.slot_bytes / frame.nbytes) ** 0.5
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        h, w = frame.shape[:2]
+        c = frame.shape[2] if frame.ndim == 3 else 1
+        seq = int(self.header[_SEQ]) + 1
+        slot = seq % self.slots
+        self.table[slot, 0] = -1  # being written
+        self.data[slot, :frame.nbytes] = frame.reshape(-1)
+        self.table[slot, 1:] = (h, w, c)
+        self.table[slot, 0] = seq
+        self.header[_SEQ] = seq
+
+    def read_latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        """(seq, copy of the latest frame), or (seq, None) if there is none yet."""
+        seq = 0
+        for _ in range(3):
+            seq = int(self.header[_SEQ])
+            if seq == 0:
+                return 0, None
+            slot = seq % self.slots
+            if self.table[slot, 0] != seq:
+                continue
+            h, w, c = (int(v) for v in self.table[slot, 1:])
+            frame = self.data[slot, :h * w * c].copy()
+            if self.table[slot, 0] == seq:
+                return seq, frame.reshape((h, w, c) if c > 1 else (h, w))
+        return seq, None
+
+    def close(self):
+        # numpy views must go before the mapping can be closed
+        self.header = self.table = self.data = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,202 @@
+# services/signboard_controller.py
+"""
+Live signboard controller.
+
+Keeps the current signboard plan per floor in memory, recomputes it when the
+fire state changes and pushes only the signs whose arrow changed to the
+subscribed sign controllers. Every change bumps the floor's sequence number;
+a controller that missed updates asks for a resync and gets either the missed
+deltas (from a short history) or a full snapshot.
+
+Fire updates arriving in quick succession are coalesced: each floor runs at
+most one recompute at a time and always recomputes with the latest fire state.
+"""
+import asyncio
+from collections import deque
+from typing import List, Tuple, Dict, Optional
+
+from services.floors import floor_matrix_path, load_floor_matrix
+from services.grid import Grid
+from services.fire_model import FireModel
+from services.signboard_system import SignboardGuidanceSystem
+from services.signboard_table import get_table
+
+# Fields a physical sign displays; a change in any of them is pushed
+SIGN_FIELDS = ("signal", "turn_signal", "is_safe")
+
+
+class _FloorState:
+    def __init__(self, floor: int, exits: List[Tuple[int, int]],
+                 signboard_locations: List[Tuple[int, int]], history_size: int):
+        self.floor = floor
+        self.exits = exits
+        self.signboard_locations = signboard_locations
+        self.grid = Grid(load_floor_matrix(floor_matrix_path(floor)).tolist())
+        self.signboards: Dict[str, dict] = {}
+        self.seq = 0
+        self.history = deque(maxlen=history_size)  # (seq, changed signs)
+        self.subscribers: Dict[int, asyncio.Queue] = {}
+        self.dirty = False
+        self.task: Optional[asyncio.Task] = None
+
+
+class SignboardController:
+    def __init__(self, coalesce_s: float = 0.25, history_size: int = 64, queue_size: int = 32):
+        """
+        Args:
+            coalesce_s: Wait this long after a fire update before recomputing,
+                        so bursts of updates cost one recompute
+            history_size: Deltas kept per floor for resync
+            queue_size: Pending messages per subscriber before it is resynced
+        """
+        self.coalesce_s = coalesce_s
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self.floors: Dict[int, _FloorState] = {}
+        self.fire = {"fire_floor": None, "fire_locations": [], "stage": "initial"}
+        self._next_sub = 1
+
+    # ------------------------------------------------------------------
+    # Configuration and fire updates (called from the event loop)
+    # ------------------------------------------------------------------
+    def configure_floor(self, floor: int, exits: List[Tuple[int, int]],
+                        signboard_locations: List[Tuple[int, int]]):
+        """Register (or replace) the exits and signboards of a floor and compute its plan."""
+        old = self.floors.get(floor)
+        state = _FloorState(floor, exits, signboard_locations, self.history_size)
+        if old is not None:
+            # Keep subscribers and sequence numbers continuous across reconfiguration
+            state.subscribers = old.subscribers
+            state.seq = old.seq
+            state.signboards = old.signboards
+            if old.task is not None:
+                old.task.cancel()
+        self.floors[floor] = state
+        self._schedule(state)
+
+    def update_fire(self, fire_floor: Optional[int], fire_locations: List[Tuple[int, int]], stage: str):
+        """New ignition or stage change: recompute every configured floor."""
+        self.fire = {"fire_floor": fire_floor, "fire_locations": list(fire_locations), "stage": stage}
+        for state in self.floors.values():
+            self._schedule(state)
+
+    def _schedule(self, state: _FloorState):
+        state.dirty = True
+        if state.task is None or state.task.done():
+            state.task = asyncio.get_running_loop().create_task(self._recompute_loop(state))
+
+    async def _recompute_loop(self, state: _FloorState):
+        while state.dirty:
+            await asyncio.sleep(self.coalesce_s)
+            state.dirty = False
+            fire = dict(self.fire)
+            try:
+                plan = await asyncio.to_thread(self._compute, state, fire)
+            except Exception as e:
+                print(f"Signboard recompute failed for floor {state.floor}: {e}")
+                continue
+            self._apply(state, plan)
+
+    @staticmethod
+    def _compute(state: _FloorState, fire: dict) -> Dict[str, dict]:
+        consider_fire = state.floor == fire["fire_floor"]
+        table = get_table(state.floor)
+        if table is not None:
+            hit = table.lookup(state.exits, state.signboard_locations,
+                               fire["fire_locations"], consider_fire, fire["stage"])
+            if hit is not None:
+                return hit
+
+        fire_model = FireModel(state.grid)
+        if consider_fire and fire["fire_locations"]:
+            fire_model.ignite(fire["fire_locations"])
+            fire_model.stage_update(fire["stage"])
+        system = SignboardGuidanceSystem(state.grid, fire_model, state.exits)
+        return system.compute_signboard_directions(state.signboard_locations)
+
+    # ------------------------------------------------------------------
+    # Diff and publish
+    # ------------------------------------------------------------------
+    @staticmethod
+    def diff(old: Dict[str, dict], new: Dict[str, dict]) -> Dict[str, Optional[dict]]:
+        """Signs whose displayed fields changed; removed signs map to None."""
+        changed = {}
+        for sign_id, sign in new.items():
+            prev = old.get(sign_id)
+            if prev is None or any(prev[f] != sign[f] for f in SIGN_FIELDS):
+                changed[sign_id] = _sign_view(sign)
+        for sign_id in old.keys() - new.keys():
+            changed[sign_id] = None
+        return changed
+
+    def _apply(self, state: _FloorState, plan: Dict[str, dict]):
+        changed = self.diff(state.signboards, plan)
+        state.signboards = plan
+        if not changed:
+            return
+        state.seq += 1
+        state.history.append((state.seq, changed))
+        msg = {"type": "delta", "floor": state.floor, "seq": state.seq,
+               "prev_seq": state.seq - 1, "signboards": changed}
+        for sub_id, queue in list(state.subscribers.items()):
+            self._send(state, queue, msg)
+
+    def _send(self, state: _FloorState, queue: asyncio.Queue, msg: dict):
+        try:
+            queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            # Slow controller: drop what it has queued and resync it from scratch
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(self.snapshot(state.floor))
+
+    def snapshot(self, floor: int) -> dict:
+        state = self.floors[floor]
+        return {"type": "snapshot", "floor": floor, "seq": state.seq,
+                "signboards": {k: _sign_view(v) for k, v in state.signboards.items()}}
+
+    def resync(self, floor: int, since: Optional[int]) -> List[dict]:
+        """Messages that bring a controller at sequence `since` up to date."""
+        state = self.floors[floor]
+        if since is not None and since == state.seq:
+            return []
+        if since is not None and since < state.seq and state.history and state.history[0][0] <= since + 1:
+            return [{"type": "delta", "floor": floor, "seq": seq, "prev_seq": seq - 1, "signboards": changed}
+                    for seq, changed in state.history if seq > since]
+        return [self.snapshot(floor)]
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+    def subscribe(self, floor: int) -> Tuple[int, asyncio.Queue]:
+        state = self.floors[floor]
+        sub_id = self._next_sub
+        self._next_sub += 1
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        state.subscribers[sub_id] = queue
+        return sub_id, queue
+
+    def unsubscribe(self, floor: int, sub_id: int):
+        state = self.floors.get(floor)
+        if state is not None:
+            state.subscribers.pop(sub_id, None)
+
+    def get_status(self) -> dict:
+        return {
+            "fire": self.fire,
+            "floors": {
+                floor: {"seq": s.seq, "signboards": len(s.signboards),
+                        "subscribers": len(s.subscribers), "recomputing": bool(s.task and not s.task.done())}
+                for floor, s in self.floors.items()
+            }
+        }
+
+
+def _sign_view(sign: dict) -> dict:
+    return {
+        "position": sign["position"],
+        "signal": sign["signal"],
+        "turn_signal": sign["turn_signal"],
+        "is_safe": sign["is_safe"],
+        "distance_to_exit": sign["distance_to_exit"]
+    }
@@ -3,6 +3,12 @@ import heapq
 import math
 from typing import List, Tuple, Dict, Optional
 from collections import defaultdict
+from services.instrumentation import phase, count
+
+CORRIDOR_SPACING = 5  # a virtual corridor signboard every N corridor cells
+ROOM_BLOCKED_GUIDANCE = "Room is not safe - seek alternative route"
+ROOM_NO_PATH_GUIDANCE = "No safe path available - stay in room and await rescue"
+
 
 class SignboardGuidanceSystem:
     """
@@ -54,31 +60,32 @@ class SignboardGuidanceSystem:
         
         return signboard_directions
     
-    def compute_room_guidance(self, rooms: Dict[str, List[Tuple[int, int]]]) -> Dict:
+    def compute_room_guidance(self, rooms) -> Dict:
         """
         For each room, determine which signboard people should follow.
-        rooms: {"ROOM_101": [(r1,c1), (r2,c2), ...], "ROOM_102": [...]}
+        rooms: (h, w) label array from detect_rooms (0 = no room, k = ROOM_k),
+               or {"ROOM_101": [(r1,c1), (r2,c2), ...], "ROOM_102": [...]}
         """
         room_guidance = {}
         
-        for room_name, room_cells in rooms.items():
-            # Find accessible cells in room (not walls, not fire)
-            accessible_cells = [
-                cell for cell in room_cells 
-                if self.grid.mat[cell] != 1 and not self.fire.is_unsafe(*cell, buffer=0)
-            ]
+        # Accessible cells in rooms (not walls, not fire)
+        accessible = (self.grid.mat != 1) & ~self.fire.unsafe_mask()
+        
+        for room_name, room_mask in _room_masks(rooms, self.grid):
+            accessible_rows, accessible_cols = np.nonzero(room_mask & accessible)
             
-            if not accessible_cells:
+            if len(accessible_rows) == 0:
                 room_guidance[room_name] = {
                     "status": "BLOCKED",
-                    "guidance": "Room is not safe - seek alternative route",
+                    "guidance": ROOM_BLOCKED_GUIDANCE,
                     "nearest_signboards": []
                 }
                 continue
             
             # Find nearest signboard locations for this room
             # Use center of room as reference point
-            center = self._get_room_center(accessible_cells)
+            center = (int(accessible_rows.sum()) // len(accessible_rows),
+                      int(accessible_cols.sum()) // len(accessible_cols))
             
             # Compute path from room center
             path, distance = self._compute_path_from_position(center)
@@ -97,7 +104,7 @@ class SignboardGuidanceSystem:
             else:
                 room_guidance[room_name] = {
                     "status": "NO_PATH",
-                    "guidance": "No safe path available - stay in room and await rescue",
+                    "guidance": ROOM_NO_PATH_GUIDANCE,
                     "exit_direction": None
                 }
         
@@ -151,11 +158,14 @@ class SignboardGuidanceSystem:
         open_set = [(0.0, start)]
         g_cost = {start: 0.0}
         parent = {}
+        expansions = 0
         
         while open_set:
             _, current = heapq.heappop(open_set)
+            expansions += 1
             
             if current in self.exits:
+                count("astar_expansions", expansions)
                 # Reconstruct path
                 path = [current]
                 while current in parent:
@@ -183,6 +193,7 @@ class SignboardGuidanceSystem:
                     f_cost = tentative_g + heuristic(neighbor)
                     heapq.heappush(open_set, (f_cost, neighbor))
         
+        count("astar_expansions", expansions)
         return None, float('inf')
     
     def _is_valid_step(self, curr: Tuple[int, int], nxt: Tuple[int, int], buf: int) -> bool:
@@ -237,18 +248,7 @@ class SignboardGuidanceSystem:
             return "•"  # Stay
     
     def _get_turn_direction(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> str:
-        """Simplified turn direction (LEFT, RIGHT, STRAIGHT)."""
-        dr = to_pos[0] - from_pos[0]
-        dc = to_pos[1] - from_pos[1]
-        
-        # Determine primary direction
-        if abs(dc) > abs(dr):
-            return "RIGHT" if dc > 0 else "LEFT"
-        elif abs(dr) > abs(dc):
-            return "STRAIGHT"
-        else:
-            # Diagonal
-            return "RIGHT" if dc > 0 else "LEFT"
+        return turn_direction(from_pos, to_pos)
     
     def _get_room_center(self, cells: List[Tuple[int, int]]) -> Tuple[int, int]:
         """Calculate center point of room."""
@@ -259,13 +259,66 @@ class SignboardGuidanceSystem:
         return (avg_r, avg_c)
 
 
+def turn_direction(from_pos: Tuple[int, int], to_pos: Tuple[int, int]) -> str:
+    """Simplified turn direction (LEFT, RIGHT, STRAIGHT)."""
+    dr = to_pos[0] - from_pos[0]
+    dc = to_pos[1] - from_pos[1]
+
+    # Determine primary direction
+    if abs(dc) > abs(dr):
+        return "RIGHT" if dc > 0 else "LEFT"
+    elif abs(dr) > abs(dc):
+        return "STRAIGHT"
+    else:
+        # Diagonal
+        return "RIGHT" if dc > 0 else "LEFT"
+
+
+def _room_masks(rooms, grid):
+    """Yield (room_name, bool mask) for a label array or a dict of cell lists."""
+    if isinstance(rooms, np.ndarray):
+        for label in range(1, int(rooms.max(initial=0)) + 1):
+            yield f"ROOM_{label:03d}", rooms == label
+        return
+    for room_name, cells in rooms.items():
+        mask = np.zeros((grid.h, grid.w), dtype=bool)
+        if cells:
+            rr, cc = zip(*cells)
+            mask[list(rr), list(cc)] = True
+        yield room_name, mask
+
+
+def _any_room_mask(rooms, grid) -> np.ndarray:
+    """Union of all room cells."""
+    if rooms is None or len(rooms) == 0:
+        return np.zeros((grid.h, grid.w), dtype=bool)
+    if isinstance(rooms, np.ndarray):
+        return rooms > 0
+    mask = np.zeros((grid.h, grid.w), dtype=bool)
+    for _, room_mask in _room_masks(rooms, grid):
+        mask |= room_mask
+    return mask
+
+
+def corridor_cells(grid, rooms) -> List[Tuple[int, int]]:
+    """Corridor cells (value 0, not in a room), row-major order."""
+    corridor_mask = (grid.mat == 0) & ~_any_room_mask(rooms, grid)
+    return [(int(r), int(c)) for r, c in np.argwhere(corridor_mask)]
+
+
 # Integration functions for API
 def generate_signboard_plan(grid, fire_model, exits: List[Tuple[int, int]], 
                            signboard_locations: List[Tuple[int, int]],
-                           rooms: Optional[Dict[str, List[Tuple[int, int]]]] = None) -> Dict:
+                           rooms=None) -> Dict:
     """
     Main function to generate complete signboard guidance plan.
+    rooms: label array from detect_rooms, or dict of room name -> cells.
     """
+    with phase("signboard_plan"):
+        return _generate_signboard_plan(grid, fire_model, exits, signboard_locations, rooms)
+
+
+def _generate_signboard_plan(grid, fire_model, exits, signboard_locations, rooms) -> Dict:
     system = SignboardGuidanceSystem(grid, fire_model, exits)
     
     # Compute signboard directions
@@ -273,33 +326,26 @@ def generate_signboard_plan(grid, fire_model, exits: List[Tuple[int, int]],
     
     # Compute room guidance if rooms provided
     room_guidance = {}
-    if rooms:
+    if rooms is not None and len(rooms) > 0:
         room_guidance = system.compute_room_guidance(rooms)
     
-    # Identify corridors (cells with value 0 that are not in rooms)
-    all_room_cells = set()
-    if rooms:
-        for cells in rooms.values():
-            all_room_cells.update(cells)
-    
-    corridor_cells = []
-    for r in range(grid.h):
-        for c in range(grid.w):
-            if grid.mat[r, c] == 0 and (r, c) not in all_room_cells:
-                corridor_cells.append((r, c))
-    
-    corridor_guidance = system.compute_corridor_guidance(corridor_cells, spacing=5)
+    corridor_guidance = system.compute_corridor_guidance(corridor_cells(grid, rooms), spacing=CORRIDOR_SPACING)
     
     return {
         "signboards": signboard_directions,
         "rooms": room_guidance,
         "corridors": corridor_guidance,
-        "summary": {
-            "total_signboards": len(signboard_directions),
-            "active_signboards": sum(1 for s in signboard_directions.values() if s["signal"] not in ["BLOCKED", "EXIT"]),
-            "blocked_signboards": sum(1 for s in signboard_directions.values() if s["signal"] == "BLOCKED"),
-            "safe_rooms": sum(1 for r in room_guidance.values() if r["status"] == "SAFE"),
-            "blocked_rooms": sum(1 for r in room_guidance.values() if r["status"] == "BLOCKED"),
-            "corridor_guidance_points": len(corridor_guidance)
-        }
+        "summary": summarize_plan(signboard_directions, room_guidance, corridor_guidance)
+    }
+
+
+def summarize_plan(signboard_directions: Dict, room_guidance: Dict, corridor_guidance: List[Dict]) -> Dict:
+    """Summary counts for a signboard plan."""
+    return {
+        "total_signboards": len(signboard_directions),
+        "active_signboards": sum(1 for s in signboard_directions.values() if s["signal"] not in ["BLOCKED", "EXIT"]),
+        "blocked_signboards": sum(1 for s in signboard_directions.values() if s["signal"] == "BLOCKED"),
+        "safe_rooms": sum(1 for r in room_guidance.values() if r["status"] == "SAFE"),
+        "blocked_rooms": sum(1 for r in room_guidance.values() if r["status"] == "BLOCKED"),
+        "corridor_guidance_points": len(corridor_guidance)
     }
\ No newline at end of file
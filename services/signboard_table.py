@@ -0,0 +1,440 @@
+# services/signboard_table.py
+"""
+Precomputed signboard lookup tables.
+
+For a floor with a fixed set of exits and signboards, every candidate ignition
+cell x fire stage is solved offline with generate_signboard_plan and the
+result is stored in memory-mapped .npy tables: one record per signboard and
+per corridor guidance point (rooms, and so corridor cells, depend only on the
+floor plan), and one room record per room. At request time
+/signboard-guidance answers a known scenario with a single row lookup and the
+same payload as a live computation.
+
+Build (resumable, runs in a process pool):
+
+    python -m services.signboard_table --floor 1 --exits 8,18 22,18 \\
+        --signs 3,5 6,10 10,15 --workers 4
+
+Row layout: stage_index * (h * w) + r * w + c, plus one trailing row for
+"no fire on this floor".
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+
+from services.floors import floor_matrix_path, load_floor_matrix
+from services.grid import Grid
+from services.fire_model import FireModel
+from services.signboard_system import (CORRIDOR_SPACING, ROOM_BLOCKED_GUIDANCE, ROOM_NO_PATH_GUIDANCE,
+                                       corridor_cells, generate_signboard_plan, summarize_plan,
+                                       turn_direction)
+from services.visualize_signboard import detect_rooms
+from services import route_codec
+from services.instrumentation import count
+
+TABLE_DIR = "precomputed"
+TABLE_FORMAT = 2  # bump when the stored layout changes; older tables are ignored
+STAGES = route_codec.STAGES
+
+RECORD_DTYPE = np.dtype([
+    ("code", "u1"),       # route_codec arrow code (or ARROW_BLOCKED / ARROW_EXIT)
+    ("distance", "f4"),   # distance_to_exit
+    ("path_len", "u2"),   # path_length
+    ("safe", "u1"),       # is_safe
+])
+
+PREVIEW_STEPS = 4  # room path_preview is the room centre plus 4 steps
+
+ROOM_DTYPE = np.dtype([
+    ("status", "u1"),                  # ROOM_SAFE / ROOM_BLOCKED / ROOM_NO_PATH
+    ("r", "u2"), ("c", "u2"),          # centre of the room's accessible cells
+    ("code", "u1"),                    # exit_direction arrow code
+    ("distance", "f4"),                # distance_to_exit
+    ("steps", "u1", (PREVIEW_STEPS,)), # path_preview as direction codes from the centre
+    ("n_steps", "u1"),
+])
+ROOM_SAFE, ROOM_BLOCKED, ROOM_NO_PATH = 0, 1, 2
+_ROOM_STATUS = {"SAFE": ROOM_SAFE, "BLOCKED": ROOM_BLOCKED, "NO_PATH": ROOM_NO_PATH}
+
+_CODE_FOR_SIGNAL = {a: i for i, a in enumerate(route_codec.ARROWS)}
+_CODE_FOR_SIGNAL.update({"BLOCKED": route_codec.ARROW_BLOCKED, "EXIT": route_codec.ARROW_EXIT})
+_CODE_FOR_STEP = {d: i for i, d in enumerate(route_codec.DIRECTIONS)}
+
+
+def _table_paths(floor: int, out_dir: str = TABLE_DIR) -> Tuple[str, str, str, str]:
+    """(metadata, point table, room table, done flags) of a floor's table."""
+    base = os.path.join(out_dir, f"signboards_floor{floor}")
+    return base + ".json", base + ".npy", base + "_rooms.npy", base + "_done.npy"
+
+
+def _floor_layout(grid: Grid) -> Tuple[int, List[Tuple[int, int]]]:
+    """(number of rooms, corridor guidance positions); fixed for a floor plan."""
+    rooms = detect_rooms(grid)
+    return int(rooms.max(initial=0)), corridor_cells(grid, rooms)[::CORRIDOR_SPACING]
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _to_records(directions: Dict[str, dict]) -> np.ndarray:
+    rec = np.zeros(len(directions), dtype=RECORD_DTYPE)
+    for i, sign in enumerate(directions.values()):
+        rec[i]["code"] = _CODE_FOR_SIGNAL.get(sign["signal"], route_codec.ARROW_NONE)
+        rec[i]["distance"] = sign["distance_to_exit"]
+        rec[i]["path_len"] = sign["path_length"]
+        rec[i]["safe"] = 1 if sign["is_safe"] else 0
+    return rec
+
+
+def _corridor_records(corridors: List[dict], positions: List[Tuple[int, int]]) -> np.ndarray:
+    """One record per corridor position; positions without guidance keep ARROW_NONE."""
+    rec = np.zeros(len(positions), dtype=RECORD_DTYPE)
+    rec["code"] = route_codec.ARROW_NONE
+    slot = {pos: i for i, pos in enumerate(positions)}
+    for point in corridors:
+        i = slot[tuple(point["position"])]
+        rec[i]["code"] = _CODE_FOR_SIGNAL[point["signal"]]
+        rec[i]["distance"] = point["distance_to_exit"]
+        rec[i]["safe"] = 1 if point["is_safe"] else 0
+    return rec
+
+
+def _room_records(rooms: Dict[str, dict], n_rooms: int) -> np.ndarray:
+    rec = np.zeros(n_rooms, dtype=ROOM_DTYPE)
+    for i, room in enumerate(rooms.values()):
+        rec[i]["status"] = _ROOM_STATUS[room["status"]]
+        if room["status"] != "SAFE":
+            continue
+        preview = room["path_preview"]
+        rec[i]["r"], rec[i]["c"] = preview[0]
+        rec[i]["code"] = _CODE_FOR_SIGNAL[room["exit_direction"]]
+        rec[i]["distance"] = room["distance_to_exit"]
+        steps = [_CODE_FOR_STEP[(b[0] - a[0], b[1] - a[1])] for a, b in zip(preview, preview[1:])]
+        rec[i]["steps"][:len(steps)] = steps
+        rec[i]["n_steps"] = len(steps)
+    return rec
+
+
+def _corridors_from_records(rec: np.ndarray, positions: List[Tuple[int, int]]) -> List[dict]:
+    """Rebuild compute_corridor_guidance() output."""
+    corridors = []
+    for pos, row in zip(positions, rec):
+        code = int(row["code"])
+        if code >= len(route_codec.ARROWS):
+            continue
+        dr, dc = route_codec.DIRECTIONS[code]
+        corridors.append({
+            "position": pos,
+            "signal": route_codec.ARROWS[code],
+            "turn_signal": turn_direction(pos, (pos[0] + dr, pos[1] + dc)),
+            "distance_to_exit": round(float(row["distance"]), 2),
+            "is_safe": bool(row["safe"])
+        })
+    return corridors
+
+
+def _rooms_from_records(rec: np.ndarray) -> Dict[str, dict]:
+    """Rebuild compute_room_guidance() output."""
+    rooms = {}
+    for i, row in enumerate(rec):
+        name = f"ROOM_{i+1:03d}"
+        status = int(row["status"])
+        if status == ROOM_BLOCKED:
+            rooms[name] = {"status": "BLOCKED", "guidance": ROOM_BLOCKED_GUIDANCE, "nearest_signboards": []}
+        elif status == ROOM_NO_PATH:
+            rooms[name] = {"status": "NO_PATH", "guidance": ROOM_NO_PATH_GUIDANCE, "exit_direction": None}
+        else:
+            pos = (int(row["r"]), int(row["c"]))
+            preview = [pos]
+            for code in row["steps"][:int(row["n_steps"])]:
+                dr, dc = route_codec.DIRECTIONS[int(code)]
+                pos = (pos[0] + dr, pos[1] + dc)
+                preview.append(pos)
+            arrow = route_codec.ARROWS[int(row["code"])]
+            distance = round(float(row["distance"]), 2)
+            rooms[name] = {
+                "status": "SAFE",
+                "exit_direction": arrow,
+                "distance_to_exit": distance,
+                "guidance": f"Exit {arrow} - {distance}m to safety",
+                "path_preview": preview
+            }
+    return rooms
+
+
+def _from_records(rec: np.ndarray, signboard_locations: List[Tuple[int, int]]) -> Dict[str, dict]:
+    """Rebuild the compute_signboard_directions() output from stored records."""
+    directions = {}
+    for idx, (pos, row) in enumerate(zip(signboard_locations, rec)):
+        code = int(row["code"])
+        if code < len(route_codec.ARROWS):
+            dr, dc = route_codec.DIRECTIONS[code]
+            nxt = (pos[0] + dr, pos[1] + dc)
+            directions[f"SIGN_{idx+1}"] = {
+                "position": pos,
+                "signal": route_codec.ARROWS[code],
+                "turn_signal": turn_direction(pos, nxt),
+                "next_position": nxt,
+                "distance_to_exit": round(float(row["distance"]), 2),
+                "path_length": int(row["path_len"]),
+                "is_safe": bool(row["safe"])
+            }
+        else:
+            blocked = code == route_codec.ARROW_BLOCKED
+            directions[f"SIGN_{idx+1}"] = {
+                "position": pos,
+                "signal": "BLOCKED" if blocked else "EXIT",
+                "turn_signal": "NONE",
+                "next_position": None,
+                "distance_to_exit": float('inf') if blocked else 0,
+                "path_length": 0,
+                "is_safe": False
+            }
+    return directions
+
+
+# ---------------------------------------------------------------------------
+# Offline build
+# ---------------------------------------------------------------------------
+
+_WORKER = {}
+
+
+def _init_worker(mat: np.ndarray, exits, signboard_locations):
+    grid = Grid(mat.tolist())
+    _WORKER["grid"] = grid
+    _WORKER["rooms"] = detect_rooms(grid)
+    _WORKER["layout"] = _floor_layout(grid)
+    _WORKER["exits"] = [tuple(e) for e in exits]
+    _WORKER["signs"] = [tuple(s) for s in signboard_locations]
+
+
+def _solve_scenarios(indices: List[int]) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+    grid = _WORKER["grid"]
+    n_rooms, corridor_positions = _WORKER["layout"]
+    cells = grid.h * grid.w
+    out = []
+    for idx in indices:
+        fire = FireModel(grid)
+        if idx < len(STAGES) * cells:
+            stage, cell = divmod(idx, cells)
+            fire.ignite([divmod(cell, grid.w)])
+            fire.stage_update(STAGES[stage])
+        plan = generate_signboard_plan(grid, fire, _WORKER["exits"], _WORKER["signs"], _WORKER["rooms"])
+        points = np.concatenate([_to_records(plan["signboards"]),
+                                 _corridor_records(plan["corridors"], corridor_positions)])
+        out.append((idx, points, _room_records(plan["rooms"], n_rooms)))
+    return out
+
+
+def build_table(floor: int, exits: List[Tuple[int, int]],
+                signboard_locations: List[Tuple[int, int]],
+                workers: Optional[int] = None, chunk_size: int = 32,
+                out_dir: str = TABLE_DIR) -> str:
+    """
+    Build (or resume building) the lookup table for one floor.
+    Returns the path of the table metadata file.
+    """
+    matrix_path = floor_matrix_path(floor)
+    mat = load_floor_matrix(matrix_path)
+    h, w = mat.shape
+    n_rows = len(STAGES) * h * w + 1
+    n_rooms, corridor_positions = _floor_layout(Grid(mat.tolist()))
+    meta_path, table_path, rooms_path, done_path = _table_paths(floor, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    meta = {
+        "format": TABLE_FORMAT,
+        "floor": floor,
+        "matrix_path": matrix_path,
+        "matrix_sha1": _file_digest(matrix_path),
+        "shape": [h, w],
+        "stages": STAGES,
+        "exits": [list(map(int, e)) for e in exits],
+        "signboard_locations": [list(map(int, s)) for s in signboard_locations],
+        "corridor_positions": [list(p) for p in corridor_positions],
+        "n_rooms": n_rooms,
+        "complete": False
+    }
+
+    resume = False
+    if all(os.path.exists(p) for p in (meta_path, table_path, rooms_path, done_path)):
+        with open(meta_path) as f:
+            old = json.load(f)
+        resume = all(old.get(k) == meta[k] for k in
+                     ("format", "matrix_sha1", "shape", "stages", "exits", "signboard_locations",
+                      "corridor_positions", "n_rooms"))
+
+    if resume:
+        table = np.load(table_path, mmap_mode="r+")
+        room_table = np.load(rooms_path, mmap_mode="r+")
+        done = np.load(done_path, mmap_mode="r+")
+    else:
+        table = np.lib.format.open_memmap(table_path, mode="w+", dtype=RECORD_DTYPE,
+                                          shape=(n_rows, len(signboard_locations) + len(corridor_positions)))
+        room_table = np.lib.format.open_memmap(rooms_path, mode="w+", dtype=ROOM_DTYPE, shape=(n_rows, n_rooms))
+        done = np.lib.format.open_memmap(done_path, mode="w+", dtype=np.uint8, shape=(n_rows,))
+
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    # Wall cells cannot ignite; they are left out and fall back to live computation
+    free = np.flatnonzero(mat.reshape(-1) != 1)
+    candidates = [s * h * w + int(c) for s in range(len(STAGES)) for c in free] + [n_rows - 1]
+    pending = [i for i in candidates if not done[i]]
+    print(f"Floor {floor}: {len(candidates) - len(pending)}/{len(candidates)} scenarios already built")
+
+    start = time.time()
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mat, exits, signboard_locations)) as pool:
+        futures = [pool.submit(_solve_scenarios, chunk) for chunk in chunks]
+        for n, fut in enumerate(as_completed(futures), 1):
+            for idx, points, rooms in fut.result():
+                table[idx] = points
+                room_table[idx] = rooms
+                done[idx] = 1
+            table.flush()
+            room_table.flush()
+            done.flush()
+            if n % 10 == 0 or n == len(futures):
+                print(f"  {n}/{len(futures)} chunks, {time.time() - start:.1f}s")
+
+    meta["complete"] = True
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return meta_path
+
+
+# ---------------------------------------------------------------------------
+# Request-time lookup
+# ---------------------------------------------------------------------------
+
+class SignboardTable:
+    def __init__(self, meta: dict, table: np.ndarray, rooms: np.ndarray, done: np.ndarray):
+        self.meta = meta
+        self.table = table
+        self.rooms = rooms
+        self.done = done
+        self.h, self.w = meta["shape"]
+        self.exits = [tuple(e) for e in meta["exits"]]
+        self.signboard_locations = [tuple(s) for s in meta["signboard_locations"]]
+        self.corridor_positions = [tuple(p) for p in meta["corridor_positions"]]
+        self._matrix_stat = self._stat(meta["matrix_path"])
+
+    @staticmethod
+    def _stat(path: str):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    @classmethod
+    def open(cls, floor: int, out_dir: str = TABLE_DIR) -> Optional["SignboardTable"]:
+        meta_path, table_path, rooms_path, done_path = _table_paths(floor, out_dir)
+        if not all(os.path.exists(p) for p in (meta_path, table_path, rooms_path, done_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("format") != TABLE_FORMAT:
+            print(f"Signboard table for floor {floor} has an old format - ignoring, rebuild it")
+            return None
+        if meta.get("matrix_sha1") != _file_digest(meta["matrix_path"]):
+            print(f"Signboard table for floor {floor} is stale (floor plan changed) - ignoring")
+            return None
+        return cls(meta, np.load(table_path, mmap_mode="r"), np.load(rooms_path, mmap_mode="r"),
+                   np.load(done_path, mmap_mode="r"))
+
+    def is_current(self) -> bool:
+        return self._stat(self.meta["matrix_path"]) == self._matrix_stat
+
+    def scenario_index(self, fire_locations: List[Tuple[int, int]],
+                       consider_fire: bool, stage: str) -> Optional[int]:
+        if not consider_fire or not fire_locations:
+            return len(self.done) - 1
+        if len(fire_locations) != 1 or stage not in STAGES:
+            return None
+        r, c = fire_locations[0]
+        if not (0 <= r < self.h and 0 <= c < self.w):
+            return None
+        return STAGES.index(stage) * self.h * self.w + r * self.w + c
+
+    def _row(self, exits, signboard_locations, fire_locations, consider_fire, stage) -> Optional[int]:
+        if list(exits) != self.exits or list(signboard_locations) != self.signboard_locations:
+            return None
+        idx = self.scenario_index(fire_locations, consider_fire, stage)
+        if idx is None or not self.done[idx]:
+            return None
+        count("signboard_table_hits")
+        return idx
+
+    def lookup(self, exits: List[Tuple[int, int]], signboard_locations: List[Tuple[int, int]],
+               fire_locations: List[Tuple[int, int]], consider_fire: bool,
+               stage: str) -> Optional[Dict[str, dict]]:
+        """Return signboard directions for a known scenario, or None to compute live."""
+        idx = self._row(exits, signboard_locations, fire_locations, consider_fire, stage)
+        if idx is None:
+            return None
+        return _from_records(self.table[idx, :len(self.signboard_locations)], self.signboard_locations)
+
+    def lookup_plan(self, exits: List[Tuple[int, int]], signboard_locations: List[Tuple[int, int]],
+                    fire_locations: List[Tuple[int, int]], consider_fire: bool,
+                    stage: str) -> Optional[Dict]:
+        """generate_signboard_plan() output for a known scenario, or None to compute live."""
+        idx = self._row(exits, signboard_locations, fire_locations, consider_fire, stage)
+        if idx is None:
+            return None
+        n_signs = len(self.signboard_locations)
+        signboards = _from_records(self.table[idx, :n_signs], self.signboard_locations)
+        rooms = _rooms_from_records(self.rooms[idx])
+        corridors = _corridors_from_records(self.table[idx, n_signs:], self.corridor_positions)
+        return {
+            "signboards": signboards,
+            "rooms": rooms,
+            "corridors": corridors,
+            "summary": summarize_plan(signboards, rooms, corridors)
+        }
+
+
+_TABLES: Dict[int, Tuple[float, Optional[SignboardTable]]] = {}
+_TABLES_LOCK = threading.Lock()
+
+
+def get_table(floor: int) -> Optional[SignboardTable]:
+    """Cached table for a floor; reopened when the table or the floor plan changes."""
+    meta_path = _table_paths(floor)[0]
+    try:
+        mtime = os.stat(meta_path).st_mtime_ns
+    except OSError:
+        return None
+    with _TABLES_LOCK:
+        cached = _TABLES.get(floor)
+        if cached is None or cached[0] != mtime or (cached[1] and not cached[1].is_current()):
+            cached = (mtime, SignboardTable.open(floor))
+            _TABLES[floor] = cached
+        return cached[1]
+
+
+def _parse_cells(values: List[str]) -> List[Tuple[int, int]]:
+    return [tuple(map(int, v.split(','))) for v in values]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute signboard lookup tables")
+    parser.add_argument("--floor", type=int, required=True)
+    parser.add_argument("--exits", nargs="+", required=True, help="Exit cells as r,c")
+    parser.add_argument("--signs", nargs="+", required=True, help="Signboard cells as r,c")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=32)
+    args = parser.parse_args()
+
+    path = build_table(args.floor, _parse_cells(args.exits), _parse_cells(args.signs),
+                       workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Signboard table written: {path}")
@@ -0,0 +1,245 @@
+# services/status_broadcast.py
+"""
+Status WebSocket fan-out.
+
+Every status WebSocket (/reid/ws, /ws) subscribes to the StatusBroadcaster
+of its status dict instead of copying and serializing that dict itself. One
+asyncio task per broadcaster wakes up every EVAC_WS_INTERVAL_S seconds,
+serializes each camera's fields once (under the status lock, in a worker
+thread), and sends the same JSON text to every subscriber:
+
+    {"type": "keyframe", "seq": n, "status": {cam: {...}, ...}}
+    {"type": "delta", "seq": n, "changed": {cam: {field: value}}, "removed": [cam],
+     "removed_fields": {cam: [field]}}
+
+A delta holds only the cameras and fields that changed since the previous
+tick; ticks without changes send nothing. New subscribers start with a
+keyframe, and everyone gets one every EVAC_WS_KEYFRAME_S seconds. Clients
+that connect with ?mode=full get the plain status dict (the old format) on
+every tick that changed something.
+
+Each subscriber has a queue of at most EVAC_WS_MAX_PENDING messages. A client
+that falls that far behind, or whose send takes longer than SEND_TIMEOUT_S,
+is disconnected (close code 1013, "try again later") instead of buffered
+for; on reconnecting it starts again from a keyframe.
+
+Configuration (environment variables):
+    EVAC_WS_INTERVAL_S    seconds between status ticks (default 1.0)
+    EVAC_WS_KEYFRAME_S    seconds between keyframes (default 10)
+    EVAC_WS_MAX_PENDING   queued messages per client before it is dropped (default 8)
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+INTERVAL_S = float(os.environ.get("EVAC_WS_INTERVAL_S", 1.0))
+KEYFRAME_S = float(os.environ.get("EVAC_WS_KEYFRAME_S", 10.0))
+MAX_PENDING = int(os.environ.get("EVAC_WS_MAX_PENDING", 8))
+SEND_TIMEOUT_S = 5.0
+MODES = ("delta", "full")
+
+_Fields = Dict[str, Dict[str, str]]  # camera -> field -> serialized value
+
+
+def _join(fragments: Dict[str, str]) -> str:
+    """JSON object text from already serialized values."""
+    return "{" + ",".join(f"{json.dumps(k)}:{v}" for k, v in fragments.items()) + "}"
+
+
+def _status_text(fields: _Fields) -> str:
+    return _join({cam: _join(f) for cam, f in fields.items()})
+
+
+class Subscriber:
+    def __init__(self, mode: str = "delta", max_pending: int = MAX_PENDING):
+        self.mode = mode
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped = False
+
+    async def get(self) -> Optional[str]:
+        """Next message; None once the broadcaster has dropped this subscriber."""
+        return await self.queue.get()
+
+    def _offer(self, text: str) -> bool:
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _drop(self):
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class StatusBroadcaster:
+    def __init__(self, name: str, status: dict, lock: threading.Lock,
+                 interval: float = INTERVAL_S, keyframe_s: float = KEYFRAME_S,
+                 max_pending: int = MAX_PENDING):
+        self.name = name
+        self.status = status
+        self.lock = lock
+        self.interval = interval
+        self.keyframe_s = keyframe_s
+        self.max_pending = max_pending
+        self.subscribers: List[Subscriber] = []
+        self._task: Optional[asyncio.Task] = None
+        self._fields: _Fields = {}
+        self._keyframe: Optional[str] = None  # latest state as a keyframe, for new subscribers
+        self._full: Optional[str] = None      # latest state in the plain format
+        self._next_keyframe = 0.0
+        self._seq = 0
+        self.ticks = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_serialized = 0
+        self.messages_sent = 0
+        self.dropped_clients = 0
+        self._serialize_ms = deque(maxlen=256)
+
+    def subscribe(self, mode: str = "delta") -> Subscriber:
+        """Register a client; it first receives the current state, then every update."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown status stream mode '{mode}', expected one of {MODES}")
+        sub = Subscriber(mode, self.max_pending)
+        self.subscribers.append(sub)
+        initial = self._full if mode == "full" else self._keyframe
+        if initial is not None:
+            sub._offer(initial)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
+
+    async def _run(self):
+        self._fields, self._keyframe, self._full = {}, None, None
+        self._next_keyframe = 0.0
+        while self.subscribers:
+            started = time.monotonic()
+            try:
+                keyframe = started >= self._next_keyframe
+                messages = await asyncio.to_thread(self._tick, keyframe)
+                if messages is not None:
+                    self._fan_out(keyframe, *messages)
+            except Exception as e:
+                print(f"[{self.name}] Status broadcast failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        self._fields, self._keyframe, self._full = {}, None, None
+
+    def _tick(self, keyframe: bool) -> Optional[Tuple[str, str]]:
+        """
+        Serialize the status once and diff it against the previous tick.
+        Returns (message for delta subscribers, plain status for full ones),
+        or None when nothing changed and no keyframe is due.
+        """
+        t0 = time.perf_counter()
+        with self.lock:
+            fields = {str(cam): {str(k): json.dumps(v) for k, v in info.items()}
+                      for cam, info in self.status.items()}
+        prev = self._fields
+        changed, removed_fields = {}, {}
+        for cam, f in fields.items():
+            old = prev.get(cam, {})
+            diff = {k: v for k, v in f.items() if old.get(k) != v}
+            if diff:
+                changed[cam] = diff
+            gone = [k for k in old if k not in f]
+            if gone:
+                removed_fields[cam] = gone
+        removed = [cam for cam in prev if cam not in fields]
+        self._fields = fields
+        self.ticks += 1
+        if not (keyframe or changed or removed or removed_fields):
+            self._serialize_ms.append((time.perf_counter() - t0) * 1000)
+            return None
+
+        self._seq += 1
+        full = _status_text(fields)
+        self._full = full
+        self._keyframe = f'{{"type":"keyframe","seq":{self._seq},"status":{full}}}'
+        if keyframe:
+            message = self._keyframe
+        else:
+            message = (f'{{"type":"delta","seq":{self._seq},"changed":{_status_text(changed)},'
+                       f'"removed":{json.dumps(removed)},"removed_fields":{json.dumps(removed_fields)}}}')
+        self._serialize_ms.append((time.perf_counter() - t0) * 1000)
+        return message, full
+
+    def _fan_out(self, keyframe: bool, message: str, full: str):
+        if keyframe:
+            self.keyframes += 1
+            self._next_keyframe = time.monotonic() + self.keyframe_s
+        else:
+            self.deltas += 1
+        self.bytes_serialized += len(message)
+        for sub in list(self.subscribers):
+            if not sub._offer(full if sub.mode == "full" else message):
+                self.drop(sub)
+
+    def drop(self, sub: Subscriber):
+        """Disconnect a subscriber that can't keep up."""
+        self.unsubscribe(sub)
+        if not sub.dropped:
+            sub._drop()
+            self.dropped_clients += 1
+
+    async def serve(self, ws, mode: str = "delta"):
+        """Send this broadcaster's messages to an accepted WebSocket until it goes away."""
+        sub = self.subscribe(mode)
+        try:
+            while True:
+                text = await sub.get()
+                if text is None:
+                    await ws.close(code=1013)
+                    return
+                try:
+                    await asyncio.wait_for(ws.send_text(text), SEND_TIMEOUT_S)
+                except asyncio.TimeoutError:
+                    self.drop(sub)
+                    await ws.close(code=1013)
+                    return
+                self.messages_sent += 1
+        finally:
+            self.unsubscribe(sub)
+
+    def get_stats(self) -> dict:
+        ms = list(self._serialize_ms)
+        return {
+            "subscribers": len(self.subscribers),
+            "subscribers_by_mode": {m: sum(s.mode == m for s in self.subscribers) for m in MODES},
+            "ticks": self.ticks,
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "bytes_serialized": self.bytes_serialized,
+            "messages_sent": self.messages_sent,
+            "dropped_clients": self.dropped_clients,
+            "serialize_ms_mean": round(sum(ms) / len(ms), 3) if ms else 0.0
+        }
+
+
+_BROADCASTERS: Dict[str, StatusBroadcaster] = {}
+_BROADCASTERS_LOCK = threading.Lock()
+
+
+def get_broadcaster(name: str, status: dict, lock: threading.Lock, **kwargs) -> StatusBroadcaster:
+    """The broadcaster for a status dict, created on first use."""
+    with _BROADCASTERS_LOCK:
+        broadcaster = _BROADCASTERS.get(name)
+        if broadcaster is None:
+            broadcaster = _BROADCASTERS[name] = StatusBroadcaster(name, status, lock, **kwargs)
+        return broadcaster
+
+
+def get_all_stats() -> Dict[str, dict]:
+    with _BROADCASTERS_LOCK:
+        return {name: b.get_stats() for name, b in _BROADCASTERS.items()}
@@ -1,15 +1,18 @@
 import cv2
 import time
 import threading
-from ultralytics import YOLO
 import numpy as np 
-from typing import List, Tuple, Dict
+from services.inference_scheduler import get_yolo_scheduler
+from services.detector import parse_person_boxes
+from services.capture import FrameSource
+from services.frame_stream import SHOW_WINDOWS, open_channel, close_channel, show_window, destroy_window
 
 
 class ThermalHumanDetector:
     def __init__(self, model_path="AI_models/yolov8n.pt"):
-        self.model = YOLO(model_path)
-        self.model.to("cpu") 
+        # Frames from every video/webcam thread are batched through one shared model
+        self.scheduler = get_yolo_scheduler(model_path)
+        self.model = self.scheduler.model
         self.stop_flag = {"video": False, "webcam": False}
         self.latest_count = {"video": 0, "webcam": 0}
         self.latest_fps = {"video": 0.0, "webcam": 0.0}
@@ -35,23 +38,33 @@ class ThermalHumanDetector:
                 }
             }
 
-    def draw_info(self, frame, results, fps, source):
-        person_count = 0
-        for r in results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                if self.model.names[cls_id] == "person":
-                    person_count += 1
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
-                    cv2.putText(frame, f"Person {person_count} ({conf:.2f})", (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
+    def _set_latest(self, source, person_count, fps):
         with self.lock:
             self.latest_count[source] = person_count
             self.latest_fps[source] = fps
 
+    def _render(self, stream, window, frame, results, fps, source) -> bool:
+        """
+        Thermal view with boxes, for stream viewers and the local preview window.
+        Skipped entirely when nobody watches. Returns True if 'q' was pressed.
+        """
+        if not (stream.wanted() or SHOW_WINDOWS):
+            return False
+        thermal_frame = self.apply_thermal_effect(frame)
+        self.draw_info(thermal_frame, results, fps, source)
+        stream.publish(thermal_frame)
+        return SHOW_WINDOWS and show_window(window, thermal_frame)
+
+    def draw_info(self, frame, results, fps, source):
+        person_count = 0
+        for r in results:
+            for x1, y1, x2, y2, conf in parse_person_boxes(r).tolist():
+                person_count += 1
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
+                cv2.putText(frame, f"Person {person_count} ({conf:.2f})", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
         cv2.putText(frame, f"Total Persons: {person_count}", (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
         cv2.putText(frame, f"FPS: {fps:.2f}", (10, 60),
@@ -74,12 +87,16 @@ class ThermalHumanDetector:
         if video_id not in self.stop_flag:
             self.stop_flag[video_id] = False
 
-        cap = cv2.VideoCapture(video_path)
+        cap = FrameSource(video_path, name=f"thermal:{video_id}")
+        window = f"Thermal Detection {video_id}"
+        stream = open_channel(f"thermal:{video_id}")
         
         if not cap.isOpened():
             print(f"Failed to open video: {video_path}")
             status_store[video_id]["running"] = False
             status_store[video_id]["error"] = "Failed to open video"
+            cap.release()
+            close_channel(stream)
             return
 
         prev_time = time.time()
@@ -87,7 +104,7 @@ class ThermalHumanDetector:
 
         try:
             while cap.isOpened() and not self.stop_flag[video_id]:
-                ret, frame = cap.read()
+                ret, frame, captured_at = cap.read()
                 if not ret:
                     print(f"Video {video_id} finished or failed to read frame")
                     break
@@ -96,15 +113,13 @@ class ThermalHumanDetector:
 
                 try:
                     # Run YOLO detection
-                    results = self.model(frame, verbose=False)  # verbose=False to reduce console output
+                    results = [self.scheduler.infer(frame, f"thermal:{video_id}")]
                 except Exception as e:
                     print(f"YOLO ERROR on video {video_id}:", e)
                     break
 
                 # Count persons (class 0 is 'person' in COCO dataset)
-                person_count = sum(
-                    1 for r in results for box in r.boxes if int(box.cls[0]) == 0
-                )
+                person_count = sum(len(parse_person_boxes(r)) for r in results)
 
                 # Calculate FPS
                 curr_time = time.time()
@@ -116,14 +131,12 @@ class ThermalHumanDetector:
                 status_store[video_id]["fps"] = round(fps, 2)
                 status_store[video_id]["running"] = True
                 status_store[video_id]["frames_processed"] = frame_count
+                status_store[video_id]["latency_ms"] = round(cap.record_result(captured_at), 1)
+                status_store[video_id]["frames_dropped"] = cap.frames_dropped
+                self._set_latest(video_id, person_count, fps)
 
-                # Apply thermal effect and draw info
-                thermal_frame = self.apply_thermal_effect(frame)
-                self.draw_info(thermal_frame, results, fps, source=video_id)
-
-                # Display window (optional - can be disabled for headless servers)
-                cv2.imshow(f"Thermal Detection {video_id}", thermal_frame)
-                if cv2.waitKey(1) == ord("q"):
+                # Thermal view for stream viewers / preview window (headless: skipped)
+                if self._render(stream, window, frame, results, fps, source=video_id):
                     print(f"User pressed 'q' - stopping video {video_id}")
                     break
 
@@ -136,49 +149,37 @@ class ThermalHumanDetector:
             print(f"Stopping video {video_id}. Processed {frame_count} frames")
             status_store[video_id]["running"] = False
             cap.release()
-            cv2.destroyWindow(f"Thermal Detection {video_id}")
+            close_channel(stream)
+            destroy_window(window)
 
     def detect_in_webcam(self):
-        cap = cv2.VideoCapture(0)
+        cap = FrameSource(0, name="thermal:webcam")
         prev_time = time.time()
         self.stop_flag["webcam"] = False
+        window = "Thermal Human Detection - Webcam"
+        stream = open_channel("thermal:webcam")
 
         while cap.isOpened() and not self.stop_flag["webcam"]:
-            ret, frame = cap.read()
+            ret, frame, captured_at = cap.read()
             if not ret:
                 break
-            results = self.model(frame, verbose=False)
-            thermal_frame = self.apply_thermal_effect(frame)
+            results = [self.scheduler.infer(frame, "thermal:webcam")]
             curr_time = time.time()
             fps = 1 / (curr_time - prev_time + 1e-8)
             prev_time = curr_time
-            self.draw_info(thermal_frame, results, fps, source="webcam")
-            cv2.imshow("Thermal Human Detection - Webcam", thermal_frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            person_count = sum(len(parse_person_boxes(r)) for r in results)
+            self._set_latest("webcam", person_count, fps)
+            cap.record_result(captured_at)
+            if self._render(stream, window, frame, results, fps, source="webcam"):
                 break
 
         cap.release()
-        cv2.destroyAllWindows()
-
-    def detect(self, frame: np.ndarray, conf_thresh: float = 0.3) -> List[Dict]:
- 
-        results = self.model(frame, verbose=False)
-        out = []
-        if len(results) == 0:
-            return out
-        r = results[0]
-        
-        boxes = r.boxes
-        for box in boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            if cls_id != 0:  
-                continue
-            if conf < conf_thresh:
-                continue
-            xyxy = box.xyxy[0].cpu().numpy().astype(int).tolist()
-            out.append({"bbox": tuple(xyxy), "conf": conf})
-        return out
+        close_channel(stream)
+        destroy_window(window)
+
+    def detect(self, frame: np.ndarray, conf_thresh: float = 0.3, source: str = "thermal") -> np.ndarray:
+        """Person boxes as an (N, 5) array: x1, y1, x2, y2, conf."""
+        return parse_person_boxes(self.scheduler.infer(frame, source), conf_thresh)
 
     def stop_all(self):
         """Stop all running detection threads"""
@@ -196,4 +197,5 @@ class ThermalHumanDetector:
                 self.latest_count[key] = 0
                 self.latest_fps[key] = 0.0
         
-        cv2.destroyAllWindows()
\ No newline at end of file
+        if SHOW_WINDOWS:
+            cv2.destroyAllWindows()
\ No newline at end of file
@@ -5,29 +5,32 @@ import numpy as np
 
 class DeepSortWrapper:
     def __init__(self, max_age=30, n_init=3):
+        self.max_age = max_age
         # metric 'cosine' default; max_iou_distance, max_cosine_distance could be tuned
         self.tracker = DeepSort(max_age=max_age, n_init=n_init)
 
-    def update(self, detections: List[Dict], frame) -> List[Dict]:
+    def update(self, detections: np.ndarray, frame) -> List[Dict]:
         """
-        detections: list of {"bbox":(x1,y1,x2,y2), "conf":float, "feature": np.array or None}
+        detections: (N, 5) array of x1, y1, x2, y2, conf (see services/detector.py)
         returns list of tracks: {"track_id":int, "bbox":(x1,y1,x2,y2), "conf":float, "feature":np.array}
         """
-        dets_for_tracker = []
-        
-        # Build a map of detection confidence for each track
-        det_conf_map = {}
-        for i, d in enumerate(detections):
-            x1, y1, x2, y2 = d["bbox"]
-            conf = d.get("conf", 1.0)
-            det_conf_map[i] = conf
-            
-            # deep_sort_realtime expects bbox in [x, y, width, height]
-            bw = x2 - x1
-            bh = y2 - y1
-            dets_for_tracker.append(([x1, y1, bw, bh], conf, d.get("feature", None)))
+        # deep_sort_realtime expects bbox in [x, y, width, height]; features come from its embedder
+        dets_for_tracker = [([x1, y1, x2 - x1, y2 - y1], conf, None)
+                            for x1, y1, x2, y2, conf in detections.tolist()]
 
         tracks = self.tracker.update_tracks(dets_for_tracker, frame=frame)
+        return self._confirmed(tracks)
+
+    def predict(self) -> List[Dict]:
+        """
+        Advance every track's Kalman filter by one frame without detections
+        (a frame the sampler skipped) and return confirmed tracks at their
+        predicted positions. Tracks still age towards max_age as usual.
+        """
+        self.tracker.tracker.predict()
+        return self._confirmed(self.tracker.tracker.tracks)
+
+    def _confirmed(self, tracks) -> List[Dict]:
         out = []
         
         for t in tracks:
@@ -7,16 +7,17 @@ from matplotlib.lines import Line2D
 from services.grid import Grid
 from services.fire_model import FireModel
 from services.ant_colony import AntColony
-import pandas as pd
+from services.floors import load_floor_matrix
+from services.instrumentation import phase
 import os
 
-def generate_evacuation_image(matrix_path: str, start, exits, fire_locations, stage: str, consider_fire: bool = True, floor_number: int = 0, fire_floor: int = 0) -> dict:
+def generate_evacuation_image(matrix_path: str, start, exits, fire_locations, stage: str, consider_fire: bool = True, floor_number: int = 0, fire_floor: int = 0, render: bool = True) -> dict:
+    """
+    Evacuation route from start to the nearest exit, drawn as a PNG in output/.
+    With render=False only the route is computed and image_path is None.
+    """
 
-    
-    df = pd.read_csv(matrix_path, index_col=0)
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    df = df.apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
-    mat = df.to_numpy()
+    mat = load_floor_matrix(matrix_path)
 
     grid = Grid(mat.tolist())
     fire = FireModel(grid)
@@ -32,6 +33,28 @@ def generate_evacuation_image(matrix_path: str, start, exits, fire_locations, st
     if not path:
         raise ValueError("No evacuation path found")
 
+    filename = None
+    if render:
+        with phase("render"):
+            filename = _render_route(grid, fire, aco, start, exits, path, length, stage,
+                                     consider_fire, floor_number, fire_floor)
+
+    with phase("summary"):
+        summary = aco.get_path_summary(path)
+
+    return {
+        "path": path,
+        "length": length,
+        "image_path": filename,
+        "turning_points": summary["turning_points"],
+        "navigation_instructions": summary["navigation_instructions"],
+        "summary": summary
+    }
+
+
+def _render_route(grid: Grid, fire: FireModel, aco: AntColony, start, exits, path, length: float,
+                  stage: str, consider_fire: bool, floor_number: int, fire_floor: int) -> str:
+    """Draw the route on the floor plan and save it as a PNG; returns the file path."""
     os.makedirs("output", exist_ok=True)
     filename = f"output/route_{stage}_{'with_fire' if consider_fire else 'no_fire'}.png"
 
@@ -140,14 +163,4 @@ def generate_evacuation_image(matrix_path: str, start, exits, fire_locations, st
     plt.savefig(filename, dpi=300, bbox_inches='tight')
     plt.close(fig)
 
-   
-    summary = aco.get_path_summary(path)
-
-    return {
-        "path": path,
-        "length": length,
-        "image_path": filename,
-        "turning_points": summary["turning_points"],
-        "navigation_instructions": summary["navigation_instructions"],
-        "summary": summary
-    }
\ No newline at end of file
+    return filename
@@ -5,55 +5,49 @@ from matplotlib.patches import Rectangle, FancyArrow, Circle
 from matplotlib.lines import Line2D
 from services.grid import Grid
 from services.fire_model import FireModel
-from typing import List, Optional
-import pandas as pd
+from services.instrumentation import phase, count
+from typing import List, Optional, Dict
+from scipy import ndimage
 import numpy as np
+import hashlib
 import os
 
-def detect_rooms(grid: Grid, fire: FireModel) -> dict:
+MIN_ROOM_CELLS = 10  # Minimum room size
+
+# Floor plan digest -> room label array
+_ROOM_CACHE: Dict[bytes, np.ndarray] = {}
+_ROOM_CACHE_SIZE = 8
+
+
+def detect_rooms(grid: Grid, fire: Optional[FireModel] = None) -> np.ndarray:
     """
     Simple room detection - finds enclosed spaces.
-    Returns dict of room_id -> list of cell positions.
+    Returns an (h, w) int32 label array: 0 = not part of a room, k = ROOM_{k:03d}.
+    Rooms are 4-connected free regions of at least MIN_ROOM_CELLS cells, numbered
+    in row-major order of their first cell. Depends only on the floor plan, so the
+    result is cached per floor version (content digest); the array is read-only.
     """
-    visited = np.zeros((grid.h, grid.w), dtype=bool)
-    rooms = {}
-    room_counter = 1
-    
-    def flood_fill(start_r, start_c):
-        """Flood fill to find connected free cells."""
-        stack = [(start_r, start_c)]
-        cells = []
-        
-        while stack:
-            r, c = stack.pop()
-            
-            if visited[r, c] or grid.mat[r, c] == 1:
-                continue
-            
-            visited[r, c] = True
-            cells.append((r, c))
-            
-            # Check 4-connected neighbors for flood fill
-            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < grid.h and 0 <= nc < grid.w:
-                    if not visited[nr, nc] and grid.mat[nr, nc] == 0:
-                        stack.append((nr, nc))
-        
-        return cells
-    
-    # Find all connected regions
-    for r in range(grid.h):
-        for c in range(grid.w):
-            if not visited[r, c] and grid.mat[r, c] == 0:
-                room_cells = flood_fill(r, c)
-                
-                # Only consider as room if it has sufficient size
-                if len(room_cells) >= 10:  # Minimum room size
-                    rooms[f"ROOM_{room_counter:03d}"] = room_cells
-                    room_counter += 1
-    
-    return rooms
+    key = hashlib.sha1(grid.mat.tobytes()).digest() + bytes(str(grid.mat.shape), "ascii")
+    labels = _ROOM_CACHE.get(key)
+    if labels is not None:
+        count("room_cache_hits")
+        return labels
+
+    components, n = ndimage.label(grid.mat == 0)
+    sizes = np.bincount(components.ravel(), minlength=n + 1)
+    keep = sizes >= MIN_ROOM_CELLS
+    keep[0] = False
+
+    # Renumber kept components consecutively (label order is already row-major)
+    remap = np.zeros(n + 1, dtype=np.int32)
+    remap[keep] = np.arange(1, int(keep.sum()) + 1, dtype=np.int32)
+    labels = remap[components]
+    labels.setflags(write=False)
+
+    if len(_ROOM_CACHE) >= _ROOM_CACHE_SIZE:
+        _ROOM_CACHE.pop(next(iter(_ROOM_CACHE)))
+    _ROOM_CACHE[key] = labels
+    return labels
 
 
 def visualize_signboard_plan(grid: Grid, fire: FireModel, exits: List,
@@ -62,6 +56,13 @@ def visualize_signboard_plan(grid: Grid, fire: FireModel, exits: List,
     """
     Create visualization of signboard guidance system.
     """
+    with phase("render"):
+        return _render_signboard_plan(grid, fire, exits, plan, floor, fire_floor, stage, consider_fire)
+
+
+def _render_signboard_plan(grid: Grid, fire: FireModel, exits: List,
+                           plan: dict, floor: int, fire_floor: int,
+                           stage: str, consider_fire: bool) -> str:
     
     os.makedirs("output", exist_ok=True)
     filename = f"output/signboard_floor{floor}_{stage}_{'fire' if consider_fire else 'nofire'}.png"
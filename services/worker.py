@@ -2,11 +2,17 @@
 import cv2
 import time
 import numpy as np
-from typing import Dict, Any, Optional
-from services.detector import YoloDetector
+from typing import Dict, Any, Optional, Union
+from services.detector import YoloDetector, DetectionFilter
 from services.reid import ReIDExtractor
 from services.tracker import DeepSortWrapper
-from services.identity_manager import IdentityManager
+from services.identity_manager import IdentityManager, resolve_track_ids
+from services.capture import FrameSource
+from services.adaptive_sampler import AdaptiveSampler
+from services.roi import RoiSet, detect_in_rois, input_size
+from services.motion_gate import MotionGate
+from services.inference_size import InferenceSize
+from services.frame_stream import SHOW_WINDOWS, open_channel, close_channel, show_window, destroy_window
 import threading
 
 class CameraWorker:
@@ -20,7 +26,9 @@ class CameraWorker:
     def __init__(self, cam_name: str, source: str, shared_status: Dict[str, Any],
                  lock: threading.Lock, area_m2: float = 1.0,
                  detector: YoloDetector = None, reid: ReIDExtractor = None, 
-                 tracker: DeepSortWrapper = None, identity_manager: IdentityManager = None):
+                 tracker: DeepSortWrapper = None, identity_manager: IdentityManager = None,
+                 det_filter: DetectionFilter = None, rois: Optional[RoiSet] = None,
+                 imgsz: Union[str, int, None] = None):
         self.cam_name = cam_name
         self.source = source  # file path or device index (string)
         self.shared_status = shared_status
@@ -30,6 +38,11 @@ class CameraWorker:
         self.reid = reid or ReIDExtractor()
         self.tracker = tracker or DeepSortWrapper()
         self.identity_manager = identity_manager  # Global identity manager
+        # Confidence/size/aspect limits for detections, configurable per camera
+        self.det_filter = det_filter or DetectionFilter()
+        # Optional ROI polygons: detection runs on their crop, density is counted per ROI.
+        # Replaced as a whole by set_rois(), so the camera thread never sees a half update
+        self.rois = rois
         self._stop = False
         self._thread = None
         
@@ -41,6 +54,18 @@ class CameraWorker:
         
         # Optimization: Process Re-ID features only every N frames
         self.reid_frame_skip = 5  # Extract features every 5 frames (faster, still accurate)
+        
+        # Detection and Re-ID strides adapt to measured stage costs and lag
+        # (reid_frame_skip is the smallest Re-ID stride); see services/adaptive_sampler.py
+        self.sampler = AdaptiveSampler(min_reid_stride=self.reid_frame_skip)
+        # Frames without motion skip detection too (tracker prediction only)
+        self.motion = MotionGate(max_age=self.tracker.max_age)
+        # YOLO input size: fixed, or "auto" to pick the smallest size that still resolves
+        # this camera's people within the frame budget (services/inference_size.py)
+        self.infer_size = InferenceSize(imgsz)
+        
+        # Annotated frames are only drawn while someone watches (GET /stream/reid:<cam_name>)
+        self.stream = None
 
     def start(self):
         self._stop = False
@@ -52,68 +77,157 @@ class CameraWorker:
         if self._thread:
             self._thread.join(timeout=2)
 
+    def set_rois(self, rois: Optional[RoiSet]):
+        """Swap the ROI set (None = whole frame); applies from the next frame."""
+        self.rois = rois
+
+    def _extract_features(self, frame: np.ndarray, tracks) -> Dict[int, np.ndarray]:
+        """track_id -> L2-normalized Re-ID feature, for every track with a valid crop and feature."""
+        h, w = frame.shape[:2]
+        ids, crops = [], []
+        for t in tracks:
+            x1, y1, x2, y2 = t["bbox"]
+            x1c, y1c = max(0, x1), max(0, y1)
+            x2c, y2c = min(w, x2), min(h, y2)
+            if x2c > x1c and y2c > y1c:
+                ids.append(t["track_id"])
+                crops.append(frame[y1c:y2c, x1c:x2c])
+        if not crops:
+            return {}
+
+        feats, valid = self.reid.extract_batch(crops)
+        if not valid.all():
+            print(f"[{self.cam_name}] Feature extraction failed for {int((~valid).sum())}/{len(crops)} crops")
+        return {tid: feat for tid, feat, ok in zip(ids, feats, valid) if ok}
+
+    def _annotate(self, frame: np.ndarray, tracks_with_global_ids, person_count: int,
+                  unique_global_ids, pending_count: int, fps: float) -> np.ndarray:
+        """Copy of the frame with boxes, global IDs and per-camera statistics drawn on it."""
+        display_frame = frame.copy()
+
+        for t in tracks_with_global_ids:
+            x1, y1, x2, y2 = t["bbox"]
+            global_id = t["global_id"]
+            conf = t["conf"]
+            is_pending = t.get("pending", False)
+            
+            # Different display for pending vs confirmed IDs
+            if is_pending or global_id == "?":
+                # Pending ID - show as "?" with gray color
+                label = "ID: ?"
+                color = (128, 128, 128)  # Gray for pending
+            else:
+                # Confirmed ID - use consistent color
+                try:
+                    id_num = int(global_id) if isinstance(global_id, (int, float)) else int(str(global_id))
+                except (ValueError, TypeError):
+                    id_num = hash(str(global_id))
+                
+                # Use hash-based color generation (consistent per ID)
+                color_r = (id_num * 67) % 156 + 100
+                color_g = (id_num * 131) % 156 + 100
+                color_b = (id_num * 199) % 156 + 100
+                color = (color_b, color_g, color_r)  # BGR format for OpenCV
+                
+                label = f"ID: {global_id}"
+            
+            # Draw bounding box
+            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 3)
+            
+            # Draw ID label with background
+            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
+            
+            # Draw background rectangle for text
+            cv2.rectangle(display_frame, 
+                        (x1, y1 - label_size[1] - 10), 
+                        (x1 + label_size[0] + 10, y1),
+                        color, -1)
+            
+            # Draw text
+            cv2.putText(display_frame, label, (x1 + 5, y1 - 5),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+        # Draw overall statistics on frame
+        cv2.putText(display_frame, f"Video: {self.cam_name}", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        cv2.putText(display_frame, f"Persons: {person_count}", (10, 55),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        cv2.putText(display_frame, f"Confirmed IDs: {len(unique_global_ids)}", (10, 80),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        cv2.putText(display_frame, f"Pending: {pending_count}", (10, 105),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 2)
+        cv2.putText(display_frame, f"FPS: {fps:.1f}", (10, 130),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        return display_frame
+
     def run(self):
-        cap = cv2.VideoCapture(self.source)
+        self.stream = open_channel(f"reid:{self.cam_name}")
+        # Frames are read on a capture thread; live cameras keep only the newest one
+        cap = FrameSource(self.source, name=f"reid:{self.cam_name}")
         prev_time = time.time()
         frames = 0
 
         while cap.isOpened() and not self._stop:
-            ret, frame = cap.read()
+            ret, frame, captured_at = cap.read()
             if not ret:
                 break
             frames += 1
 
-            # Create a copy for display
-            display_frame = frame.copy()
+            # The sampler decides whether this frame gets YOLO + DeepSORT and Re-ID
+            frame_start = time.perf_counter()
+            detect, extract_reid = self.sampler.plan()
+            rois = self.rois
+            if detect and not self.motion.check(rois.crop(frame)[0] if rois is not None else frame,
+                                                frames, cap.source_fps):
+                # Nothing moved (in the ROIs) since the last check: prediction only, no Re-ID
+                detect = extract_reid = False
 
-            # Detection (always run) - Balanced threshold
-            dets = self.detector.detect(frame, conf_thresh=0.4)  # Balanced: catch people but avoid false positives
-            
-            # Filter detections: Remove obvious vehicles and far people
-            h_frame, w_frame = frame.shape[:2]
-            filtered_dets = []
-            for d in dets:
-                x1, y1, x2, y2 = d["bbox"]
-                width = x2 - x1
-                height = y2 - y1
-                
-                # Skip if too small (very far away - unreliable Re-ID)
-                if width < 40 or height < 60:
-                    continue
-                
-                # Skip if too large (likely vehicle or group)
-                if width > w_frame * 0.6 or height > h_frame * 0.7:
-                    continue
-                
-                # Skip if aspect ratio is clearly wrong (vehicles)
-                aspect_ratio = height / (width + 1e-6)
-                if aspect_ratio < 1.2 or aspect_ratio > 4.0:  # Person: 1.2-4.0x taller
-                    continue
-                
-                # Skip if bounding box area is huge (vehicles/buses)
-                bbox_area = width * height
-                frame_area = h_frame * w_frame
-                if bbox_area > frame_area * 0.4:  # Bigger than 40% of frame
-                    continue
-                
-                d["feature"] = None
-                filtered_dets.append(d)
-            
-            dets = filtered_dets
-            
-            # Extract Re-ID features only every N frames (optimization)
-            extract_reid = (frames % self.reid_frame_skip == 0)
+            if detect:
+                # Person boxes as one (N, 5) array, detected on the ROI crop if there is one;
+                # boxes outside the ROIs and too small/large/wide boxes are masked out
+                imgsz = self.infer_size.next_size()
+                t0 = time.perf_counter()
+                dets = detect_in_rois(self.detector, frame, rois, self.cam_name, imgsz=imgsz)
+                dets = self.det_filter(dets, frame.shape)
+                self.infer_size.record(imgsz, time.perf_counter() - t0, dets,
+                                       max(input_size(frame.shape, rois)), cap.source_fps)
 
-            # Update DeepSORT tracker with detections + features
-            tracks = self.tracker.update(dets, frame)
+                # Update DeepSORT tracker with detections + features
+                tracks = self.tracker.update(dets, frame)
+                self.sampler.record("detect", time.perf_counter() - frame_start)
+            else:
+                # Skipped frame: the Kalman filter carries tracks forward
+                t0 = time.perf_counter()
+                tracks = self.tracker.predict()
+                self.sampler.record("predict", time.perf_counter() - t0)
             
             # Log track count (only every 30 frames to reduce console spam)
             if extract_reid and len(tracks) > 0 and frames % 30 == 0:
                 print(f"[{self.cam_name}] Frame {frames}: Processing {len(tracks)} tracks...")
 
+            # Extract Re-ID features for all tracks of this frame in one forward pass
+            reid_start = time.perf_counter()
+            features = {}
+            if extract_reid and self.identity_manager is not None:
+                features = self._extract_features(frame, tracks)
+            features_extracted = len(features)
+
+            # Match all of this frame's features against the global gallery in one call
+            matches = {}
+            if features:
+                track_ids = list(features.keys())
+                results = self.identity_manager.register_or_match_batch(
+                    np.stack([features[tid] for tid in track_ids]), self.cam_name
+                )
+                matches = dict(zip(track_ids, results))
+            if extract_reid and self.identity_manager is not None:
+                # Temporary IDs the archive pass has since merged into a restored identity
+                if self.track_to_global:
+                    resolve_track_ids(self.identity_manager, self.track_to_global)
+                self.sampler.record("reid", time.perf_counter() - reid_start)
+
             # Match each track to global identity
             tracks_with_global_ids = []
-            features_extracted = 0
             
             # Track positions for this frame to check spatial distance
             track_positions = {}
@@ -121,30 +235,9 @@ class CameraWorker:
             for t in tracks:
                 track_id = t["track_id"]
                 
-                # Extract Re-ID feature directly from track bbox (more reliable)
-                feature = None
-                if extract_reid and self.identity_manager is not None:
-                    x1, y1, x2, y2 = t["bbox"]
-                    h, w = frame.shape[:2]
-                    x1c, y1c = max(0, x1), max(0, y1)
-                    x2c, y2c = min(w, x2), min(h, y2)
-                    
-                    if x2c > x1c and y2c > y1c:
-                        crop = frame[y1c:y2c, x1c:x2c]
-                        try:
-                            feature = self.reid.extract(crop)
-                            if feature is not None:
-                                features_extracted += 1
-                        except Exception as e:
-                            print(f"[{self.cam_name}] Feature extraction failed: {e}")
-                            feature = None
-                
-                # Priority 1: If we have a feature this frame, use it for matching
-                if feature is not None and self.identity_manager is not None:
-                    # Match to global identity using Re-ID feature
-                    global_id, is_new, similarity = self.identity_manager.register_or_match(
-                        feature, self.cam_name
-                    )
+                # Priority 1: If we have a feature this frame, use its global identity match
+                if track_id in matches:
+                    global_id, is_new, similarity = matches[track_id]
                     
                     # Store or update the global ID mapping
                     old_id = self.track_to_global.get(track_id, None)
@@ -186,86 +279,45 @@ class CameraWorker:
             if extract_reid and len(tracks) > 0 and frames % 30 == 0:
                 print(f"[{self.cam_name}] Frame {frames}: Extracted {features_extracted}/{len(tracks)} features")
 
-            # DRAW PERSON IDs ON VIDEO
-            for t in tracks_with_global_ids:
-                x1, y1, x2, y2 = t["bbox"]
-                global_id = t["global_id"]
-                conf = t["conf"]
-                is_pending = t.get("pending", False)
-                
-                # Different display for pending vs confirmed IDs
-                if is_pending or global_id == "?":
-                    # Pending ID - show as "?" with gray color
-                    label = "ID: ?"
-                    color = (128, 128, 128)  # Gray for pending
-                else:
-                    # Confirmed ID - use consistent color
-                    try:
-                        id_num = int(global_id) if isinstance(global_id, (int, float)) else int(str(global_id))
-                    except (ValueError, TypeError):
-                        id_num = hash(str(global_id))
-                    
-                    # Use hash-based color generation (consistent per ID)
-                    color_r = (id_num * 67) % 156 + 100
-                    color_g = (id_num * 131) % 156 + 100
-                    color_b = (id_num * 199) % 156 + 100
-                    color = (color_b, color_g, color_r)  # BGR format for OpenCV
-                    
-                    label = f"ID: {global_id}"
-                
-                # Draw bounding box
-                cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 3)
-                
-                # Draw ID label with background
-                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
-                
-                # Draw background rectangle for text
-                cv2.rectangle(display_frame, 
-                            (x1, y1 - label_size[1] - 10), 
-                            (x1 + label_size[0] + 10, y1),
-                            color, -1)
-                
-                # Draw text
-                cv2.putText(display_frame, label, (x1 + 5, y1 - 5),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-
             # Compute metrics
             person_count = len(tracks_with_global_ids)
             curr_time = time.time()
             fps = 1.0 / (curr_time - prev_time + 1e-8)
             prev_time = curr_time
-            density = person_count / (self.area_m2 + 1e-9)
+            roi_stats = None
+            if rois is None:
+                density = person_count / (self.area_m2 + 1e-9)
+            else:
+                # People on the ROIs' floor area (tracks predicted out of every ROI don't count)
+                roi_stats = rois.measure(tracks_with_global_ids)
+                person_count = sum(r["count"] for r in roi_stats.values())
+                density = person_count / (sum(r["area_m2"] for r in roi_stats.values()) + 1e-9)
 
             # Get unique global IDs in this frame (only confirmed, not pending)
             confirmed_tracks = [t for t in tracks_with_global_ids if not t.get("pending", False) and t["global_id"] != "?"]
             unique_global_ids = list(set(t["global_id"] for t in confirmed_tracks))
             pending_count = len([t for t in tracks_with_global_ids if t.get("pending", False) or t["global_id"] == "?"])
 
-            # Draw overall statistics on frame
-            cv2.putText(display_frame, f"Video: {self.cam_name}", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-            cv2.putText(display_frame, f"Persons: {person_count}", (10, 55),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Confirmed IDs: {len(unique_global_ids)}", (10, 80),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Pending: {pending_count}", (10, 105),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 2)
-            cv2.putText(display_frame, f"FPS: {fps:.1f}", (10, 130),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-            # Resize display frame to 1/4 size for smaller window
-            display_h, display_w = display_frame.shape[:2]
-            small_frame = cv2.resize(display_frame, (display_w // 2, display_h // 2), interpolation=cv2.INTER_LINEAR)
-            
-            # Display the resized video with IDs
-            cv2.imshow(f"Re-ID: {self.cam_name}", small_frame)
-            
-            # Press 'q' to stop this video
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                print(f"User pressed 'q' - stopping {self.cam_name}")
-                break
+            # Annotate only for stream viewers / the local preview window
+            if self.stream.wanted() or SHOW_WINDOWS:
+                display_frame = self._annotate(frame, tracks_with_global_ids, person_count,
+                                               unique_global_ids, pending_count, fps)
+                if rois is not None:
+                    rois.draw(display_frame)
+                self.stream.publish(display_frame)
+                
+                if SHOW_WINDOWS:
+                    # Half-size preview window; press 'q' to stop this video
+                    display_h, display_w = display_frame.shape[:2]
+                    small_frame = cv2.resize(display_frame, (display_w // 2, display_h // 2), interpolation=cv2.INTER_LINEAR)
+                    if show_window(f"Re-ID: {self.cam_name}", small_frame):
+                        print(f"User pressed 'q' - stopping {self.cam_name}")
+                        break
 
             # build status for this camera
+            latency_ms = cap.record_result(captured_at)
+            self.sampler.frame_done(time.perf_counter() - frame_start, cap.lag_ms(captured_at), cap.source_fps)
+            sampling = self.sampler.get_stats()
             status = {
                 "camera": self.cam_name,
                 "persons": person_count,
@@ -275,6 +327,17 @@ class CameraWorker:
                 "fps": round(fps, 2),
                 "density": round(density, 4),
                 "frames_processed": frames,
+                "latency_ms": round(latency_ms, 1),
+                "frames_dropped": cap.frames_dropped,
+                # Counts/density are measured at sample_rate_fps; on other frames they come
+                # from tracks carried forward by the tracker
+                "sample_rate_fps": sampling["detection_fps"],
+                "counts_predicted": not detect,
+                "sampling": sampling,
+                "motion": self.motion.get_stats(),
+                "inference_size": self.infer_size.get_stats(),
+                "rois": roi_stats,
+                "roi_pixel_fraction": round(rois.pixel_fraction(frame.shape), 3) if rois is not None else 1.0,
                 "running": True,
                 "last_update": time.time()
             }
@@ -284,7 +347,8 @@ class CameraWorker:
                 self.shared_status[self.cam_name] = status
 
         cap.release()
-        cv2.destroyWindow(f"Re-ID: {self.cam_name}")
+        close_channel(self.stream)
+        destroy_window(f"Re-ID: {self.cam_name}")
         
         # mark stopped
         with self.lock:
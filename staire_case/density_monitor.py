@@ -1,18 +1,37 @@
 import cv2
 import time
 import threading
-from typing import Dict, Any, Optional
-from services.detector import YoloDetector
+from typing import Dict, Any, Optional, Union
+from services.detector import YoloDetector, DetectionFilter
 from services.tracker import DeepSortWrapper
+from services.capture import FrameSource
+from services.adaptive_sampler import AdaptiveSampler
+from services.roi import RoiSet, detect_in_rois, input_size
+from services.motion_gate import MotionGate
+from services.inference_size import InferenceSize
+from services.frame_stream import SHOW_WINDOWS, open_channel, close_channel, show_window, destroy_window
 
 class StaircaseDensityMonitor:
-    def __init__(self, staircase_area_m2: float = 10.0, density_threshold: float = 0.5):
+    def __init__(self, staircase_area_m2: float = 10.0, density_threshold: float = 0.5,
+                 det_filter: DetectionFilter = None, rois: Optional[RoiSet] = None,
+                 imgsz: Union[str, int, None] = None):
         self.staircase_area_m2 = float(staircase_area_m2)
         self.density_threshold = float(density_threshold)
         self.detector = YoloDetector()
+        self.det_filter = det_filter or DetectionFilter()
+        # Optional ROI polygons (e.g. the steps): detection runs on their crop and each
+        # ROI gets its own density; the reroute signal fires when any ROI is too dense
+        self.rois = rois
         self.tracker = DeepSortWrapper()
+        # Detection stride adapts to measured stage costs and lag (services/adaptive_sampler.py)
+        self.sampler = AdaptiveSampler()
+        # Frames without motion skip detection too (tracker prediction only)
+        self.motion = MotionGate(max_age=self.tracker.max_age)
+        # YOLO input size, fixed or "auto" (services/inference_size.py)
+        self.infer_size = InferenceSize(imgsz)
         self._stop = False
         self._thread = None
+        self.stream = None
         self.status = {
             "running": False,
             "current_count": 0,
@@ -24,8 +43,11 @@ class StaircaseDensityMonitor:
         }
         self.status_lock = threading.Lock()
 
-    def start(self, source: str, shared_status: Dict[str, Any] = None):
+    def start(self, source: str, shared_status: Dict[str, Any] = None,
+              stream_name: Optional[str] = None):
         self._stop = False
+        # Annotated frames are only drawn while someone watches GET /stream/<stream_name>
+        self.stream = open_channel(stream_name or f"staircase:{source}")
         self.status["running"] = True
         if shared_status is None:
             shared_status = {}
@@ -40,8 +62,73 @@ class StaircaseDensityMonitor:
         with self.status_lock:
             self.status["running"] = False
 
+    def set_rois(self, rois: Optional[RoiSet]):
+        """Swap the ROI set (None = whole frame); applies from the next frame."""
+        self.rois = rois
+
+    def _annotate(self, frame, tracks, current_count: int, density: float,
+                  reroute_signal: bool, fps: float):
+        """Copy of the frame with track IDs, density and reroute state drawn on it."""
+        display_frame = frame.copy()
+
+        for t in tracks:
+            x1, y1, x2, y2 = t["bbox"]
+            track_id = t["track_id"]
+            conf = t.get("conf", 0.0)
+            
+            try:
+                id_num = int(track_id) if isinstance(track_id, (int, float)) else int(str(track_id))
+            except (ValueError, TypeError):
+                id_num = hash(str(track_id)) % 10000
+            
+            color_r = (id_num * 67) % 156 + 100
+            color_g = (id_num * 131) % 156 + 100
+            color_b = (id_num * 199) % 156 + 100
+            color = (color_b, color_g, color_r)
+            
+            label = f"ID: {track_id}"
+            
+            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
+            
+            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+            cv2.rectangle(display_frame, 
+                        (x1, y1 - label_size[1] - 8), 
+                        (x1 + label_size[0] + 8, y1),
+                        color, -1)
+            cv2.putText(display_frame, label, (x1 + 4, y1 - 4),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        info_y = 30
+        cv2.putText(display_frame, "Staircase Density Monitor", (10, info_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        info_y += 30
+        
+        cv2.putText(display_frame, f"People Count: {current_count}", (10, info_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        info_y += 30
+        
+        density_color = (0, 0, 255) if reroute_signal else (0, 255, 0)
+        cv2.putText(display_frame, f"Density: {density:.3f} / {self.density_threshold:.3f}", 
+                   (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, density_color, 2)
+        info_y += 30
+        
+        reroute_text = "REROUTE SIGNAL: ACTIVE" if reroute_signal else "REROUTE SIGNAL: INACTIVE"
+        reroute_color = (0, 0, 255) if reroute_signal else (0, 255, 0)
+        cv2.putText(display_frame, reroute_text, (10, info_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, reroute_color, 2)
+        info_y += 30
+        
+        cv2.putText(display_frame, f"Area: {self.staircase_area_m2} m2", (10, info_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        info_y += 30
+        
+        cv2.putText(display_frame, f"FPS: {fps:.1f}", (10, info_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        return display_frame
+
     def _run(self, source: str):
-        cap = cv2.VideoCapture(source)
+        # Frames are read on a capture thread; live cameras keep only the newest one
+        cap = FrameSource(source, name=self.stream.name)
         prev_time = time.time()
         frames = 0
         
@@ -51,121 +138,86 @@ class StaircaseDensityMonitor:
             window_name = f"Staircase Density Monitor - {source.split('/')[-1]}"
 
         while cap.isOpened() and not self._stop:
-            ret, frame = cap.read()
+            ret, frame, captured_at = cap.read()
             if not ret:
                 break
             frames += 1
 
-            display_frame = frame.copy()
+            # Detection + tracking on sampled frames; the Kalman filter carries tracks in between
+            frame_start = time.perf_counter()
+            detect, _ = self.sampler.plan()
+            rois = self.rois
+            if detect and not self.motion.check(rois.crop(frame)[0] if rois is not None else frame,
+                                                frames, cap.source_fps):
+                detect = False  # nothing moved (in the ROIs) since the last check
+            if detect:
+                imgsz = self.infer_size.next_size()
+                t0 = time.perf_counter()
+                dets = detect_in_rois(self.detector, frame, rois, f"staircase:{source}", imgsz=imgsz)
+                dets = self.det_filter(dets, frame.shape)
+                self.infer_size.record(imgsz, time.perf_counter() - t0, dets,
+                                       max(input_size(frame.shape, rois)), cap.source_fps)
+                tracks = self.tracker.update(dets, frame)
+                self.sampler.record("detect", time.perf_counter() - frame_start)
+            else:
+                t0 = time.perf_counter()
+                tracks = self.tracker.predict()
+                self.sampler.record("predict", time.perf_counter() - t0)
 
-            dets = self.detector.detect(frame, conf_thresh=0.4)
-            
-            h_frame, w_frame = frame.shape[:2]
-            filtered_dets = []
-            for d in dets:
-                x1, y1, x2, y2 = d["bbox"]
-                width = x2 - x1
-                height = y2 - y1
-                
-                if width < 40 or height < 60:
-                    continue
-                if width > w_frame * 0.6 or height > h_frame * 0.7:
-                    continue
-                
-                aspect_ratio = height / (width + 1e-6)
-                if aspect_ratio < 1.2 or aspect_ratio > 4.0:
-                    continue
-                
-                bbox_area = width * height
-                frame_area = h_frame * w_frame
-                if bbox_area > frame_area * 0.4:
-                    continue
-                
-                d["feature"] = None
-                filtered_dets.append(d)
-            
-            tracks = self.tracker.update(filtered_dets, frame)
-            current_count = len(tracks)
-            
-            density = current_count / (self.staircase_area_m2 + 1e-9)
+            roi_stats = None
+            if rois is None:
+                current_count = len(tracks)
+                density = current_count / (self.staircase_area_m2 + 1e-9)
+            else:
+                # Densest ROI decides; tracks predicted out of every ROI don't count
+                roi_stats = rois.measure(tracks)
+                for r in roi_stats.values():
+                    r["reroute_signal"] = r["density"] > self.density_threshold
+                current_count = sum(r["count"] for r in roi_stats.values())
+                density = max(r["density"] for r in roi_stats.values())
             reroute_signal = density > self.density_threshold
             
-            for t in tracks:
-                x1, y1, x2, y2 = t["bbox"]
-                track_id = t["track_id"]
-                conf = t.get("conf", 0.0)
-                
-                try:
-                    id_num = int(track_id) if isinstance(track_id, (int, float)) else int(str(track_id))
-                except (ValueError, TypeError):
-                    id_num = hash(str(track_id)) % 10000
-                
-                color_r = (id_num * 67) % 156 + 100
-                color_g = (id_num * 131) % 156 + 100
-                color_b = (id_num * 199) % 156 + 100
-                color = (color_b, color_g, color_r)
-                
-                label = f"ID: {track_id}"
-                
-                cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
-                
-                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                cv2.rectangle(display_frame, 
-                            (x1, y1 - label_size[1] - 8), 
-                            (x1 + label_size[0] + 8, y1),
-                            color, -1)
-                cv2.putText(display_frame, label, (x1 + 4, y1 - 4),
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
             curr_time = time.time()
             fps = 1.0 / (curr_time - prev_time + 1e-8)
             prev_time = curr_time
 
-            info_y = 30
-            cv2.putText(display_frame, "Staircase Density Monitor", (10, info_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-            info_y += 30
-            
-            cv2.putText(display_frame, f"People Count: {current_count}", (10, info_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            info_y += 30
-            
-            density_color = (0, 0, 255) if reroute_signal else (0, 255, 0)
-            cv2.putText(display_frame, f"Density: {density:.3f} / {self.density_threshold:.3f}", 
-                       (10, info_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, density_color, 2)
-            info_y += 30
-            
-            reroute_text = "REROUTE SIGNAL: ACTIVE" if reroute_signal else "REROUTE SIGNAL: INACTIVE"
-            reroute_color = (0, 0, 255) if reroute_signal else (0, 255, 0)
-            cv2.putText(display_frame, reroute_text, (10, info_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, reroute_color, 2)
-            info_y += 30
-            
-            cv2.putText(display_frame, f"Area: {self.staircase_area_m2} m2", (10, info_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-            info_y += 30
-            
-            cv2.putText(display_frame, f"FPS: {fps:.1f}", (10, info_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-            display_h, display_w = display_frame.shape[:2]
-            if display_w > 1280 or display_h > 720:
-                scale = min(1280 / display_w, 720 / display_h)
-                new_w = int(display_w * scale)
-                new_h = int(display_h * scale)
-                display_frame = cv2.resize(display_frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-            
-            cv2.imshow(window_name, display_frame)
+            # Annotate only for stream viewers / the local preview window
+            if self.stream.wanted() or SHOW_WINDOWS:
+                display_frame = self._annotate(frame, tracks, current_count, density, reroute_signal, fps)
+                if rois is not None:
+                    rois.draw(display_frame)
+                self.stream.publish(display_frame)
+
+                if SHOW_WINDOWS:
+                    display_h, display_w = display_frame.shape[:2]
+                    if display_w > 1280 or display_h > 720:
+                        scale = min(1280 / display_w, 720 / display_h)
+                        new_w = int(display_w * scale)
+                        new_h = int(display_h * scale)
+                        display_frame = cv2.resize(display_frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+                    if show_window(window_name, display_frame):
+                        break
 
+            latency_ms = cap.record_result(captured_at)
+            self.sampler.frame_done(time.perf_counter() - frame_start, cap.lag_ms(captured_at), cap.source_fps)
+            sampling = self.sampler.get_stats()
             with self.status_lock:
                 self.status.update({
                     "current_count": current_count,
                     "density": round(density, 4),
                     "reroute_signal": reroute_signal,
                     "fps": round(fps, 2),
+                    "latency_ms": round(latency_ms, 1),
+                    "frames_dropped": cap.frames_dropped,
+                    # Count/density measured at sample_rate_fps, predicted by the tracker in between
+                    "sample_rate_fps": sampling["detection_fps"],
+                    "counts_predicted": not detect,
+                    "sampling": sampling,
+                    "motion": self.motion.get_stats(),
+                    "inference_size": self.infer_size.get_stats(),
+                    "rois": roi_stats,
+                    "roi_pixel_fraction": round(rois.pixel_fraction(frame.shape), 3) if rois is not None else 1.0,
                     "last_update": time.time()
                 })
                 
@@ -173,7 +225,8 @@ class StaircaseDensityMonitor:
                     self.shared_status.update(self.status)
 
         cap.release()
-        cv2.destroyWindow(window_name)
+        close_channel(self.stream)
+        destroy_window(window_name)
         with self.status_lock:
             self.status["running"] = False
             if hasattr(self, 'shared_status'):
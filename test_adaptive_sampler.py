@@ -0,0 +1,72 @@
+"""
+Tests for lag-adaptive frame sampling (services/adaptive_sampler.py)
+Run with: python -m pytest test_adaptive_sampler.py
+"""
+from services.adaptive_sampler import AdaptiveSampler
+
+
+def _run(sampler, frames, detect_s, predict_s=0.001, reid_s=0.0, base_s=0.002, lag_ms=0.0, source_fps=None):
+    plans = []
+    for _ in range(frames):
+        detect, reid = sampler.plan()
+        plans.append((detect, reid))
+        spent = base_s
+        if detect:
+            sampler.record("detect", detect_s)
+            spent += detect_s
+        else:
+            sampler.record("predict", predict_s)
+            spent += predict_s
+        if reid:
+            sampler.record("reid", reid_s)
+            spent += reid_s
+        sampler.frame_done(spent, lag_ms, source_fps)
+    return plans
+
+
+def test_fixed_strides_without_targets():
+    sampler = AdaptiveSampler(target_fps=None, max_lag_ms=None, min_reid_stride=5)
+    plans = _run(sampler, 20, detect_s=1.0)
+    assert all(d for d, _ in plans)
+    assert [i for i, (_, r) in enumerate(plans) if r] == [0, 5, 10, 15]
+
+
+def test_defaults_detect_every_frame(monkeypatch):
+    import importlib
+    from services import adaptive_sampler
+    monkeypatch.delenv("EVAC_TARGET_FPS", raising=False)
+    monkeypatch.delenv("EVAC_MAX_LAG_MS", raising=False)
+    module = importlib.reload(adaptive_sampler)
+    try:
+        sampler = module.AdaptiveSampler()
+        assert not sampler.adaptive
+        # a slow, lagging file source still gets every frame detected
+        plans = _run(sampler, 40, detect_s=1.0, lag_ms=5000.0, source_fps=30)
+        assert all(d for d, _ in plans) and sampler.detect_stride == 1
+    finally:
+        importlib.reload(adaptive_sampler)
+
+
+def test_strides_follow_stage_costs():
+    # 25 fps budget = 40 ms: 2 ms base + 100 ms / 3 detection + 50 ms / 15 Re-ID fits
+    sampler = AdaptiveSampler(target_fps=25, max_lag_ms=None, min_reid_stride=1, max_detect_stride=4)
+    _run(sampler, 40, detect_s=0.1, reid_s=0.05)
+    assert (sampler.detect_stride, sampler.reid_stride) == (3, 15)
+    plans = _run(sampler, 40, detect_s=0.1, reid_s=0.05)
+    assert all(d for d, r in plans if r)  # Re-ID only on detection frames
+
+    # Cheap detection: back to every frame
+    _run(sampler, 40, detect_s=0.01, reid_s=0.001)
+    assert sampler.detect_stride == 1
+    stats = sampler.get_stats()
+    assert stats["detection_fps"] > 0 and stats["stage_ms"]["detect"] < 20
+
+
+def test_lag_raises_stride_until_it_recovers():
+    sampler = AdaptiveSampler(target_fps=None, max_lag_ms=500, max_detect_stride=4)
+    _run(sampler, 10, detect_s=0.001, lag_ms=2000, source_fps=30)
+    assert sampler.detect_stride == 2
+    _run(sampler, 20, detect_s=0.001, lag_ms=2000, source_fps=30)
+    assert sampler.detect_stride == 4
+    _run(sampler, 40, detect_s=0.001, lag_ms=10, source_fps=30)
+    assert sampler.detect_stride == 1
@@ -0,0 +1,57 @@
+"""
+Tests for the decoupled capture stage (services/capture.py)
+Run with: python -m pytest test_capture.py
+"""
+import time
+
+import cv2
+import numpy as np
+
+from services import capture
+from services.capture import FrameSource, is_live_source
+
+
+def _write_video(path, n=20):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(n):
+        writer.write(np.full((48, 64, 3), i * 5, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _brightness(frame):
+    return int(round(frame.mean() / 5))
+
+
+def test_live_source_detection():
+    assert is_live_source("0") and is_live_source(1) and is_live_source("rtsp://cam/1")
+    assert not is_live_source("videos/lobby.mp4")
+
+
+def test_file_source_queues_every_frame_in_order(tmp_path):
+    src = FrameSource(_write_video(tmp_path / "a.avi"), name="test:file")
+    assert src.policy == "queue"
+    seen = []
+    while src.isOpened():
+        ok, frame, captured_at = src.read()
+        if not ok:
+            break
+        time.sleep(0.002)  # slower than the reader
+        seen.append(_brightness(frame))
+        src.record_result(captured_at)
+    src.release()
+    assert seen == list(range(20))
+    stats = src.get_stats()
+    assert stats["frames_dropped"] == 0 and stats["frames_processed"] == 20
+
+
+def test_latest_policy_drops_stale_frames(tmp_path):
+    src = FrameSource(_write_video(tmp_path / "b.avi", n=50), name="test:latest", policy="latest")
+    assert "test:latest" in capture.get_all_stats()
+    time.sleep(0.5)  # slow consumer: the reader has finished by now
+    ok, frame, _ = src.read()
+    assert ok and _brightness(frame) == 49  # only the newest frame is left
+    assert not src.read()[0] and not src.isOpened()
+    assert src.frames_dropped == 49
+    src.release()
+    assert "test:latest" not in capture.get_all_stats()
@@ -0,0 +1,131 @@
+"""
+Tests for the per-endpoint admission control in front of the process pool
+(services/compute_pool.py). Jobs run on a thread pool here instead of worker processes.
+Run with: python -m pytest test_compute_pool.py
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import compute_pool
+from services.compute_pool import ClientDisconnected, EndpointLimiter, Overloaded
+
+
+class _Request:
+    """Stands in for a starlette Request: disconnects `after` seconds from now."""
+    def __init__(self, after=None):
+        self.deadline = None if after is None else time.monotonic() + after
+
+    async def is_disconnected(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(compute_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(compute_pool, "POLL_INTERVAL", 0.01)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_full_queue_gets_503_with_retry_after(monkeypatch):
+    from api.endpoints import router
+    # no free slot and no queue: every request is rejected before reaching the pool
+    monkeypatch.setitem(compute_pool.LIMITERS, "evacuation", EndpointLimiter("evacuation", 0, 0))
+    app = FastAPI()
+    app.include_router(router)
+    resp = TestClient(app).get("/evacuation", params={
+        "start_row": 1, "start_col": 1, "strating_floor": 0, "fire_locations": ["2,2"],
+        "fire_floor": 0, "exits": ["3,3"]})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(compute_pool.RETRY_AFTER)
+    assert compute_pool.LIMITERS["evacuation"].rejected == 1
+
+
+def test_queue_limit_counts_waiting_jobs(thread_pool):
+    async def scenario():
+        limiter = EndpointLimiter("test", concurrency=1, queue=1)
+        running = asyncio.create_task(limiter.run(_Request(), time.sleep, 0.2))
+        await asyncio.sleep(0.02)
+        waiting = asyncio.create_task(limiter.run(_Request(), time.sleep, 0))
+        await asyncio.sleep(0.02)
+        with pytest.raises(Overloaded):
+            await limiter.run(_Request(), time.sleep, 0)
+        await asyncio.gather(running, waiting)
+        assert limiter.get_stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiting_jobs_run_in_arrival_order(thread_pool):
+    async def scenario():
+        limiter = EndpointLimiter("test", concurrency=1, queue=8)
+        order = []
+        running = asyncio.create_task(limiter.run(_Request(), time.sleep, 0.2))
+        waiting = []
+        for name in "abcdef":
+            await asyncio.sleep(0.013)  # out of step with the disconnect polls
+            waiting.append(asyncio.create_task(limiter.run(_Request(), order.append, name)))
+        await asyncio.gather(running, *waiting)
+        assert order == list("abcdef")
+
+    asyncio.run(scenario())
+
+
+def test_client_disconnect_cancels_running_and_waiting_jobs(thread_pool):
+    async def scenario():
+        limiter = EndpointLimiter("test", concurrency=1, queue=4)
+        running = asyncio.create_task(limiter.run(_Request(after=0.1), time.sleep, 0.3))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(limiter.run(_Request(after=0.03), time.sleep, 0))
+        for task in (running, waiting):
+            with pytest.raises(ClientDisconnected):
+                await task
+        stats = limiter.get_stats()
+        assert stats["cancelled"] == 2 and stats["running"] == 0 and stats["waiting"] == 0
+        # the slot is free again
+        assert await limiter.run(_Request(), sum, [1, 2]) == 3
+
+    asyncio.run(scenario())
+
+
+def test_per_endpoint_env_overrides(monkeypatch):
+    monkeypatch.setenv("EVAC_ROUTING_CONCURRENCY", "3")
+    monkeypatch.setenv("EVAC_ROUTING_QUEUE", "16")
+    limiter = EndpointLimiter("routing", concurrency=1, queue=2)
+    assert limiter.concurrency == 3 and limiter.max_queue == 16
+    other = EndpointLimiter("other", concurrency=1, queue=2)
+    assert other.concurrency == 1 and other.max_queue == 2
+
+
+class _BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_broken_pool_is_replaced(monkeypatch, thread_pool):
+    pools = [_BrokenPool(), thread_pool]
+    monkeypatch.setattr(compute_pool, "get_pool", lambda: pools[0])
+    monkeypatch.setattr(compute_pool, "_reset_pool", lambda broken: pools.remove(broken))
+
+    async def scenario():
+        limiter = EndpointLimiter("test", concurrency=1, queue=1)
+        assert await limiter.run(_Request(), sum, [1, 2]) == 3
+        assert limiter.get_stats()["pool_failures"] == 1
+
+        # a pool that breaks again on retry is reported as overload (503)
+        pools[:] = [_BrokenPool(), _BrokenPool()]
+        with pytest.raises(Overloaded):
+            await limiter.run(_Request(), sum, [1, 2])
+        assert limiter.get_stats()["running"] == 0
+
+    asyncio.run(scenario())
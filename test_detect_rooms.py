@@ -0,0 +1,68 @@
+"""
+Tests for the vectorized room detection (services/visualize_signboard.py):
+same rooms as the original per-cell flood fill on the repo floors, cached by
+floor plan content.
+Run with: python -m pytest test_detect_rooms.py
+"""
+import numpy as np
+import pytest
+
+from services.floors import FLOOR_MATRIX, load_floor_matrix
+from services.grid import Grid
+from services.visualize_signboard import MIN_ROOM_CELLS, detect_rooms
+
+
+def _flood_fill_rooms(grid: Grid) -> dict:
+    """The flood fill detect_rooms replaced: room_id -> list of cells."""
+    visited = np.zeros((grid.h, grid.w), dtype=bool)
+    rooms = {}
+    for r0 in range(grid.h):
+        for c0 in range(grid.w):
+            if visited[r0, c0] or grid.mat[r0, c0] != 0:
+                continue
+            stack, cells = [(r0, c0)], []
+            while stack:
+                r, c = stack.pop()
+                if visited[r, c] or grid.mat[r, c] == 1:
+                    continue
+                visited[r, c] = True
+                cells.append((r, c))
+                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < grid.h and 0 <= nc < grid.w and not visited[nr, nc] and grid.mat[nr, nc] == 0:
+                        stack.append((nr, nc))
+            if len(cells) >= MIN_ROOM_CELLS:
+                rooms[f"ROOM_{len(rooms) + 1:03d}"] = cells
+    return rooms
+
+
+def _as_rooms(labels: np.ndarray) -> dict:
+    return {f"ROOM_{k:03d}": set(zip(*map(np.ndarray.tolist, np.nonzero(labels == k))))
+            for k in range(1, int(labels.max()) + 1)}
+
+
+@pytest.mark.parametrize("floor", sorted(FLOOR_MATRIX))
+def test_matches_flood_fill_on_repo_floors(floor):
+    grid = Grid(load_floor_matrix(FLOOR_MATRIX[floor]).tolist())
+    expected = {room: set(cells) for room, cells in _flood_fill_rooms(grid).items()}
+    labels = detect_rooms(grid)
+    assert labels.shape == (grid.h, grid.w) and labels.dtype == np.int32
+    assert expected and _as_rooms(labels) == expected
+
+
+def test_cache_is_keyed_on_grid_content():
+    mat = load_floor_matrix(FLOOR_MATRIX[0])
+    labels = detect_rooms(Grid(mat.tolist()))
+    assert not labels.flags.writeable
+    # a new Grid with the same plan hits the cache
+    assert detect_rooms(Grid(mat.tolist())) is labels
+
+    # walling off one cell of a room is a different plan, not a cache hit
+    edited = mat.copy()
+    r, c = map(int, np.argwhere(labels == 1)[0])
+    edited[r, c] = 1
+    grid = Grid(edited.tolist())
+    relabeled = detect_rooms(grid)
+    assert relabeled is not labels and relabeled[r, c] == 0
+    assert _as_rooms(relabeled) == {room: set(cells) for room, cells in _flood_fill_rooms(grid).items()}
+    assert detect_rooms(Grid(mat.tolist())) is labels
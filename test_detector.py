@@ -0,0 +1,86 @@
+"""
+Tests for vectorized detection post-processing (services/detector.py, no model needed)
+Run with: python -m pytest test_detector.py
+"""
+import numpy as np
+import pytest
+
+from services.detector import DetectionFilter, parse_person_boxes
+
+
+class _Tensor:
+    def __init__(self, a):
+        self.a = a
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Tensor(np.asarray(data, dtype=np.float32).reshape(-1, 6))
+
+    def __len__(self):
+        return len(self.data.a)
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+def _legacy_filter(dets, h_frame, w_frame, min_conf=0.4):
+    """The per-box loop CameraWorker and StaircaseDensityMonitor used to run."""
+    out = []
+    for x1, y1, x2, y2, conf in dets:
+        width, height = x2 - x1, y2 - y1
+        if conf < min_conf:
+            continue
+        if width < 40 or height < 60:
+            continue
+        if width > w_frame * 0.6 or height > h_frame * 0.7:
+            continue
+        aspect_ratio = height / (width + 1e-6)
+        if aspect_ratio < 1.2 or aspect_ratio > 4.0:
+            continue
+        if width * height > h_frame * w_frame * 0.4:
+            continue
+        out.append((x1, y1, x2, y2, conf))
+    return out
+
+
+def test_parse_person_boxes_keeps_persons_above_threshold():
+    r = _Result([[10, 20, 50, 120, 0.9, 0],
+                 [0, 0, 30, 30, 0.95, 2],     # car
+                 [60, 20, 90, 100, 0.2, 0]])  # below threshold
+    dets = parse_person_boxes(r, 0.3)
+    assert dets.shape == (1, 5) and dets.dtype == np.float32
+    assert np.allclose(dets[0], [10, 20, 50, 120, 0.9])
+    assert parse_person_boxes(_Result([]), 0.3).shape == (0, 5)
+    assert parse_person_boxes(None).shape == (0, 5)
+
+
+def test_filter_matches_the_per_box_rules():
+    rng = np.random.default_rng(0)
+    h, w = 480, 640
+    x1 = rng.uniform(0, w - 10, 500)
+    y1 = rng.uniform(0, h - 10, 500)
+    dets = np.stack([x1, y1, x1 + rng.uniform(5, 400, 500), y1 + rng.uniform(5, 400, 500),
+                     rng.uniform(0.25, 1.0, 500)], axis=1).astype(np.float32)
+    kept = DetectionFilter()(dets, (h, w, 3))
+    expected = _legacy_filter(dets.tolist(), h, w)
+    assert 0 < len(kept) < len(dets)
+    assert np.allclose(kept, np.asarray(expected, dtype=np.float32))
+
+
+def test_filter_limits_are_configurable_per_camera():
+    dets = np.array([[0, 0, 20, 40, 0.9]], dtype=np.float32)  # small, distant person
+    assert len(DetectionFilter()(dets, (480, 640))) == 0
+    far = DetectionFilter.from_dict({"min_width": 10, "min_height": 30})
+    assert len(far(dets, (480, 640))) == 1
+    assert far.to_dict()["min_conf"] == 0.4
+    with pytest.raises(ValueError):
+        DetectionFilter.from_dict({"min_widht": 10})
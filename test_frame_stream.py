@@ -0,0 +1,67 @@
+"""
+Tests for on-demand annotated streams (services/frame_stream.py, api/streams.py)
+Run with: python -m pytest test_frame_stream.py
+"""
+import threading
+import time
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.streams import router
+from services import frame_stream
+
+
+def _frame(value=128, w=320, h=240):
+    return np.full((h, w, 3), value, dtype=np.uint8)
+
+
+def test_channel_encodes_once_per_frame_and_size():
+    channel = frame_stream.FrameChannel("test")
+    assert not channel.wanted()
+    assert channel.encode() == (0, None)
+
+    channel.publish(_frame())
+    seq, a = channel.encode(width=160)
+    _, b = channel.encode(width=160)
+    assert seq == 1 and a is b and a[:2] == b"\xff\xd8"
+    channel.encode()  # full size is a separate encoding
+    assert channel.encodes == 2
+
+    channel.publish(_frame(64))
+    seq, c = channel.encode(width=160)
+    assert seq == 2 and c != a and channel.encodes == 3
+
+
+def test_websocket_stream_subscribes_and_closes():
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    channel = frame_stream.open_channel("reid:test_cam")
+    stop = threading.Event()
+
+    def camera():
+        # Pipeline side: only build frames while somebody watches
+        while not stop.is_set():
+            if channel.wanted():
+                channel.publish(_frame(int(time.time() * 100) % 255))
+            time.sleep(0.01)
+
+    t = threading.Thread(target=camera, daemon=True)
+    t.start()
+    try:
+        assert client.get("/stream").json()["streams"][0]["name"] == "reid:test_cam"
+        assert client.get("/stream/reid:missing").status_code == 404
+        with client.websocket_connect("/stream/reid:test_cam/ws?width=160&fps=30") as ws:
+            jpeg = ws.receive_bytes()
+            assert jpeg[:2] == b"\xff\xd8" and channel.viewers == 1
+        deadline = time.time() + 2
+        while channel.viewers and time.time() < deadline:
+            time.sleep(0.01)
+        assert channel.viewers == 0
+    finally:
+        stop.set()
+        t.join()
+        frame_stream.close_channel(channel)
+    assert frame_stream.get_channel("reid:test_cam") is None
@@ -0,0 +1,293 @@
+"""
+Tests for IdentityManager matching on the matrix-backed gallery
+Run with: python -m pytest test_identity_manager.py
+"""
+import numpy as np
+
+from services.identity_manager import IdentityManager
+
+
+def _unit(rng, n, dim=64):
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _noisy(rng, protos, scale):
+    x = protos + rng.normal(scale=scale, size=protos.shape).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_same_video_match_and_new_identity():
+    rng = np.random.default_rng(0)
+    people = _unit(rng, 2)
+    im = IdentityManager(similarity_threshold=0.75)
+
+    gid, is_new, _ = im.register_or_match(people[0], "cam1")
+    assert (gid, is_new) == (1, True)
+    gid, is_new, sim = im.register_or_match(_noisy(rng, people[:1], 0.02)[0], "cam1")
+    assert (gid, is_new) == (1, False) and sim > 0.9
+    gid, is_new, _ = im.register_or_match(people[1], "cam1")
+    assert (gid, is_new) == (2, True)
+    assert im.get_identity_info(1)["count"] == 2
+
+
+def test_cross_video_needs_higher_similarity():
+    rng = np.random.default_rng(1)
+    person = _unit(rng, 1)
+    im = IdentityManager(similarity_threshold=0.75)
+    im.register_or_match(person[0], "cam1")
+
+    # ~0.85 similarity: enough within a video, not across videos
+    other = person[0] * 0.7 + _unit(rng, 1)[0] * 0.714
+    other /= np.linalg.norm(other)
+    gid, is_new, _ = im.register_or_match(other, "cam2")
+    assert is_new and gid == 2
+
+    gid, is_new, _ = im.register_or_match(person[0], "cam2")
+    assert (gid, is_new) == (1, False)
+    assert sorted(im.get_identity_info(1)["videos"]) == ["cam1", "cam2"]
+    assert im.get_statistics()["cross_video_identities"] == 1
+
+
+def test_batch_matches_sequential_registration():
+    rng = np.random.default_rng(2)
+    protos = _unit(rng, 20)
+    seq, batch = IdentityManager(0.75), IdentityManager(0.75)
+    for frame in range(150):
+        video = f"cam{frame % 3}"
+        feats = _noisy(rng, protos[rng.integers(0, 20, rng.integers(1, 6))], 0.02)
+        expected = [seq.register_or_match(f, video) for f in feats]
+        got = batch.register_or_match_batch(feats, video)
+        assert [r[:2] for r in got] == [r[:2] for r in expected]
+        np.testing.assert_allclose([r[2] for r in got], [r[2] for r in expected], atol=1e-5)
+    assert seq.get_all_identities().keys() == batch.get_all_identities().keys()
+
+
+def test_gallery_grows_past_initial_capacity():
+    rng = np.random.default_rng(3)
+    im = IdentityManager(0.75)
+    feats = _unit(rng, 600, dim=256)
+    results = im.register_or_match_batch(feats, "cam1")
+    assert [r[0] for r in results] == list(range(1, 601))
+    assert im.gallery.capacity >= 600
+    assert im.find_best_match(feats[417])[0] == 418
+
+    im.reset()
+    assert im.get_statistics()["total_identities"] == 0
+    assert im.register_or_match(feats[0], "cam1")[:2] == (1, True)
+
+
+def test_ivf_index_insert_update_delete():
+    from services.ann_index import IVFIndex
+    rng = np.random.default_rng(4)
+    vecs = _unit(rng, 2000)
+    index = IVFIndex(64, n_probe=8)
+    index.build(np.arange(1000), vecs[:1000])
+    for i in range(1000, 2000):
+        index.add(i, vecs[i])
+    assert len(index) == 2000
+    assert index.search(vecs[1500])[0] == 1500
+
+    moved = _unit(rng, 1)[0]
+    index.update(1500, moved)
+    assert index.search(moved)[0] == 1500
+    index.remove(1500)
+    assert 1500 not in index and index.search(moved)[0] != 1500
+    for i in range(0, 2000, 3):
+        if i != 1500:
+            index.remove(i)
+    assert all(index.search(vecs[i])[0] == i for i in range(1, 2000, 3) if i != 1500)
+
+
+def test_ivf_retrain_runs_off_the_callers_thread(monkeypatch):
+    import threading
+    from services import ann_index
+    from services.ann_index import IVFIndex
+    release, trained_on = threading.Event(), []
+    kmeans = ann_index.spherical_kmeans
+
+    def slow_kmeans(*args, **kwargs):
+        trained_on.append(threading.current_thread())
+        if len(trained_on) > 1:
+            assert release.wait(5)
+        return kmeans(*args, **kwargs)
+
+    monkeypatch.setattr(ann_index, "spherical_kmeans", slow_kmeans)
+    rng = np.random.default_rng(6)
+    vecs = _unit(rng, 1300)
+    index = IVFIndex(64, n_probe=8)
+    index.build(np.arange(250), vecs[:250])
+    for i in range(250, 1000):
+        index.add(i, vecs[i])  # the 1000th add starts the retrain and returns
+    assert len(trained_on) == 2 and trained_on[1] is not threading.current_thread()
+    assert index.retrains == 1
+
+    # changes while training: still searchable with the old codebook, kept after the swap
+    for i in range(1000, 1300):
+        index.add(i, vecs[i])
+    moved = _unit(rng, 1)[0]
+    index.update(10, moved)
+    index.remove(20)
+    index.remove(1200)
+    assert index.search(vecs[1100])[0] == 1100
+    release.set()
+    index.wait_for_retrain(5)
+    assert index.retrains == 2 and len(index) == 1298 and len(index.lists) > 63
+    assert index.search(moved)[0] == 10
+    assert 20 not in index and 1200 not in index
+    assert all(index.search(vecs[i])[0] == i for i in range(0, 1300, 7) if i not in (10, 20, 1200))
+
+
+def test_identity_manager_with_ivf_index():
+    rng = np.random.default_rng(5)
+    protos = _unit(rng, 300)
+    exact = IdentityManager(0.75)
+    ann = IdentityManager(0.75, index="ivf", exact_max=100)
+    exact.register_or_match_batch(protos, "cam1")
+    ann.register_or_match_batch(protos, "cam1")
+    assert ann.gallery.approximate and ann.get_statistics()["index"] == "ivf"
+
+    feats = _noisy(rng, protos[rng.integers(0, 300, 200)], 0.02)
+    expected = [r[:2] for r in exact.register_or_match_batch(feats, "cam1")]
+    got = [r[:2] for r in ann.register_or_match_batch(feats, "cam1")]
+    assert np.mean([g == e for g, e in zip(got, expected)]) > 0.95
+
+
+def test_store_round_trip_and_snapshot_isolation(tmp_path):
+    rng = np.random.default_rng(6)
+    people = _unit(rng, 50)
+    im = IdentityManager(0.75, store_dir=str(tmp_path), snapshot_interval=3600)
+    im.register_or_match_batch(people[:30], "cam1")
+    im.register_or_match_batch(people[20:50], "cam2")
+
+    # A snapshot is unaffected by writes made after it was taken
+    with im.lock:
+        snap = im.gallery.snapshot()
+    before = snap.features[:snap.size].copy()
+    im.register_or_match_batch(_noisy(rng, people[:10], 0.02), "cam1")
+    np.testing.assert_array_equal(snap.features[:snap.size], before)
+
+    assert im.save_snapshot()
+    assert not im.save_snapshot()  # unchanged since the last save
+    expected = im.get_all_identities()
+    im.close()
+
+    loaded = IdentityManager(0.75, store_dir=str(tmp_path), snapshot_interval=3600)
+    got = loaded.get_all_identities()
+    assert got.keys() == expected.keys()
+    for gid in expected:
+        assert sorted(got[gid]["videos"]) == sorted(expected[gid]["videos"])
+        assert got[gid]["count"] == expected[gid]["count"]
+    assert sorted(loaded.get_video_identities("cam2")) == sorted(im.get_video_identities("cam2"))
+    assert loaded.register_or_match(people[5], "cam1")[:2] == (6, False)
+    assert loaded.register_or_match(_unit(rng, 1)[0], "cam1")[0] == im.next_id
+    loaded.close()
+
+
+def test_readers_use_versioned_views_without_the_camera_lock():
+    import threading
+    rng = np.random.default_rng(7)
+    im = IdentityManager(0.75, view_max_age=0.0)
+    im.register_or_match_batch(_unit(rng, 10), "cam1")
+    view = im.get_all_identities()
+    assert len(view) == 10
+    assert im.get_all_identities() is view  # unchanged version: same immutable view
+
+    im.register_or_match(_unit(rng, 1)[0], "cam2")
+    assert len(im.get_all_identities()) == 11
+    assert im.get_video_identities("cam2") == [11]
+    assert im.get_statistics()["total_videos"] == 2
+
+    # A current view is served while a camera thread holds the lock
+    result = {}
+    with im.lock:
+        t = threading.Thread(target=lambda: result.update(stats=im.get_statistics()))
+        t.start()
+        t.join(timeout=2)
+    assert result["stats"]["total_identities"] == 11
+
+
+def test_reset_and_eviction_are_never_served_stale():
+    import time
+    rng = np.random.default_rng(8)
+    # a long age bound: additions may lag behind, removals may not
+    im = IdentityManager(0.75, view_max_age=60.0, ttl=60)
+    try:
+        im.register_or_match_batch(_unit(rng, 5), "cam1")
+        assert len(im.get_all_identities()) == 5
+        im.register_or_match(_unit(rng, 1)[0], "cam1")
+        assert len(im.get_all_identities()) == 5  # within view_max_age
+
+        assert im.evict(now=time.time() + 3600) == 6
+        assert im.get_all_identities() == {}
+    finally:
+        im.close()
+
+    im = IdentityManager(0.75, view_max_age=60.0)
+    im.register_or_match_batch(_unit(rng, 3), "cam2")
+    assert len(im.get_all_identities()) == 3
+    im.reset()
+    assert im.get_all_identities() == {}
+    assert im.get_video_identities("cam2") == []
+    assert im.get_statistics()["total_identities"] == 0
+
+
+def test_evicted_identities_are_archived_and_restored():
+    import time
+    rng = np.random.default_rng(6)
+    people = _unit(rng, 3)
+    im = IdentityManager(similarity_threshold=0.75, ttl=60, max_identities=2, retention_interval=3600)
+    try:
+        for p in people:
+            im.register_or_match(p, "cam1")
+        # TTL: nobody seen for an hour -> all archived; LRU alone keeps the newest two
+        assert im.evict(now=time.time()) == 1
+        assert sorted(im.gallery.all_ids()) == [2, 3]
+        assert im.evict(now=time.time() + 3600) == 2
+        assert len(im.gallery) == 0 and len(im.archive) == 3
+        stats = im.get_statistics()["retention"]
+        assert (stats["evicted_lru"], stats["evicted_ttl"]) == (1, 2)
+
+        # Person 2 comes back: gets a temporary ID, then the archive pass restores ID 2
+        gid, is_new, _ = im.register_or_match(_noisy(rng, people[1:2], 0.02)[0], "cam1")
+        assert is_new and gid == 4
+        deadline = time.time() + 5
+        while im.retention_stats["archive_hits"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert im.gallery.all_ids() == [2] and len(im.archive) == 2
+        assert im.gallery.metadata(2)["count"] == 2
+        gid, is_new, _ = im.register_or_match(_noisy(rng, people[1:2], 0.02)[0], "cam1")
+        assert (gid, is_new) == (2, False)
+    finally:
+        im.close()
+
+
+def test_cameras_converge_on_the_restored_id():
+    import time
+    from services.identity_manager import resolve_track_ids
+    rng = np.random.default_rng(7)
+    person, other = _unit(rng, 2)
+    im = IdentityManager(similarity_threshold=0.75, ttl=60, retention_interval=3600)
+    try:
+        assert im.register_or_match(person, "cam1")[0] == 1
+        im.register_or_match(other, "cam1")
+        assert im.evict(now=time.time() + 3600) == 2
+
+        # re-seen: the camera maps its track to the temporary ID first
+        temp, is_new, _ = im.register_or_match(_noisy(rng, person[None], 0.02)[0], "cam1")
+        assert is_new and temp == 3
+        track_to_global = {11: temp, 12: "?"}
+        deadline = time.time() + 5
+        while im.retention_stats["archive_hits"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert im.get_identity_info(temp) is None and im.get_identity_info(1) is not None
+
+        assert im.resolve_ids([temp, 1, 2]) == {temp: 1}
+        assert resolve_track_ids(im, track_to_global) == 1
+        assert track_to_global == {11: 1, 12: "?"}
+        assert resolve_track_ids(im, track_to_global) == 0
+
+        im.reset()
+        assert im.resolve_ids([temp]) == {}
+    finally:
+        im.close()
@@ -0,0 +1,68 @@
+"""
+Tests for the CPU inference backend helpers (services/inference_backend.py)
+Run with: python -m pytest test_inference_backend.py
+"""
+import cv2
+import numpy as np
+import pytest
+
+from services import inference_backend
+from services.inference_backend import (calibration_crops, letterbox, load_calibration_frames,
+                                        parse_backend, reid_batches)
+
+
+def _write_video(path, n=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(n):
+        writer.write(np.full((48, 64, 3), i * 5, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_parse_backend():
+    assert parse_backend(None) == ("torch", False)
+    assert parse_backend("onnx") == ("onnx", False)
+    assert parse_backend(" OpenVINO-int8 ") == ("openvino", True)
+    for bad in ("tensorrt", "torch-int8", "onnx-fp16"):
+        with pytest.raises(ValueError):
+            parse_backend(bad)
+
+
+def test_artifact_paths_are_recognizable_by_suffix(monkeypatch):
+    monkeypatch.setattr(inference_backend, "CACHE_DIR", "cache")
+    assert inference_backend.artifact_path("yolov8n", "onnx", True).endswith("yolov8n-onnx-int8.onnx")
+    assert inference_backend.artifact_path("yolov8n", "openvino", False).endswith("yolov8n-openvino_openvino_model")
+
+
+def test_letterbox_keeps_aspect_and_pads():
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    frame[..., 2] = 255  # red in BGR
+    x = letterbox(frame, size=64)
+    assert x.shape == (3, 64, 64) and x.dtype == np.float32
+    # content rows are red in RGB order, padding rows are gray 114
+    assert np.allclose(x[:, 32, 32], [1.0, 0.0, 0.0])
+    assert np.allclose(x[:, 0, 32], 114 / 255)
+
+
+def test_calibration_frames_from_videos_and_images(tmp_path):
+    _write_video(tmp_path / "a.avi")
+    cv2.imwrite(str(tmp_path / "b.jpg"), np.zeros((32, 32, 3), dtype=np.uint8))
+    frames = load_calibration_frames(str(tmp_path), count=6)
+    assert len(frames) == 6
+    # frames spread over the whole clip, not just its start
+    means = [f.mean() for f in frames[1:]]
+    assert means[-1] - means[0] > 50
+
+    with pytest.raises(RuntimeError):
+        load_calibration_frames(str(tmp_path / "missing"), count=4)
+
+
+def test_calibration_crops_and_reid_batches():
+    frames = [np.random.default_rng(i).integers(0, 256, (120, 160, 3), dtype=np.uint8) for i in range(3)]
+    crops = calibration_crops(frames, per_frame=3)
+    assert len(crops) == 9
+    assert all(c.shape[0] >= c.shape[1] and c.size for c in crops)
+    batches = reid_batches(crops, batch=4)
+    assert [b.shape[0] for b in batches] == [4, 4, 1]
+    # each batch owns its data (the preprocessor reuses one buffer)
+    assert not np.shares_memory(batches[0], batches[1])
@@ -0,0 +1,94 @@
+"""
+Tests for the cross-camera batched inference scheduler (no model needed)
+Run with: python -m pytest test_inference_scheduler.py
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from services.inference_scheduler import InferenceScheduler
+
+
+def _echo_model(calls):
+    def predict(frames):
+        calls.append(len(frames))
+        time.sleep(0.01)
+        return [int(f[0, 0]) for f in frames]
+    return predict
+
+
+def test_results_go_back_to_their_callers():
+    calls = []
+    sched = InferenceScheduler(_echo_model(calls), max_batch=4, max_wait_ms=50)
+    try:
+        results = {}
+
+        def camera(i):
+            results[i] = sched.infer(np.full((2, 2), i), source=f"cam{i % 3}")
+
+        threads = [threading.Thread(target=camera, args=(i,)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == {i: i for i in range(12)}
+        assert max(calls) <= 4
+        assert len(calls) < 12  # frames were actually batched
+        stats = sched.get_stats()
+        assert stats["frames"] == 12
+        assert set(stats["cameras"]) == {"cam0", "cam1", "cam2"}
+        assert sum(c["frames"] for c in stats["cameras"].values()) == 12
+    finally:
+        sched.stop()
+
+
+def test_deadline_flushes_incomplete_batch():
+    calls = []
+    sched = InferenceScheduler(_echo_model(calls), max_batch=16, max_wait_ms=5)
+    try:
+        t0 = time.perf_counter()
+        assert sched.infer(np.full((2, 2), 7), timeout=2) == 7
+        assert time.perf_counter() - t0 < 1.0
+        assert calls == [1]
+    finally:
+        sched.stop()
+
+
+def test_model_error_is_raised_in_every_caller():
+    def broken(frames):
+        raise ValueError("boom")
+
+    sched = InferenceScheduler(broken, max_batch=2, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError):
+            sched.infer(np.zeros((2, 2)), source="cam")
+        assert sched.get_stats()["cameras"]["cam"]["errors"] == 1
+    finally:
+        sched.stop()
+
+
+def test_submit_after_stop_fails():
+    sched = InferenceScheduler(_echo_model([]))
+    sched.stop()
+    with pytest.raises(RuntimeError):
+        sched.submit(np.zeros((2, 2)))
+
+
+def test_frames_of_different_sizes_never_share_a_forward_pass():
+    calls = []
+
+    def predict(frames, imgsz=None):
+        calls.append((imgsz, len(frames)))
+        return [imgsz] * len(frames)
+
+    sched = InferenceScheduler(predict, max_batch=8, max_wait_ms=100)
+    try:
+        futures = [sched.submit(np.zeros((2, 2)), f"cam{i}", imgsz=[320, 640, None][i % 3]) for i in range(6)]
+        assert [f.result(timeout=2) for f in futures] == [320, 640, None] * 2
+        assert sorted(calls, key=str) == sorted([(320, 2), (640, 2), (None, 2)], key=str)
+        assert sched.get_stats()["frames_by_imgsz"] == {"320": 2, "640": 2, "default": 2}
+    finally:
+        sched.stop()
@@ -0,0 +1,73 @@
+"""
+Tests for per-camera YOLO input size selection (services/inference_size.py, no model needed)
+Run with: python -m pytest test_inference_size.py
+"""
+import numpy as np
+import pytest
+
+from services.inference_size import PROBE_DETECTIONS, InferenceSize, parse_size
+
+
+def _boxes(height, n=5):
+    return np.array([[100, 100, 100 + height / 2, 100 + height, 0.9]] * n, dtype=np.float32)
+
+
+def _probe(ctl, height, ms, long_side=1280, source_fps=None):
+    for _ in range(PROBE_DETECTIONS):
+        size = ctl.next_size()
+        assert size == 640
+        ctl.record(size, ms / 1000, _boxes(height), long_side, source_fps)
+
+
+def test_static_size_never_changes():
+    ctl = InferenceSize(512, recheck_s=0)
+    for _ in range(20):
+        size = ctl.next_size()
+        assert size == 512
+        ctl.record(size, 0.03, _boxes(40), 1280)
+    stats = ctl.get_stats()
+    assert stats["mode"] == "static" and stats["imgsz"] == 512 and stats["checks"] == 0
+    assert stats["cost_ms"] == pytest.approx(30.0)
+
+
+def test_auto_picks_smallest_size_that_resolves_large_people():
+    ctl = InferenceSize("auto", target_fps=None)
+    assert ctl.probing
+    # 300 px tall in a 1280 px frame: ~75 px even at 320
+    _probe(ctl, 300, ms=20)
+    assert not ctl.probing and ctl.next_size() == 320
+    stats = ctl.get_stats()
+    assert stats["imgsz"] == 320 and stats["person_height_px"] == 300.0 and stats["checks"] == 1
+
+
+def test_auto_keeps_full_size_for_distant_people_unless_over_budget():
+    ctl = InferenceSize("auto", target_fps=None)
+    _probe(ctl, 60, ms=200)
+    assert ctl.size == 640
+
+    # 200 ms at 640 against a 100 ms budget: 512 is estimated at 128 ms, 448 at 98 ms
+    ctl = InferenceSize("auto", target_fps=10)
+    _probe(ctl, 60, ms=200)
+    assert ctl.size == 448
+
+    # without EVAC_TARGET_FPS the source frame rate sets the budget
+    ctl = InferenceSize("auto", target_fps=None)
+    _probe(ctl, 60, ms=200, source_fps=10)
+    assert ctl.size == 448
+
+
+def test_auto_rechecks_periodically():
+    ctl = InferenceSize("auto", target_fps=None, recheck_s=0)
+    _probe(ctl, 300, ms=20)
+    assert ctl.size == 320
+    # people moved away: the next probe goes back to a larger size
+    _probe(ctl, 100, ms=20)
+    assert ctl.size == 640 and ctl.checks == 2
+
+
+def test_parse_size():
+    assert parse_size("auto") == "auto" and parse_size(" AUTO ") == "auto"
+    assert parse_size(416) == 416 and parse_size("320") == 320
+    for bad in ("big", 0, 500, -32):
+        with pytest.raises(ValueError):
+            parse_size(bad)
@@ -0,0 +1,120 @@
+"""
+Tests for the routing instrumentation (services/instrumentation.py, api/metrics.py):
+Server-Timing on /evacuation and /signboard-guidance with phases measured in
+pool workers, and the Prometheus text served at /metrics.
+Pool jobs run on a thread pool here instead of worker processes.
+Run with: python -m pytest test_metrics.py
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import endpoints, signboard_endpoints
+from api.metrics import router as metrics_router, timing_middleware
+from services import compute_pool, instrumentation
+from services.floors import FLOOR_MATRIX, load_floor_matrix
+from services.instrumentation import count, phase
+
+pytestmark = pytest.mark.skipif(not instrumentation.ENABLED, reason="EVAC_METRICS=0")
+
+_worker_threads = []
+
+
+def _fake_evacuation(matrix, start, exits, fire, stage, consider_fire=True, floor_number=0, fire_floor=0, render=True):
+    _worker_threads.append(threading.current_thread())
+    with phase("aco"):
+        count("aco_iterations", 3)
+    with phase("render"):
+        pass
+    return {"path": [list(start)], "length": 0, "summary": {"turning_points_count": 0},
+            "turning_points": [], "navigation_instructions": [], "image_path": "output/evacuation.png"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(compute_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(endpoints, "generate_evacuation_image", _fake_evacuation)
+    monkeypatch.setattr(signboard_endpoints, "get_table", lambda floor: None)  # always computed in the pool
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.include_router(signboard_endpoints.signboard_router)
+    app.include_router(metrics_router)
+    app.middleware("http")(timing_middleware)
+    yield TestClient(app)
+    pool.shutdown(wait=True)
+
+
+def _timing(resp) -> dict:
+    entries = dict(part.strip().split(";dur=") for part in resp.headers["Server-Timing"].split(","))
+    return {name: float(ms) for name, ms in entries.items()}
+
+
+def _free_cells(floor, n):
+    cells = np.argwhere(load_floor_matrix(FLOOR_MATRIX[floor]) == 0)
+    return [f"{r},{c}" for r, c in cells[np.linspace(0, len(cells) - 1, n).astype(int)]]
+
+
+def test_evacuation_server_timing_includes_worker_phases(client):
+    _worker_threads.clear()
+    resp = client.get("/evacuation", params={
+        "start_row": 1, "start_col": 1, "strating_floor": 0, "fire_locations": ["2,2"],
+        "fire_floor": 0, "exits": ["3,3"]})
+    assert resp.status_code == 200, resp.text
+    timing = _timing(resp)
+    # measured on the pool thread, reported on the API response
+    assert _worker_threads and _worker_threads[0] is not threading.main_thread()
+    assert {"aco", "render", "total"} <= set(timing)
+    assert timing["total"] >= timing["aco"] >= 0
+    assert list(timing)[-1] == "total"
+
+
+def test_signboard_guidance_server_timing(client):
+    fire, exit_, *signs = _free_cells(0, 5)
+    resp = client.get("/signboard-guidance", params={
+        "floor": 0, "fire_floor": 0, "stage": "growth", "include_visualization": False,
+        "fire_locations": [fire], "exits": [exit_], "signboard_locations": signs})
+    assert resp.status_code == 200, resp.text
+    timing = _timing(resp)
+    assert {"fire", "signboard_plan", "total"} <= set(timing)
+
+    # untimed paths get no header
+    assert "Server-Timing" not in client.get("/metrics").headers
+
+
+_SAMPLE = re.compile(r'^(evac_[a-z_]+)(\{[a-z_]+="[^"]*"(,le="[^"]+")?\})? (\S+)$')
+
+
+def test_metrics_prometheus_text(client):
+    client.get("/evacuation", params={
+        "start_row": 1, "start_col": 1, "strating_floor": 0, "fire_locations": ["2,2"],
+        "fire_floor": 0, "exits": ["3,3"]})
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = resp.text.rstrip("\n").split("\n")
+    types = {}
+    for line in lines:
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("histogram", "counter")
+            types[name] = kind
+        else:
+            m = _SAMPLE.match(line)
+            assert m, line
+            float(m.group(4))
+    assert types["evac_phase_seconds"] == types["evac_request_seconds"] == "histogram"
+    assert types["evac_aco_iterations_total"] == "counter"
+
+    # cumulative buckets ending in +Inf == count, for the worker phase and the endpoint
+    for metric, label in (("evac_phase_seconds", 'phase="aco"'), ("evac_request_seconds", 'endpoint="/evacuation"')):
+        buckets = [float(l.rsplit(" ", 1)[1]) for l in lines if l.startswith(f"{metric}_bucket{{{label},")]
+        assert len(buckets) == len(instrumentation.BUCKETS) + 1
+        assert buckets == sorted(buckets)
+        total = [float(l.rsplit(" ", 1)[1]) for l in lines if l.startswith(f"{metric}_count{{{label}}}")]
+        assert total == [buckets[-1]] and total[0] >= 1
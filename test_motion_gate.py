@@ -0,0 +1,84 @@
+"""
+Tests for the motion gate in front of detection (services/motion_gate.py)
+Run with: python -m pytest test_motion_gate.py
+"""
+import numpy as np
+import pytest
+
+from services.motion_gate import MotionGate
+
+
+def _corridor(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(60, 90, (360, 640, 3), dtype=np.uint8)
+
+
+def test_static_scene_is_skipped_until_detection_is_forced():
+    gate = MotionGate(threshold=0.002, force_s=1.0)
+    frame = _corridor()
+    decisions = [gate.check(frame, i, source_fps=10) for i in range(25)]
+    # first frame, then one forced detection every 10 frames (1 s at 10 fps)
+    assert [i for i, d in enumerate(decisions) if d] == [0, 10, 20]
+    stats = gate.get_stats()
+    assert stats["frames_skipped"] == 22 and stats["forced_detections"] == 2
+    assert stats["skipped_ratio"] == round(22 / 25, 4)
+
+
+def test_sensor_noise_is_not_motion():
+    gate = MotionGate(threshold=0.002, force_s=100)
+    base = _corridor().astype(np.int16)
+    rng = np.random.default_rng(1)
+    gate.check(base.astype(np.uint8), 0, 25)
+    for i in range(1, 10):
+        noisy = np.clip(base + rng.integers(-6, 7, base.shape), 0, 255).astype(np.uint8)
+        assert not gate.check(noisy, i, 25)
+
+
+def test_a_person_walking_in_triggers_detection():
+    gate = MotionGate(threshold=0.002, force_s=100)
+    frame = _corridor()
+    gate.check(frame, 0, 25)
+    assert not gate.check(frame, 1, 25)
+    walker = frame.copy()
+    walker[150:330, 300:360] = 220  # bright figure, ~5% of the frame
+    assert gate.check(walker, 2, 25)
+    assert gate.activity > 0.02
+
+
+def test_disabled_gate_detects_everything():
+    gate = MotionGate(threshold=0)
+    frame = _corridor()
+    assert all(gate.check(frame, i) for i in range(5))
+    assert gate.get_stats()["enabled"] is False
+
+
+def test_forced_detection_comes_before_tracks_expire():
+    # 2 s at 30 fps would be 60 frames; a tracker with max_age=30 caps the gap at 29
+    gate = MotionGate(threshold=0.002, force_s=2.0, max_age=30)
+    frame = _corridor()
+    decisions = [gate.check(frame, i, source_fps=30) for i in range(100)]
+    assert [i for i, d in enumerate(decisions) if d] == [0, 29, 58, 87]
+    # without a frame rate too
+    gate = MotionGate(threshold=0.002, force_s=100, max_age=10)
+    assert [i for i in range(30) if gate.check(frame, i)] == [0, 9, 18, 27]
+
+
+def test_standing_person_keeps_their_track_id():
+    pytest.importorskip("deep_sort_realtime")
+    from services.tracker import DeepSortWrapper
+    tracker = DeepSortWrapper()
+    gate = MotionGate(threshold=0.002, force_s=2.0, max_age=tracker.max_age)
+    frame = _corridor()
+    frame[100:300, 300:360] = 200  # someone standing in the corridor
+    det = np.array([[300, 100, 360, 300, 0.9]], dtype=np.float32)
+    for _ in range(3):  # detected on arrival until the track is confirmed
+        tracks = tracker.update(det, frame)
+    [first] = [t["track_id"] for t in tracks]
+
+    for i in range(200):  # then nothing moves for ~7 s at 30 fps
+        if gate.check(frame, i, source_fps=30):
+            tracks = tracker.update(det, frame)
+        else:
+            tracks = tracker.predict()
+        assert [t["track_id"] for t in tracks] == [first], i
+    assert gate.get_stats()["forced_detections"] >= 6
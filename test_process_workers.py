@@ -0,0 +1,112 @@
+"""
+Tests for process-based camera workers (services/process_workers.py, services/shm_ring.py)
+Run with: python -m pytest test_process_workers.py
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from services import frame_stream, process_workers
+from services.identity_manager import IdentityManager
+from services.shm_ring import FrameRing
+
+
+class _FakePipeline:
+    """Stands in for CameraWorker: publishes status and frames, asks for identity matches."""
+
+    def __init__(self, status, identity_manager, marker, crash_first):
+        self.status = status
+        self.identity_manager = identity_manager
+        self.marker = marker
+        self.crash_first = crash_first
+        self._stop = False
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        if self.crash_first and not os.path.exists(self.marker):
+            open(self.marker, "w").close()
+            os._exit(3)
+        channel = frame_stream.open_channel("test:cam")
+        matches = self.identity_manager.register_or_match_batch(np.eye(2, 8, dtype=np.float32), "cam")
+        frames = 0
+        while not self._stop:
+            frames += 1
+            if channel.wanted():
+                channel.publish(np.full((48, 64, 3), frames % 255, dtype=np.uint8))
+            merged = self.identity_manager.resolve_ids([m[0] for m in matches] + [7])
+            self.status["cam"] = {"running": True, "frames": frames, "ids": [m[0] for m in matches],
+                                  "merged": merged}
+            time.sleep(0.01)
+        self.status["cam"] = {"running": False, "frames": frames}
+
+    def stop(self):
+        self._stop = True
+        self._thread.join(timeout=2)
+
+
+def _fake_pipeline(status, identity_manager, marker, crash_first=False):
+    pipeline = _FakePipeline(status, identity_manager, marker, crash_first)
+    pipeline._thread.start()
+    return pipeline
+
+
+def _wait_for(cond, timeout=30.0):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.05)
+    return cond()
+
+
+def test_frame_ring_round_trip_and_downscale():
+    ring = FrameRing(create=True, slots=2, slot_bytes=64 * 48 * 3)
+    try:
+        assert ring.read_latest() == (0, None)
+        frame = np.random.default_rng(0).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+        ring.write(frame)
+        seq, out = ring.read_latest()
+        assert seq == 1 and np.array_equal(out, frame)
+        ring.write(np.zeros((96, 128, 3), dtype=np.uint8))  # too big: scaled to fit
+        seq, out = ring.read_latest()
+        assert seq == 2 and out.nbytes <= ring.slot_bytes
+
+        reader = FrameRing(ring.name)
+        reader.viewers = 2
+        assert ring.viewers == 2 and reader.read_latest()[0] == 2
+        reader.close()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_process_worker_restarts_after_crash_and_forwards_status(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_workers, "RESTART_BACKOFF", 0.1)
+    status, lock = {}, threading.Lock()
+    im = IdentityManager(similarity_threshold=0.75)
+    im.aliases[7] = 1  # temporary ID 7 was merged into restored ID 1
+    worker = process_workers.start_process_worker(
+        _fake_pipeline, {"marker": str(tmp_path / "crashed"), "crash_first": True},
+        status_target=status, status_lock=lock, status_key="cam",
+        identity_manager=im, stream_name="test:cam")
+    try:
+        assert _wait_for(lambda: status.get("cam", {}).get("frames", 0) > 5)
+        assert worker.restarts == 1 and worker.last_exitcode == 3
+        assert status["cam"]["ids"] == [1, 2] and len(im.gallery) == 2
+        assert status["cam"]["merged"] == {7: 1}
+
+        # Annotated frames only flow while someone watches
+        channel = frame_stream.get_channel("test:cam")
+        assert channel.seq == 0
+        channel.subscribe()
+        assert _wait_for(lambda: channel.seq > 0)
+        seq, jpeg = channel.encode(width=32)
+        assert jpeg[:2] == b"\xff\xd8"
+        channel.unsubscribe()
+        assert process_workers.get_all_stats()["workers"][0]["state"] == "running"
+    finally:
+        worker.stop()
+    assert status["cam"]["running"] is False
+    assert worker.state == "stopped" and not worker.process.is_alive()
+    assert frame_stream.get_channel("test:cam") is None
+    assert process_workers.get_all_stats()["workers"] == []
@@ -0,0 +1,51 @@
+"""
+Tests for batched Re-ID extraction (services/reid.py): a failing chunk only
+loses the crops that actually fail. Needs torch/torchreid to import; the
+model itself is replaced by a small deterministic forward pass.
+Run with: python -m pytest test_reid_batch.py
+"""
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torchreid")
+from services.reid import ReIDExtractor  # noqa: E402
+
+
+def _extractor(max_batch=4):
+    reid = object.__new__(ReIDExtractor)
+    reid.MAX_BATCH = max_batch
+    reid.runner = lambda x: x.reshape(len(x), 3, -1).mean(axis=2) + 1.0  # (N, 3)
+    reid._local = threading.local()
+    return reid
+
+
+def _crops(n, rng):
+    return [rng.integers(0, 256, (int(rng.integers(40, 200)), 60, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def test_failing_chunk_falls_back_to_single_crops():
+    rng = np.random.default_rng(0)
+    crops = _crops(10, rng)
+    reid = _extractor()
+    expected, valid = reid.extract_batch(crops)
+    assert valid.all() and expected.shape == (10, 3)
+
+    bad = [1, 6]
+    for i in bad:
+        crops[i] = crops[i][:0]  # empty crop: preprocessing raises
+    feats, valid = reid.extract_batch(crops)
+    assert feats.shape == (10, 3)
+    assert list(np.flatnonzero(~valid)) == bad
+    np.testing.assert_allclose(feats[valid], expected[valid], rtol=1e-5)
+    # rows of the untouched last chunk and of the retried ones alike
+    np.testing.assert_allclose(np.linalg.norm(feats[valid], axis=1), 1.0, rtol=1e-5)
+
+
+def test_all_failing_and_empty():
+    reid = _extractor()
+    feats, valid = reid.extract_batch([np.zeros((0, 10, 3), np.uint8)] * 3)
+    assert feats.shape[0] == 3 and not valid.any()
+    feats, valid = reid.extract_batch([])
+    assert feats.shape == (0, 0) and valid.shape == (0,)
@@ -0,0 +1,48 @@
+"""
+Tests for the OpenCV Re-ID preprocessing path against the PIL reference
+(ToPILImage -> Resize((256, 128)) -> ToTensor -> Normalize)
+Run with: python -m pytest test_reid_preprocess.py
+"""
+import cv2
+import numpy as np
+from PIL import Image
+
+from services.reid_preprocess import CropPreprocessor, MEAN, STD
+
+
+def _reference(crop_bgr):
+    rgb = np.ascontiguousarray(crop_bgr[..., ::-1])
+    img = np.asarray(Image.fromarray(rgb).resize((128, 256), Image.BILINEAR), dtype=np.float32) / 255.0
+    return ((img - MEAN) / STD).transpose(2, 0, 1)
+
+
+def _crops():
+    rng = np.random.default_rng(0)
+    sizes = [(80, 40), (150, 60), (256, 128), (300, 120), (600, 250)]
+    return [cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 3) for h, w in sizes]
+
+
+def test_matches_pil_pipeline():
+    crops = _crops()
+    out = CropPreprocessor(capacity=8)(crops)
+    assert out.shape == (len(crops), 3, 256, 128)
+    assert out.dtype == np.float32
+    for got, crop in zip(out, crops):
+        diff = np.abs(got - _reference(crop))
+        assert diff.mean() < 0.01
+        assert diff.max() < 0.1
+
+
+def test_buffer_is_reused_and_crop_views_work():
+    pre = CropPreprocessor(capacity=4)
+    frame = np.random.default_rng(1).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    first = pre([frame[10:300, 20:140]])
+    second = pre([frame[50:200, 300:360], frame[0:256, 0:128]])
+    assert np.shares_memory(first, second)
+    assert second.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(second[1], _reference(frame[0:256, 0:128]), atol=1e-5)
+
+
+def test_grows_past_capacity():
+    out = CropPreprocessor(capacity=2)(_crops())
+    assert out.shape[0] == 5
@@ -0,0 +1,78 @@
+"""
+Tests for per-camera regions of interest (services/roi.py, no model needed)
+Run with: python -m pytest test_roi.py
+"""
+import cv2
+import numpy as np
+import pytest
+
+from services.roi import Roi, RoiSet, detect_in_rois, points_in_polygon
+
+STAIRS = [[300, 500], [700, 500], [640, 250], [360, 250]]  # trapezoid on a 1280x720 frame
+
+
+def test_points_in_polygon_matches_opencv():
+    rng = np.random.default_rng(0)
+    poly = np.array(STAIRS + [[500, 400]], dtype=np.float32)  # concave
+    pts = rng.uniform(200, 800, (500, 2)).astype(np.float32)
+    ours = points_in_polygon(pts, poly)
+    ref = np.array([cv2.pointPolygonTest(poly.reshape(-1, 1, 2), (float(x), float(y)), False) > 0
+                    for x, y in pts])
+    on_edge = np.array([cv2.pointPolygonTest(poly.reshape(-1, 1, 2), (float(x), float(y)), False) == 0
+                        for x, y in pts])
+    assert (ours == ref)[~on_edge].all()
+
+
+def test_crop_covers_polygon_with_head_room():
+    rois = RoiSet([Roi("stairs", STAIRS)])
+    x1, y1, x2, y2 = rois.crop_bounds((720, 1280, 3))
+    assert x1 <= 300 and x2 >= 700 and y2 >= 500
+    assert y1 <= 250 - 0.25 * 720
+    crop, offset = rois.crop(np.zeros((720, 1280, 3), dtype=np.uint8))
+    assert crop.shape[:2] == (y2 - y1, x2 - x1) and offset == (x1, y1)
+    # several times fewer pixels than the full frame
+    assert rois.pixel_fraction((720, 1280)) < 0.35
+
+
+class _Detector:
+    def __init__(self, dets):
+        self.dets = np.asarray(dets, dtype=np.float32)
+        self.seen = None
+
+    def detect(self, frame, conf_thresh=0.0, source="default", imgsz=None):
+        self.seen = frame.shape
+        return self.dets.copy()
+
+
+def test_detect_in_rois_shifts_and_masks_by_foot_point():
+    rois = RoiSet([Roi("stairs", STAIRS)])
+    x1, y1, _, _ = rois.crop_bounds((720, 1280, 3))
+    # crop coordinates: first box's feet land at (500, 400) in the frame, second at (x1+60, y1+60)
+    det = _Detector([[480 - x1, 300 - y1, 520 - x1, 400 - y1, 0.9],
+                     [40, 10, 80, 60, 0.9]])
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    dets = detect_in_rois(det, frame, rois, "cam")
+    assert det.seen[:2] != frame.shape[:2]
+    assert dets.shape == (1, 5)
+    assert np.allclose(dets[0, :4], [480, 300, 520, 400])
+
+    # without ROIs the whole frame goes to the detector unchanged
+    assert len(detect_in_rois(det, frame, None, "cam")) == 2 and det.seen == frame.shape
+
+
+def test_density_per_roi():
+    rois = RoiSet.from_config([
+        {"name": "upper", "polygon": [[0, 0], [100, 0], [100, 100], [0, 100]], "area_m2": 4},
+        {"polygon": [[0, 100], [100, 100], [100, 200], [0, 200]]},
+    ], default_area_m2=10)
+    tracks = [{"bbox": (10, 20, 30, 90)}, {"bbox": (40, 10, 60, 50)}, {"bbox": (10, 100, 30, 150)},
+              {"bbox": (300, 300, 320, 350)}]
+    stats = rois.measure(tracks)
+    assert stats["upper"] == {"count": 2, "area_m2": 4.0, "density": 0.5}
+    assert stats["roi1"]["count"] == 1 and stats["roi1"]["area_m2"] == 10
+
+    assert RoiSet.from_config(None) is None and RoiSet.from_config([]) is None
+    with pytest.raises(ValueError):
+        RoiSet.from_config([{"name": "line", "polygon": [[0, 0], [1, 1]]}])
+    with pytest.raises(ValueError):
+        RoiSet.from_config([{"name": "a", "polygon": STAIRS}, {"name": "a", "polygon": STAIRS}])
@@ -0,0 +1,127 @@
+# test_route_codec.py
+"""
+Round-trip tests for the compact binary route format.
+Encoder: services/route_codec.py, decoder: route_client.py
+"""
+import pytest
+
+import route_client
+from services import route_codec
+
+
+def test_path_round_trip():
+    path = [(5, 5), (5, 6), (5, 7), (6, 8), (7, 8), (7, 7), (6, 6), (5, 5)]
+    payload = route_codec.encode_route(path, 12.5, fire_considered=True)
+    decoded = route_client.decode(payload)
+
+    assert decoded["path"] == path
+    assert decoded["length"] == pytest.approx(12.5)
+    assert decoded["fire_considered"] is True
+
+
+def test_long_straight_run_is_split():
+    path = [(0, c) for c in range(100)]
+    (start, runs) = route_codec.encode_path(path)
+
+    assert start == (0, 0)
+    assert len(runs) == 4  # 99 steps -> 32 + 32 + 32 + 3
+    assert route_client.decode_path(start, runs) == path
+
+
+def test_single_cell_path():
+    payload = route_codec.encode_route([(3, 4)], 0.0, fire_considered=False)
+    assert route_client.decode(payload)["path"] == [(3, 4)]
+
+
+def test_non_adjacent_step_rejected():
+    with pytest.raises(ValueError):
+        route_codec.encode_path([(0, 0), (0, 2)])
+
+
+def test_signboards_round_trip():
+    signboards = {
+        "SIGN_1": {"signal": "→"},
+        "SIGN_2": {"signal": "↙"},
+        "SIGN_3": {"signal": "BLOCKED"},
+        "SIGN_12": {"signal": "EXIT"},
+    }
+    payload = route_codec.encode_signboards(signboards, floor=1, fire_floor=1,
+                                            stage="growth", fire_active=True)
+    decoded = route_client.decode(payload)
+
+    assert len(payload) == 4 + 6 + 2 * len(signboards)
+    assert decoded["floor"] == 1
+    assert decoded["fire_stage"] == "growth"
+    assert decoded["fire_active"] is True
+    assert decoded["signboards"] == signboards
+
+
+def test_direction_tables_match_signboard_arrows():
+    from services.signboard_system import SignboardGuidanceSystem
+
+    system = SignboardGuidanceSystem(grid=None, fire_model=None, exits=[])
+    for (dr, dc), arrow in zip(route_codec.DIRECTIONS, route_codec.ARROWS):
+        assert system._get_direction_arrow((0, 0), (dr, dc)) == arrow
+    assert route_client.DIRECTIONS == route_codec.DIRECTIONS
+    assert route_client.ARROWS == route_codec.ARROWS
+
+
+def test_wants_binary():
+    assert route_codec.wants_binary(None, "binary")
+    assert not route_codec.wants_binary(route_codec.MEDIA_TYPE, "json")
+    assert route_codec.wants_binary(f"{route_codec.MEDIA_TYPE}, */*")
+    assert not route_codec.wants_binary("application/json")
+
+
+def test_binary_evacuation_skips_rendering(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import endpoints
+    from services import compute_pool
+
+    calls = []
+
+    def fake_route(matrix, start, exits, fire, stage, render=True, **kwargs):
+        calls.append(render)
+        return {"path": [start, (start[0], start[1] + 1)], "length": 1.0, "summary": {"turning_points_count": 0},
+                "turning_points": [], "navigation_instructions": [],
+                "image_path": "output/route.png" if render else None}
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(compute_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(endpoints, "generate_evacuation_image", fake_route)
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    client = TestClient(app)
+    params = {"start_row": 1, "start_col": 1, "strating_floor": 0, "fire_locations": ["2,2"],
+              "fire_floor": 0, "exits": ["3,3"]}
+    try:
+        binary = client.get("/evacuation", params={**params, "format": "binary"})
+        header = client.get("/evacuation", params=params, headers={"Accept": route_codec.MEDIA_TYPE})
+        json_resp = client.get("/evacuation", params=params)
+    finally:
+        pool.shutdown(wait=True)
+    assert binary.headers["content-type"] == header.headers["content-type"] == route_codec.MEDIA_TYPE
+    assert json_resp.json()["download_url"] == "/download/route.png"
+    assert calls == [False, False, True]
+
+
+def test_route_without_render_writes_no_image(tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+    from services import visualize
+
+    mat = np.ones((5, 8), dtype=int)
+    mat[2, 1:7] = 0
+    path = str(tmp_path / "floor.csv")
+    pd.DataFrame(mat).to_csv(path)
+
+    def no_render(*args, **kwargs):
+        raise AssertionError("rendered")
+
+    monkeypatch.setattr(visualize, "_render_route", no_render)
+    result = visualize.generate_evacuation_image(path, (2, 1), [(2, 6)], [], "initial",
+                                                 consider_fire=False, render=False)
+    assert result["image_path"] is None
+    assert result["path"][0] == (2, 1) and result["path"][-1] == (2, 6)
@@ -0,0 +1,103 @@
+"""
+Tests for the live signboard controller (services/signboard_controller.py):
+deltas carry only the signs that changed, and controllers that fall behind
+are resynced with a snapshot.
+Run with: python -m pytest test_signboard_controller.py
+"""
+import asyncio
+
+import pytest
+
+from services import signboard_controller
+from services.signboard_controller import SignboardController
+from test_signboard_table import EXITS, FLOOR, SIGNS, _floor
+
+
+@pytest.fixture(autouse=True)
+def test_floor(monkeypatch):
+    monkeypatch.setattr(signboard_controller, "load_floor_matrix", lambda path: _floor())
+    monkeypatch.setattr(signboard_controller, "get_table", lambda floor: None)
+
+
+async def _settle(ctl):
+    for state in ctl.floors.values():
+        if state.task is not None:
+            await state.task
+
+
+async def _configured(**kwargs):
+    ctl = SignboardController(coalesce_s=0, **kwargs)
+    ctl.configure_floor(FLOOR, EXITS, SIGNS)
+    await _settle(ctl)
+    return ctl
+
+
+def _drain(queue):
+    msgs = []
+    while not queue.empty():
+        msgs.append(queue.get_nowait())
+    return msgs
+
+
+def test_fire_updates_push_only_changed_signs():
+    async def scenario():
+        ctl = await _configured()
+        assert ctl.floors[FLOOR].seq == 1 and len(ctl.floors[FLOOR].signboards) == len(SIGNS)
+        _, queue = ctl.subscribe(FLOOR)
+
+        # fire in room 1 only turns the sign inside it
+        ctl.update_fire(FLOOR, [(2, 2)], "initial")
+        await _settle(ctl)
+        [msg] = _drain(queue)
+        assert msg["type"] == "delta" and msg["seq"] == 2 and msg["prev_seq"] == 1
+        assert set(msg["signboards"]) == {"SIGN_1"}
+
+        # fire moves to room 2: room 1's sign turns back, room 2's sign turns
+        ctl.update_fire(FLOOR, [(6, 8)], "initial")
+        await _settle(ctl)
+        [msg] = _drain(queue)
+        assert msg["seq"] == 3 and msg["prev_seq"] == 2
+        assert set(msg["signboards"]) == {"SIGN_1", "SIGN_3"}
+        assert msg["signboards"]["SIGN_1"] == ctl.resync(FLOOR, None)[0]["signboards"]["SIGN_1"]
+
+        # the same fire state again changes nothing: no message, no new seq
+        ctl.update_fire(FLOOR, [(6, 8)], "initial")
+        await _settle(ctl)
+        assert queue.empty() and ctl.floors[FLOOR].seq == 3
+
+    asyncio.run(scenario())
+
+
+def test_stale_since_resyncs_with_snapshot():
+    async def scenario():
+        ctl = await _configured(history_size=2)
+        for cell in [(2, 2), (6, 8), (2, 3), (7, 7)]:
+            ctl.update_fire(FLOOR, [cell], "initial")
+            await _settle(ctl)
+        seq = ctl.floors[FLOOR].seq
+        assert seq == 5
+
+        # recent enough: just the missed deltas
+        assert [m["seq"] for m in ctl.resync(FLOOR, seq - 2)] == [seq - 1, seq]
+        assert ctl.resync(FLOOR, seq) == []
+        # older than the history, from the future, or no seq at all: a full snapshot
+        for since in (1, seq + 10, None):
+            [msg] = ctl.resync(FLOOR, since)
+            assert msg["type"] == "snapshot" and msg["seq"] == seq
+            assert set(msg["signboards"]) == {f"SIGN_{i + 1}" for i in range(len(SIGNS))}
+
+    asyncio.run(scenario())
+
+
+def test_full_subscriber_queue_gets_a_snapshot():
+    async def scenario():
+        ctl = await _configured(queue_size=1)
+        _, slow = ctl.subscribe(FLOOR)
+        for cell in [(2, 2), (6, 8), (2, 3)]:
+            ctl.update_fire(FLOOR, [cell], "initial")
+            await _settle(ctl)
+        # nothing was read: one snapshot of the latest state instead of a backlog
+        [msg] = _drain(slow)
+        assert msg == ctl.snapshot(FLOOR) and msg["seq"] == ctl.floors[FLOOR].seq == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,124 @@
+"""
+Tests for the precomputed signboard tables (services/signboard_table.py):
+build -> lookup must give exactly what a live computation gives, and an
+interrupted build resumes where it stopped.
+Run with: python -m pytest test_signboard_table.py
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import signboard_table
+from services.fire_model import FireModel
+from services.grid import Grid
+from services.signboard_system import SignboardGuidanceSystem, generate_signboard_plan
+from services.signboard_table import STAGES, SignboardTable, build_table
+from services.visualize_signboard import detect_rooms
+
+FLOOR = 7
+EXITS = [(5, 13)]
+SIGNS = [(2, 2), (5, 3), (7, 6), (5, 13)]
+
+
+def _floor() -> np.ndarray:
+    """Two rooms behind doors (2) off a walkway that doors split into short corridors."""
+    mat = np.ones((9, 14), dtype=int)
+    mat[1:4, 1:6] = 0       # room 1
+    mat[4, 3] = 2           # its door
+    mat[5, 1:14] = 0        # walkway, exit at the east end
+    mat[5, [5, 10]] = 2
+    mat[6, 8] = 2           # door of room 2
+    mat[7, 1:13] = 0        # room 2
+    return mat
+
+
+@pytest.fixture
+def floor_csv(tmp_path, monkeypatch):
+    path = str(tmp_path / "floor.csv")
+    pd.DataFrame(_floor()).to_csv(path)
+    monkeypatch.setattr(signboard_table, "floor_matrix_path", lambda floor: path)
+    return path
+
+
+def _json(value):
+    return json.loads(json.dumps(value))
+
+
+def _live(grid, stage, cell):
+    fire = FireModel(grid)
+    if cell is not None:
+        fire.ignite([cell])
+        fire.stage_update(stage)
+    return fire
+
+
+def test_lookup_matches_live_computation(floor_csv, tmp_path):
+    build_table(FLOOR, EXITS, SIGNS, workers=1, out_dir=str(tmp_path))
+    table = SignboardTable.open(FLOOR, out_dir=str(tmp_path))
+    assert table is not None and table.meta["complete"]
+    grid = Grid(_floor().tolist())
+    rooms = detect_rooms(grid)
+    assert rooms.max() == 2 and table.corridor_positions
+
+    free = [(r, c) for r, c in zip(*np.nonzero(grid.mat != 1))]
+    scenarios = [(stage, (int(r), int(c))) for stage in STAGES for r, c in free] + [("initial", None)]
+    for stage, cell in scenarios:
+        fire_locs = [cell] if cell is not None else []
+        fire = _live(grid, stage, cell)
+        live = generate_signboard_plan(grid, fire, EXITS, SIGNS, rooms)
+        plan = table.lookup_plan(EXITS, SIGNS, fire_locs, cell is not None, stage)
+        assert _json(plan) == _json(live), (stage, cell)
+
+        directions = SignboardGuidanceSystem(grid, fire, EXITS).compute_signboard_directions(SIGNS)
+        assert _json(table.lookup(EXITS, SIGNS, fire_locs, cell is not None, stage)) == _json(directions)
+
+    # unknown layouts and multi-cell fires fall back to live computation
+    assert table.lookup_plan(EXITS, SIGNS[:2], [], False, "initial") is None
+    assert table.lookup_plan(EXITS, SIGNS, [(5, 2), (5, 3)], True, "growth") is None
+
+
+def test_interrupted_build_resumes(floor_csv, tmp_path, capsys):
+    out_dir = str(tmp_path)
+    build_table(FLOOR, EXITS, SIGNS, workers=1, out_dir=out_dir)
+    meta_path, table_path, rooms_path, done_path = signboard_table._table_paths(FLOOR, out_dir)
+    original = np.load(table_path).copy()
+    original_rooms = np.load(rooms_path).copy()
+
+    # pretend the build stopped: some scenarios not done, one finished row left as is
+    done = np.load(done_path, mmap_mode="r+")
+    built = np.flatnonzero(done)
+    lost, kept = built[:40], built[40]
+    done[lost] = 0
+    done.flush()
+    table = np.load(table_path, mmap_mode="r+")
+    table[lost] = np.zeros_like(table[lost])
+    table[kept, 0]["path_len"] = 999  # marker: must not be recomputed
+    table.flush()
+    del done, table
+    capsys.readouterr()
+
+    build_table(FLOOR, EXITS, SIGNS, workers=1, out_dir=out_dir)
+    assert f"{len(built) - 40}/{len(built)} scenarios already built" in capsys.readouterr().out
+    rebuilt = np.load(table_path)
+    assert (rebuilt[lost] == original[lost]).all()
+    assert (np.load(rooms_path) == original_rooms).all()
+    assert rebuilt[kept, 0]["path_len"] == 999
+    assert np.load(done_path)[built].all()
+
+    # a different signboard layout starts over instead of resuming
+    capsys.readouterr()
+    build_table(FLOOR, EXITS, SIGNS[:3], workers=1, out_dir=out_dir)
+    assert f"0/{len(built)} scenarios already built" in capsys.readouterr().out
+
+
+def test_tables_of_an_old_format_are_ignored(floor_csv, tmp_path):
+    build_table(FLOOR, EXITS, SIGNS, workers=1, out_dir=str(tmp_path))
+    meta_path = signboard_table._table_paths(FLOOR, str(tmp_path))[0]
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["format"] = signboard_table.TABLE_FORMAT - 1
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    assert SignboardTable.open(FLOOR, out_dir=str(tmp_path)) is None
@@ -0,0 +1,132 @@
+"""
+Tests for the status WebSocket broadcaster (services/status_broadcast.py, no server needed)
+Run with: python -m pytest test_status_broadcast.py
+"""
+import asyncio
+import json
+import threading
+
+from services.status_broadcast import StatusBroadcaster
+
+
+def _apply(state, msg):
+    """What a dashboard does with each message."""
+    if msg["type"] == "keyframe":
+        return msg["status"]
+    for cam in msg["removed"]:
+        state.pop(cam, None)
+    for cam, fields in msg["removed_fields"].items():
+        for f in fields:
+            state[cam].pop(f, None)
+    for cam, fields in msg["changed"].items():
+        state.setdefault(cam, {}).update(fields)
+    return state
+
+
+async def _next(sub, timeout=1.0):
+    return await asyncio.wait_for(sub.get(), timeout)
+
+
+def test_one_serialization_shared_by_subscribers_then_deltas():
+    async def scenario():
+        lock = threading.Lock()
+        status = {"cam1": {"persons": 2, "fps": 10.0, "tracks": [{"id": 1}]},
+                  "cam2": {"persons": 0, "fps": 9.5}}
+        b = StatusBroadcaster("test", status, lock, interval=0.01, keyframe_s=100)
+        a, c = b.subscribe(), b.subscribe()
+        first_a, first_c = await _next(a), await _next(c)
+        assert first_a is first_c  # same text object for every client
+        state = _apply({}, json.loads(first_a))
+        assert json.loads(first_a)["type"] == "keyframe" and state == status
+
+        # nothing changed: no messages
+        await asyncio.sleep(0.05)
+        assert a.queue.empty()
+
+        with lock:
+            status["cam1"]["persons"] = 3
+            del status["cam2"]["fps"]
+            status["cam3"] = {"persons": 1}
+        msg = json.loads(await _next(a))
+        assert msg["type"] == "delta"
+        assert msg["changed"] == {"cam1": {"persons": 3}, "cam3": {"persons": 1}}
+        assert msg["removed_fields"] == {"cam2": ["fps"]} and msg["removed"] == []
+        state = _apply(state, msg)
+
+        with lock:
+            del status["cam2"]
+        msg = json.loads(await _next(a))
+        assert msg["removed"] == ["cam2"]
+        assert _apply(state, msg) == status
+
+        # a late subscriber starts from a keyframe of the current state
+        late = b.subscribe()
+        msg = json.loads(await _next(late))
+        assert msg["type"] == "keyframe" and msg["status"] == status
+
+        for sub in (a, c, late):
+            b.unsubscribe(sub)
+        stats = b.get_stats()
+        assert stats["keyframes"] == 1 and stats["deltas"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_periodic_keyframes_and_full_mode():
+    async def scenario():
+        status = {"cam": {"persons": 1}}
+        b = StatusBroadcaster("test", status, threading.Lock(), interval=0.01, keyframe_s=0.03)
+        delta, full = b.subscribe(), b.subscribe("full")
+        types = [json.loads(await _next(delta))["type"] for _ in range(3)]
+        assert types == ["keyframe"] * 3  # unchanged status: keyframes only
+        assert json.loads(await _next(full)) == status
+        b.unsubscribe(delta)
+        b.unsubscribe(full)
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_is_dropped_not_buffered():
+    async def scenario():
+        lock = threading.Lock()
+        status = {"cam": {"frame": 0}}
+        b = StatusBroadcaster("test", status, lock, interval=0.005, keyframe_s=100, max_pending=3)
+        slow, fast = b.subscribe(), b.subscribe()
+        received = 0
+        for i in range(1, 10):
+            await _next(fast)
+            received += 1
+            with lock:
+                status["cam"]["frame"] = i
+        assert received == 9
+        assert slow.dropped and slow.queue.qsize() == 1 and await slow.get() is None
+        assert slow not in b.subscribers and fast in b.subscribers
+        assert b.get_stats()["dropped_clients"] == 1
+        b.unsubscribe(fast)
+
+    asyncio.run(scenario())
+
+
+def test_serve_sends_until_dropped():
+    class _Socket:
+        def __init__(self):
+            self.sent = []
+            self.closed = None
+
+        async def send_text(self, text):
+            self.sent.append(text)
+
+        async def close(self, code=1000):
+            self.closed = code
+
+    async def scenario():
+        b = StatusBroadcaster("test", {"cam": {"persons": 1}}, threading.Lock(), interval=0.01)
+        ws = _Socket()
+        task = asyncio.create_task(b.serve(ws))
+        await asyncio.sleep(0.05)
+        assert len(ws.sent) == 1 and b.get_stats()["subscribers"] == 1
+        b.drop(b.subscribers[0])
+        await asyncio.wait_for(task, 1.0)
+        assert ws.closed == 1013 and b.get_stats()["subscribers"] == 0
+
+    asyncio.run(scenario())